@@ -97,6 +97,125 @@ sequence_file_reference = [
         be a tuple containing the current item of the first iterable at
         index 0, the current item of the second iterable at
         index 1 and so on."""
+    ],
+    [
+        'feeders', ['sequence'], 'dict', '{}',
+        """Mapping of data feeder names to their definition (`path`,
+        `format`, `strategy`, `delimiter`). Feeders stream rows
+        from CSV or JSON Lines files and are available in the
+        template context as `feeders`."""
+    ],
+    [
+        'coalesce', ['sequence'], 'bool, dict', 'false',
+        """Share a single upstream call between identical idempotent
+        requests in flight at the same time. Accepts `methods`
+        and `headers` to control which requests are considered
+        identical."""
+    ],
+    [
+        'concurrent_steps', ['sequence'], 'int', '1',
+        """Maximum number of independent steps executed concurrently. Steps
+        are analyzed for dependencies on variables registered by
+        earlier steps."""
+    ],
+    [
+        'name', ['step'], 'string', '',
+        """Optional step name, which can be referenced by `depends_on`."""
+    ],
+    [
+        'depends_on', ['step'], 'string, int, list', '',
+        """Names or zero-based indexes of earlier steps this step depends
+        on, in addition to the dependencies detected from its
+        templates."""
+    ],
+    [
+        'checkpoint', ['sequence'], 'string, dict', '',
+        """SQLite file recording completed loop items and registered
+        variables, used by `pitch run --resume`. Either a path
+        or a mapping with `path`, `interval` (seconds between
+        commits) and `key` (`item` or `index`)."""
+    ],
+    [
+        'retention', ['sequence'], 'dict', '',
+        """Memory retention policy for long runs: `release_body` releases
+        response bodies after the response plugins of each step,
+        `max_memory` logs warnings with the largest variables
+        when the process memory exceeds the limit,
+        `check_interval` throttles the memory checks."""
+    ],
+    [
+        'thresholds', ['sequence'], 'list', '',
+        """Bounds on aggregate run statistics (`latency` percentiles,
+        `error_rate`, `throughput`, `requests`), optionally per
+        step. A breached threshold sets a non-zero exit code
+        and, with `abort`, stops the run early."""
+    ],
+    [
+        'think_time', ['sequence'], 'float, dict', '',
+        """Pause between the steps of each execution; either seconds or a
+        `distribution` (`constant`, `uniform`, `exponential`)
+        with its parameters."""
+    ],
+    [
+        'shared_variables', ['sequence'], 'bool, dict', '',
+        """Enable the variable store shared by all threads and processes,
+        readable in templates as `shared`; optionally with the
+        default `ttl`, `wait_timeout` and `lease_timeout` in
+        seconds."""
+    ],
+    [
+        'compute_once', ['step'], 'string, list', '',
+        """Shared variables computed by the step; the step is executed by a
+        single execution while they are missing or expired, the
+        others wait for the values."""
+    ],
+    [
+        'background_plugins', ['sequence'], 'bool, dict', '',
+        """Execute output plugins on background worker threads; optionally
+        with the number of `workers` and the `queue_size`."""
+    ],
+    [
+        'deadline', ['sequence', 'step'], 'float', '',
+        """Maximum duration of each step execution in seconds, including
+        plugins; request timeouts are capped at the remaining
+        time."""
+    ],
+    [
+        'duration', ['sequence'], 'float', '',
+        """Run duration in seconds; threads repeat the sequence until it
+        elapses, ignoring `repeat`."""
+    ],
+    [
+        'warmup', ['sequence'], 'float, dict', '',
+        """Warm-up phase excluded from the statistics; either seconds or a
+        mapping with `duration`, `iterations` per thread and
+        pre-opened `connections`."""
+    ],
+    [
+        'cooldown', ['sequence'], 'float', '',
+        """Seconds at the end of a run with `duration` excluded from the
+        statistics."""
+    ],
+    [
+        'history', ['sequence'], 'str, dict', '',
+        """Run history directory where the summary of each run is saved, or
+        a mapping with `directory`, `baseline`, `tolerances`,
+        `percentiles` and `alpha`. With a `baseline`, the run is
+        compared to a previous run and regressions set a non-
+        zero exit code."""
+    ],
+    [
+        'transport', ['sequence'], 'str, dict', 'http1',
+        """Transport of the requests: `http1`, or `http2` for multiplexing
+        the requests of all threads over a few HTTP/2
+        connections to each origin. A mapping with `type` sets
+        the options of the transport, e.g. `connections` and
+        flow-control window sizes."""
+    ],
+    [
+        'capture', ['sequence'], 'str, dict', '',
+        """Path of a JSON Lines file, or options, capturing failed, slow
+        and sampled requests (see [Tail Capture](#tail-capture))"""
     ]
 ]
 
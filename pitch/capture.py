@@ -0,0 +1,259 @@
+import collections
+import json
+import logging
+import os
+import random
+import threading
+import time
+
+from pitch.sinks import get_sink
+from pitch.stats import LatencyHistogram
+
+logger = logging.getLogger(__name__)
+
+_captures = []
+_captures_lock = threading.Lock()
+
+
+def _excerpt(content, size: int) -> dict:
+    if content is None:
+        return None
+    if isinstance(content, str):
+        content = content.encode('utf-8')
+    elif not isinstance(content, bytes):
+        # Streamed or file bodies are not read
+        return {'size': None, 'text': repr(content)[:size]}
+    return {
+        'size': len(content),
+        'text': content[:size].decode('utf-8', errors='replace')
+    }
+
+
+class TailCapture(object):
+    """
+    Tail-based capture of full request/response details.
+
+    A request is captured when it fails (error status code or exception),
+    when it is slower than the `percentile` latency of its step so far (or
+    than a fixed `latency` in seconds) or, with `sample: N`, at random one
+    in every N requests. Slow requests are only captured once a step has
+    `min_requests` latency samples.
+
+    Captures are kept in a ring buffer of `buffer_size` records, which
+    drops the oldest records when full, and are appended to a JSON Lines
+    file by a background thread every `flush_interval` seconds. Bodies and
+    the rendered variables are truncated to `body_bytes`.
+    """
+    def __init__(self, path: str, percentile: float = 99.0,
+                 latency: float = None, sample: int = None,
+                 errors: bool = True, min_requests: int = 100,
+                 buffer_size: int = 1000, body_bytes: int = 4096,
+                 flush_interval: float = 1.0, variables: bool = True):
+        if sample is not None and int(sample) < 1:
+            raise ValueError('sample must be a positive integer')
+        self._path = os.path.abspath(os.path.expanduser(path))
+        self._percentile = None if percentile is None else float(percentile)
+        self._latency = None if latency is None else float(latency)
+        self._sample = None if sample is None else 1.0 / int(sample)
+        self._errors = errors
+        self._min_requests = int(min_requests)
+        self._body_bytes = int(body_bytes)
+        self._flush_interval = float(flush_interval)
+        self._variables = variables
+        self._buffer = collections.deque(maxlen=int(buffer_size))
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        # Latency histograms and current thresholds by step
+        self._latencies = {}
+        self._thresholds = {}
+        self._captured = 0
+        self._dropped = 0
+        self._flusher = None
+        self._stop = threading.Event()
+        with _captures_lock:
+            _captures.append((os.getpid(), self))
+
+    @classmethod
+    def from_definition(cls, definition):
+        """
+        Create a capture from the sequence-level `capture` option; either
+        the path of the capture file or a mapping of constructor arguments.
+        """
+        if not definition:
+            return None
+        if isinstance(definition, str):
+            return cls(definition)
+        return cls(**definition)
+
+    @property
+    def path(self) -> str:
+        return self._path
+
+    @property
+    def captured(self) -> int:
+        return self._captured
+
+    @property
+    def dropped(self) -> int:
+        return self._dropped
+
+    def start(self):
+        """ Start observing a step execution of the current thread. """
+        self._local.request = None
+        self._local.response = None
+        self._local.record = None
+
+    def request(self, request):
+        self._local.request = request
+
+    def response(self, context, response, elapsed: float):
+        """ Decide whether to capture a response, while its body is read. """
+        self._local.response = (response, elapsed)
+        step = context.step['index']
+        reasons = []
+        if self._errors and response.status_code >= 400:
+            reasons.append('failure')
+        threshold = self._record_latency(step, elapsed)
+        if threshold is not None and elapsed > threshold:
+            reasons.append('slow')
+        if self._sample is not None and random.random() < self._sample:
+            reasons.append('sample')
+        if reasons:
+            self._local.record = self._create_record(
+                context, reasons, response, elapsed, threshold
+            )
+
+    def end(self, context, exception: BaseException = None):
+        """ Complete a step execution, buffering its capture if any. """
+        record = getattr(self._local, 'record', None)
+        if exception is not None and self._errors:
+            if record is None:
+                response, elapsed = getattr(self._local, 'response', None) \
+                    or (None, None)
+                record = self._create_record(
+                    context, [], response, elapsed
+                )
+            record['reasons'].append('error')
+            record['error'] = repr(exception)
+        self._local.record = None
+        self._local.response = None
+        if record is not None:
+            self._append(record)
+
+    def _record_latency(self, step, elapsed):
+        if self._latency is not None:
+            return self._latency
+        if self._percentile is None:
+            return None
+        with self._lock:
+            histogram = self._latencies.get(step)
+            if histogram is None:
+                histogram = self._latencies[step] = LatencyHistogram()
+            histogram.record(elapsed)
+            count = histogram.count
+            # The percentile is recomputed every `min_requests` samples
+            if count >= self._min_requests and \
+                    count % self._min_requests == 0:
+                self._thresholds[step] = histogram.percentile(
+                    self._percentile
+                )
+            return self._thresholds.get(step)
+
+    def _create_record(self, context, reasons, response=None, elapsed=None,
+                       threshold=None) -> dict:
+        step = context.step['definition'] or {}
+        record = {
+            'time': time.time(),
+            'process': os.getpid(),
+            'reasons': reasons,
+            'step': context.step['index'],
+            'name': step.get('name'),
+            'item': context.templating.get('item'),
+            'elapsed': elapsed,
+            'threshold': threshold,
+            'request': None,
+            'response': None
+        }
+        request = getattr(self._local, 'request', None)
+        if request is not None:
+            record['request'] = {
+                'method': request.method,
+                'url': request.url,
+                'headers': dict(request.headers),
+                'body': _excerpt(request.body, self._body_bytes)
+            }
+        if response is not None:
+            record['response'] = {
+                'status_code': response.status_code,
+                'reason': response.reason,
+                'url': response.url,
+                'headers': dict(response.headers),
+                'elapsed': response.elapsed.total_seconds(),
+                'body': _excerpt(response.content, self._body_bytes)
+            }
+        if self._variables:
+            variables = json.dumps(
+                dict(context.templating['variables'] or {}),
+                default=repr
+            )
+            record['variables'] = json.loads(variables) \
+                if len(variables) <= self._body_bytes \
+                else variables[:self._body_bytes]
+        return record
+
+    def _append(self, record):
+        with self._lock:
+            if len(self._buffer) == self._buffer.maxlen:
+                self._dropped += 1
+            self._buffer.append(record)
+            self._captured += 1
+            if self._flusher is None:
+                self._flusher = threading.Thread(
+                    target=self._flush_periodically,
+                    name='pitch-capture',
+                    daemon=True
+                )
+                self._flusher.start()
+
+    def _flush_periodically(self):
+        while not self._stop.wait(self._flush_interval):
+            self.flush()
+
+    def flush(self):
+        """ Write the buffered captures to the capture file. """
+        sink = None
+        while True:
+            try:
+                record = self._buffer.popleft()
+            except IndexError:
+                break
+            if sink is None:
+                sink = get_sink(self._path)
+            sink.write(json.dumps(record, default=repr).encode('utf-8'))
+        if sink is not None:
+            sink.flush()
+
+    def close(self):
+        self._stop.set()
+        if self._flusher is not None:
+            self._flusher.join()
+            self._flusher = None
+        self.flush()
+        if self._captured:
+            logger.info(
+                '[capture] captured={} dropped={} file={}'.format(
+                    self._captured, self._dropped, self._path
+                )
+            )
+
+
+def close_captures():
+    """ Flush and stop the captures created by the current process. """
+    pid = os.getpid()
+    with _captures_lock:
+        captures = [capture for owner, capture in _captures if owner == pid]
+        _captures[:] = [
+            (owner, capture) for owner, capture in _captures if owner != pid
+        ]
+    for capture in captures:
+        capture.close()
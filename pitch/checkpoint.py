@@ -0,0 +1,164 @@
+import hashlib
+import json
+import os
+import pickle
+import sqlite3
+import threading
+import time
+
+KEYS = ('item', 'index')
+
+_SCHEMA = (
+    'CREATE TABLE IF NOT EXISTS completed ('
+    ' worker TEXT NOT NULL,'
+    ' step INTEGER NOT NULL,'
+    ' item_key TEXT NOT NULL,'
+    ' PRIMARY KEY (worker, step, item_key))',
+    'CREATE TABLE IF NOT EXISTS variables ('
+    ' worker TEXT PRIMARY KEY,'
+    ' data BLOB NOT NULL,'
+    ' updated REAL NOT NULL)'
+)
+
+
+def _connect(path):
+    connection = sqlite3.connect(path, timeout=30, check_same_thread=False)
+    connection.execute('PRAGMA journal_mode=WAL')
+    connection.execute('PRAGMA synchronous=NORMAL')
+    for statement in _SCHEMA:
+        connection.execute(statement)
+    connection.commit()
+    return connection
+
+
+class CheckpointStore(object):
+    """
+    SQLite file recording the progress of a run, so that an interrupted
+    run can be resumed.
+
+    Each sequence execution (identified by its process and loop index)
+    records which loop items of each step have completed, together with
+    a snapshot of its registered variables.
+    """
+    def __init__(self, path: str, resume: bool = False,
+                 interval: float = 5.0, key: str = 'item'):
+        if key not in KEYS:
+            raise ValueError('Unknown checkpoint key: {}'.format(key))
+        self._path = os.path.abspath(os.path.expanduser(path))
+        self._resume = resume
+        self._interval = float(interval)
+        self._key = key
+
+    @classmethod
+    def from_definition(cls, definition, resume=False):
+        """
+        Create a store from the sequence-level `checkpoint` option; either
+        a file path or a mapping with `path`, `interval` and `key`.
+        """
+        if not definition:
+            return None
+        if isinstance(definition, str):
+            definition = {'path': definition}
+        return cls(resume=resume, **definition)
+
+    @property
+    def path(self):
+        return self._path
+
+    def reset(self):
+        """ Discard the progress of a previous run. """
+        for suffix in ('', '-wal', '-shm'):
+            try:
+                os.unlink(self._path + suffix)
+            except FileNotFoundError:
+                pass
+
+    def open(self, worker: str):
+        return Checkpoint(
+            _connect(self._path),
+            worker=worker,
+            resume=self._resume,
+            interval=self._interval,
+            key=self._key
+        )
+
+
+class Checkpoint(object):
+    """ Progress of a single sequence execution. """
+    def __init__(self, connection, worker, resume, interval, key):
+        self._connection = connection
+        self._worker = worker
+        self._interval = interval
+        self._key = key
+        self._lock = threading.Lock()
+        self._pending = []
+        self._variables = None
+        self._last_commit = time.monotonic()
+        self._completed = set()
+        if resume:
+            self._completed.update(
+                (step, item_key)
+                for step, item_key in connection.execute(
+                    'SELECT step, item_key FROM completed WHERE worker = ?',
+                    (worker,)
+                )
+            )
+
+    def restore_variables(self):
+        """
+        :return: the registered variables saved by the previous run or
+            `None` if nothing was saved
+        """
+        row = self._connection.execute(
+            'SELECT data FROM variables WHERE worker = ?',
+            (self._worker,)
+        ).fetchone()
+        return None if row is None else pickle.loads(row[0])
+
+    def item_key(self, index, item) -> str:
+        if self._key == 'index':
+            return str(index)
+        return hashlib.sha1(
+            json.dumps(item, sort_keys=True, default=str).encode('utf-8')
+        ).hexdigest()
+
+    def is_completed(self, step, index, item) -> bool:
+        return bool(self._completed) and \
+            (step, self.item_key(index, item)) in self._completed
+
+    def complete(self, step, index, item, variables):
+        with self._lock:
+            self._pending.append(
+                (self._worker, step, self.item_key(index, item))
+            )
+            self._variables = variables
+            if time.monotonic() - self._last_commit >= self._interval:
+                self._commit()
+
+    def close(self):
+        with self._lock:
+            self._commit()
+        self._connection.close()
+
+    def _commit(self):
+        self._last_commit = time.monotonic()
+        if not self._pending:
+            return
+        with self._connection:
+            self._connection.executemany(
+                'INSERT OR IGNORE INTO completed (worker, step, item_key) '
+                'VALUES (?, ?, ?)',
+                self._pending
+            )
+            try:
+                data = pickle.dumps(dict(self._variables))
+            except (pickle.PicklingError, TypeError, AttributeError,
+                    RuntimeError):
+                data = None
+            if data is not None:
+                self._connection.execute(
+                    'INSERT OR REPLACE INTO variables (worker, data, updated) '
+                    'VALUES (?, ?, ?)',
+                    (self._worker, data, time.time())
+                )
+        self._pending = []
@@ -1,7 +1,19 @@
+import csv
+import sys
+
 import click
 
-from pitch.runner.bootstrap import bootstrap
+from pitch.exceptions import RunNotFoundError, ThresholdBreachedError
+from pitch.history import DEFAULT_DIRECTORY, DEFAULT_TOLERANCES, \
+    RegressionCheck, RunHistory
+
+from pitch.runner.bootstrap import bootstrap, capacity as capacity_search, \
+    compare as compare_targets
+from pitch.runner.capacity import STRATEGIES, CapacityStep
+from pitch.runner.compare import MODES as COMPARISON_MODES
 from pitch.plugins.utils import list_plugins, loader
+from pitch.tracing import FORMATS as TRACE_FORMATS
+from pitch.validation import report as validation_report
 from pitch.cli.logger import logger
 
 
@@ -11,26 +23,272 @@ def cli():
     pass
 
 
+def _tolerances(ctx, param, values):
+    tolerances = {}
+    for value in values:
+        metric, _, tolerance = value.partition('=')
+        if metric not in DEFAULT_TOLERANCES:
+            raise click.BadParameter('unknown metric {}'.format(metric))
+        try:
+            tolerances[metric] = float(tolerance)
+        except ValueError:
+            raise click.BadParameter(
+                'expected METRIC=VALUE, got {}'.format(value)
+            )
+    return tolerances
+
+
+_tolerance_option = click.option(
+    '-t', '--tolerance', 'tolerances', metavar='METRIC=VALUE',
+    multiple=True, callback=_tolerances,
+    help='Allowed change of latency (relative increase), error_rate '
+         '(absolute increase) or throughput (relative decrease)'
+)
+
+
 @cli.command(help='Run a sequence file.')
 @click.option('-P', '--processes', type=int,
-              help='Number of processes', default=1)
+              help='Number of processes (overrides the sequence file)',
+              default=None)
 @click.option('-R', '--request-plugins',
               multiple=True,
               help='Additional request plugins (in Python import notation)')
 @click.option('-S', '--response-plugins',
               multiple=True,
               help='Additional response plugins (in Python import notation)')
+@click.option('--record', metavar='CASSETTE',
+              type=click.Path(dir_okay=False, writable=True),
+              help='Record all HTTP exchanges into a cassette file')
+@click.option('--replay', metavar='CASSETTE',
+              type=click.Path(exists=True, dir_okay=False, readable=True),
+              help='Serve HTTP responses from a recorded cassette file')
+@click.option('-H', '--hooks',
+              multiple=True,
+              help='Modules subscribing to execution events with a '
+                   '`register_hooks(bus)` function '
+                   '(in Python import notation)')
+@click.option('--resume', is_flag=True,
+              help='Skip work recorded as completed in the sequence '
+                   'checkpoint file')
+@click.option('--profile', is_flag=True,
+              help='Display the time spent in each execution phase')
+@click.option('--profile-cprofile', metavar='FILE',
+              type=click.Path(dir_okay=False, writable=True),
+              help='Write cProfile statistics to a file (implies --profile)')
+@click.option('--profile-stacks', metavar='FILE',
+              type=click.Path(dir_okay=False, writable=True),
+              help='Write sampled stacks in collapsed (flamegraph) format '
+                   '(implies --profile)')
+@click.option('--trace', metavar='FILE',
+              type=click.Path(dir_okay=False, writable=True),
+              help='Write a span for each step execution to a trace file')
+@click.option('--trace-format', type=click.Choice(TRACE_FORMATS),
+              default='chrome', show_default=True,
+              help='Chrome trace events or OTLP JSON lines')
+@click.option('--no-trace-propagation', is_flag=True,
+              help='Do not send a W3C traceparent header with each request')
+@click.option('--history', metavar='DIRECTORY',
+              type=click.Path(file_okay=False, writable=True),
+              help='Save the summary of the run to a run history directory')
+@click.option('--baseline', metavar='RUN',
+              help='Compare the run to a run of the history (identifier, '
+                   'summary file or latest[~N])')
+@_tolerance_option
 @click.argument('sequence_file',
                 type=click.Path(exists=True, dir_okay=False, readable=True))
-def run(processes, request_plugins, response_plugins, sequence_file):
+def run(processes, request_plugins, response_plugins, hooks, record, replay,
+        resume, profile, profile_cprofile, profile_stacks, trace,
+        trace_format, no_trace_propagation, history, baseline, tolerances,
+        sequence_file):
+    if record is not None and replay is not None:
+        raise click.UsageError('--record and --replay are mutually exclusive')
     logger.info('Loading file: {}'.format(sequence_file))
-    bootstrap(
-        processes=processes,
-        request_plugins=request_plugins,
-        response_plugins=response_plugins,
+    try:
+        resources = bootstrap(
+            processes=processes,
+            request_plugins=request_plugins,
+            response_plugins=response_plugins,
+            hooks=hooks,
+            record=record,
+            replay=replay,
+            resume=resume,
+            profile=profile or profile_cprofile or profile_stacks,
+            profile_cprofile=profile_cprofile,
+            profile_stacks=profile_stacks,
+            trace=trace,
+            trace_format=trace_format,
+            trace_propagation=not no_trace_propagation,
+            history=history,
+            baseline=baseline,
+            tolerances=tolerances,
+            sequence_file=sequence_file,
+            logger=logger
+        )
+    except RunNotFoundError as e:
+        raise click.UsageError(str(e))
+    except ThresholdBreachedError as e:
+        click.secho('Run aborted. {}'.format(e), fg='red', err=True)
+        sys.exit(1)
+    passed = True
+    if 'profiler' in resources:
+        click.echo()
+        click.echo(resources['profiler'].report())
+    if 'thresholds' in resources:
+        results = resources['thresholds'].evaluate()
+        if results:
+            click.echo()
+            click.echo(resources['thresholds'].report(results))
+        passed = all(result.passed for result in results)
+    if 'validation' in resources:
+        click.echo()
+        click.echo(validation_report(resources['validation']))
+    if 'summary' in resources:
+        logger.info('Run saved: {}'.format(resources['summary'].run_id))
+    if 'regressions' in resources:
+        regressions = resources['regressions']
+        click.echo()
+        click.echo(RegressionCheck.report(
+            resources['baseline'],
+            resources['summary'],
+            regressions
+        ))
+        passed = passed and not any(result.regressed for result in regressions)
+    if not passed:
+        sys.exit(1)
+
+
+@cli.command(help='Find the maximum throughput of the target of a sequence '
+                  'file within a latency and error rate objective.')
+@click.option('--latency', type=float, required=True,
+              help='Maximum latency percentile in seconds')
+@click.option('--percentile', type=float, default=99.0, show_default=True,
+              help='Latency percentile checked against --latency')
+@click.option('--max-error-rate', type=float, default=0.01,
+              show_default=True,
+              help='Maximum ratio of failed requests')
+@click.option('--strategy', type=click.Choice(STRATEGIES), default='aimd',
+              show_default=True,
+              help='Concurrency controller')
+@click.option('--start', type=int, default=1, show_default=True,
+              help='Initial concurrency')
+@click.option('--max-concurrency', type=int, default=64, show_default=True,
+              help='Upper bound of concurrency')
+@click.option('--step-duration', type=float, default=10.0,
+              show_default=True,
+              help='Seconds spent at each concurrency level')
+@click.option('--increase', type=int, default=1, show_default=True,
+              help='Additive concurrency increase (aimd)')
+@click.option('--decrease', type=float, default=0.5, show_default=True,
+              help='Multiplicative concurrency decrease (aimd)')
+@click.option('--max-steps', type=int, default=20, show_default=True,
+              help='Maximum number of concurrency levels to measure')
+@click.option('-o', '--output', metavar='FILE',
+              type=click.Path(dir_okay=False, writable=True),
+              help='Write the load/latency curve to a CSV file')
+@click.option('-R', '--request-plugins',
+              multiple=True,
+              help='Additional request plugins (in Python import notation)')
+@click.option('-S', '--response-plugins',
+              multiple=True,
+              help='Additional response plugins (in Python import notation)')
+@click.option('-H', '--hooks',
+              multiple=True,
+              help='Modules subscribing to execution events with a '
+                   '`register_hooks(bus)` function '
+                   '(in Python import notation)')
+@click.argument('sequence_file',
+                type=click.Path(exists=True, dir_okay=False, readable=True))
+def capacity(output, sequence_file, **options):
+    logger.info('Loading file: {}'.format(sequence_file))
+    search = capacity_search(
         sequence_file=sequence_file,
-        logger=logger
+        logger=logger,
+        **options
+    )
+    click.echo()
+    click.echo(search.report())
+    if output is not None:
+        with open(output, 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(CapacityStep._fields)
+            writer.writerows(search.steps)
+
+
+@cli.command(help='Execute a sequence file against two base URLs and '
+                  'compare the latency of each step.')
+@click.option('-b', '--base-url', 'base_urls', multiple=True, required=True,
+              help='Base URL of a target; given twice')
+@click.option('--mode', type=click.Choice(COMPARISON_MODES),
+              default='interleaved', show_default=True,
+              help='Execute against the targets alternately or at the '
+                   'same time')
+@click.option('--alpha', type=float, default=0.05, show_default=True,
+              help='Significance level of latency differences')
+@click.option('-o', '--output', metavar='FILE',
+              type=click.Path(dir_okay=False, writable=True),
+              help='Write the comparison of each step as CSV')
+@click.option('-R', '--request-plugins',
+              multiple=True,
+              help='Additional request plugins (in Python import notation)')
+@click.option('-S', '--response-plugins',
+              multiple=True,
+              help='Additional response plugins (in Python import notation)')
+@click.argument('sequence_file',
+                type=click.Path(exists=True, dir_okay=False, readable=True))
+def compare(base_urls, output, sequence_file, **options):
+    if len(base_urls) != 2:
+        raise click.UsageError('--base-url must be given exactly twice')
+    logger.info('Loading file: {}'.format(sequence_file))
+    comparison, comparisons = compare_targets(
+        sequence_file=sequence_file,
+        base_urls=base_urls,
+        logger=logger,
+        **options
+    )
+    click.echo()
+    click.echo(comparison.report(comparisons))
+    if output is not None:
+        with open(output, 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow([
+                'step', 'requests_a', 'requests_b', 'p50_a', 'p50_b',
+                'p95_a', 'p95_b', 'error_rate_a', 'error_rate_b',
+                'p_value', 'significant'
+            ])
+            for row in comparisons:
+                writer.writerow(
+                    [row.name]
+                    + list(row.requests)
+                    + list(row.p50)
+                    + list(row.p95)
+                    + list(row.errors)
+                    + [row.p_value, row.significant]
+                )
+
+
+@cli.command(help='Compare a run of the history to a baseline run and '
+                  'display the regressions of each step.')
+@click.option('--history', metavar='DIRECTORY', default=DEFAULT_DIRECTORY,
+              show_default=True, type=click.Path(file_okay=False),
+              help='Run history directory')
+@_tolerance_option
+@click.option('--alpha', type=float, default=0.05, show_default=True,
+              help='Significance level of latency differences')
+@click.argument('baseline')
+@click.argument('current', default='latest')
+def diff(history, tolerances, alpha, baseline, current):
+    history = RunHistory(history)
+    try:
+        baseline, current = history.load(baseline), history.load(current)
+    except RunNotFoundError as e:
+        raise click.UsageError(str(e))
+    regressions = RegressionCheck(tolerances, alpha=alpha).compare(
+        baseline,
+        current
     )
+    click.echo(RegressionCheck.report(baseline, current, regressions))
+    if any(result.regressed for result in regressions):
+        sys.exit(1)
 
 
 @cli.group(help='View available plugins.')
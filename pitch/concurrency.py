@@ -1,22 +1,28 @@
 from abc import abstractmethod
+import threading
 
 from concurrent import futures
 
 
 class Pool(object):
-    def __init__(self, loops=1, concurrency=1):
+    def __init__(self, loops=1, concurrency=1, initializer=None, initargs=()):
         self._concurrency = concurrency
         self._loops = loops
+        self._initializer = initializer
+        self._initargs = initargs
 
-    @abstractmethod
     @property
+    @abstractmethod
     def executor_class(self) -> futures.Executor:
         pass
 
     def run(self, fn, *args, **kwargs):
         promises = []
 
-        with self.executor_class(max_workers=self._concurrency) as pool:
+        with self.executor_class(
+                max_workers=self._concurrency,
+                initializer=self._initializer,
+                initargs=self._initargs) as pool:
             for loop in range(self._loops):
                 promises.append(
                     pool.submit(fn, *args, **kwargs)
@@ -24,6 +30,21 @@ class Pool(object):
 
         return promises, [p.exception() for p in promises]
 
+    def run_indexed(self, fn, *args, **kwargs):
+        """ Same as `run`, passing the zero-based loop index to `fn`. """
+        promises = []
+
+        with self.executor_class(
+                max_workers=self._concurrency,
+                initializer=self._initializer,
+                initargs=self._initargs) as pool:
+            for loop in range(self._loops):
+                promises.append(
+                    pool.submit(fn, loop, *args, **kwargs)
+                )
+
+        return promises, [p.exception() for p in promises]
+
 
 class ThreadPool(Pool):
     @property
@@ -39,3 +60,43 @@ class ProcessPool(Pool):
 
 class AsyncIOPool(Pool):
     pass
+
+
+class SingleFlight(object):
+    """
+    Execute a function only once for concurrent callers sharing the same key.
+    Callers arriving while a call is in flight wait for it to complete and
+    receive its result (or exception).
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def do(self, key, fn, *args, **kwargs):
+        """
+        :return: the result and whether it was shared with another caller
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = futures.Future()
+
+        if not leader:
+            return call.result(), True
+
+        try:
+            call.set_result(fn(*args, **kwargs))
+        except BaseException as e:
+            call.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+        return call.result(), False
+
+
+def raise_first(exceptions):
+    for exception in exceptions:
+        if exception is not None:
+            raise exception
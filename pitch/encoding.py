@@ -1,5 +1,11 @@
 import yaml
 
+try:
+    # libyaml bindings, considerably faster than the pure Python parser
+    from yaml import CSafeLoader as Loader
+except ImportError:  # pragma: no cover
+    from yaml import SafeLoader as Loader
+
 
 def construct_yaml_str(self, node):
     # Override the default string handling function
@@ -7,4 +13,10 @@ def construct_yaml_str(self, node):
     return self.construct_scalar(node)
 
 
-yaml.SafeLoader.add_constructor(u'tag:yaml.org,2002:str', construct_yaml_str)
+for loader_class in {yaml.SafeLoader, Loader}:
+    loader_class.add_constructor(u'tag:yaml.org,2002:str', construct_yaml_str)
+
+
+def load(stream):
+    """ Parse a YAML document with the fastest available safe loader. """
+    return yaml.load(stream, Loader=Loader)
@@ -4,3 +4,27 @@ class InvalidPluginPhaseError(Exception):
 
 class UnknownPluginError(Exception):
     pass
+
+
+class InvalidFeederError(Exception):
+    pass
+
+
+class CassetteMissError(Exception):
+    pass
+
+
+class ThresholdBreachedError(Exception):
+    pass
+
+
+class StepTimeoutError(Exception):
+    pass
+
+
+class RunNotFoundError(Exception):
+    pass
+
+
+class SharedVariablesTimeoutError(Exception):
+    pass
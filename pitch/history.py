@@ -0,0 +1,374 @@
+import json
+import os
+import platform
+import random
+import re
+import socket
+import sys
+import time
+from collections import namedtuple
+
+from pitch.exceptions import RunNotFoundError
+from pitch.stats import RunStatistics, Statistics, mann_whitney
+from pitch.version import get_version
+
+DEFAULT_DIRECTORY = '.pitch/history'
+
+DEFAULT_PERCENTILES = (50, 95, 99)
+
+# Maximum relative increase of latency percentiles, absolute increase of
+# the error rate and relative decrease of throughput
+DEFAULT_TOLERANCES = {
+    'latency': 0.1,
+    'error_rate': 0.01,
+    'throughput': 0.1
+}
+
+Regression = namedtuple(
+    'Regression',
+    'step metric baseline current change regressed'
+)
+
+_REFERENCE = re.compile(r'^latest(?:~(\d+))?$')
+
+
+class RunSummary(object):
+    """
+    Statistics of a completed run, in total and per step, together with
+    metadata about the environment it was executed in.
+    """
+    def __init__(self, run_id: str, total: Statistics, steps: list,
+                 elapsed: float, metadata: dict = None):
+        self._run_id = run_id
+        self._total = total
+        self._steps = steps
+        self._elapsed = float(elapsed)
+        self._metadata = dict(metadata or {})
+
+    @classmethod
+    def from_run(cls, statistics: RunStatistics, elapsed: float,
+                 sequence_loader, **metadata) -> 'RunSummary':
+        steps = []
+        for index, step in enumerate(sequence_loader.get('steps', ())):
+            steps.append({
+                'index': index,
+                'name': step.get('name'),
+                'url': step.get('url'),
+                'statistics': statistics.step(index)
+            })
+        metadata = dict(
+            pitch=get_version(),
+            python=platform.python_version(),
+            platform=platform.platform(),
+            hostname=socket.gethostname(),
+            argv=sys.argv,
+            sequence_file=sequence_loader.filename,
+            base_url=sequence_loader.get('base_url', None),
+            finished=time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+            **metadata
+        )
+        return cls(
+            run_id=new_run_id(),
+            total=statistics.total,
+            steps=steps,
+            elapsed=elapsed,
+            metadata=metadata
+        )
+
+    @property
+    def run_id(self):
+        return self._run_id
+
+    @property
+    def total(self) -> Statistics:
+        return self._total
+
+    @property
+    def steps(self) -> list:
+        return self._steps
+
+    @property
+    def elapsed(self):
+        return self._elapsed
+
+    @property
+    def metadata(self) -> dict:
+        return self._metadata
+
+    def throughput(self, statistics: Statistics):
+        if not statistics.requests or self._elapsed <= 0:
+            return None
+        return statistics.requests / self._elapsed
+
+    def to_dict(self) -> dict:
+        return {
+            'run_id': self._run_id,
+            'elapsed': self._elapsed,
+            'metadata': self._metadata,
+            'total': self._total.to_dict(),
+            'steps': [
+                dict(step, statistics=step['statistics'].to_dict())
+                for step in self._steps
+            ]
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> 'RunSummary':
+        return cls(
+            run_id=data['run_id'],
+            total=Statistics.from_dict(data['total']),
+            steps=[
+                dict(step, statistics=Statistics.from_dict(step['statistics']))
+                for step in data['steps']
+            ],
+            elapsed=data['elapsed'],
+            metadata=data.get('metadata')
+        )
+
+
+def new_run_id() -> str:
+    """ Identifier of a run, sorting in the order runs were saved. """
+    return '{}-{:04x}'.format(
+        time.strftime('%Y%m%dT%H%M%SZ', time.gmtime()),
+        random.getrandbits(16)
+    )
+
+
+class RunHistory(object):
+    """
+    Directory keeping a JSON summary file for each run.
+
+    Runs are referred to by identifier, by file path, or relative to the
+    most recent run: `latest`, `latest~1` (the run before), etc.
+    """
+    def __init__(self, directory: str = DEFAULT_DIRECTORY):
+        self._directory = os.path.abspath(os.path.expanduser(directory))
+
+    @classmethod
+    def from_definition(cls, definition, directory=None):
+        """
+        Create a history from the sequence-level `history` option; either
+        a directory or a mapping with `directory`, `baseline`,
+        `tolerances`, `percentiles` and `alpha`.
+
+        :param directory: overrides the directory of the sequence file
+        """
+        if directory is not None:
+            return cls(directory)
+        if not definition:
+            return None
+        if isinstance(definition, str):
+            return cls(definition)
+        return cls(definition.get('directory', DEFAULT_DIRECTORY))
+
+    @property
+    def directory(self):
+        return self._directory
+
+    def runs(self) -> list:
+        """ Run identifiers, from the oldest to the most recent. """
+        try:
+            filenames = os.listdir(self._directory)
+        except FileNotFoundError:
+            return []
+        return sorted(
+            filename[:-len('.json')]
+            for filename in filenames
+            if filename.endswith('.json')
+        )
+
+    def path(self, run_id: str) -> str:
+        return os.path.join(self._directory, '{}.json'.format(run_id))
+
+    def save(self, summary: RunSummary) -> str:
+        os.makedirs(self._directory, exist_ok=True)
+        path = self.path(summary.run_id)
+        # Readers never see a partially written summary
+        with open(path + '.tmp', 'w') as f:
+            json.dump(summary.to_dict(), f, indent=2)
+        os.replace(path + '.tmp', path)
+        return path
+
+    def resolve(self, reference: str) -> str:
+        """ :return: the path of the summary file of a run reference """
+        match = _REFERENCE.match(reference)
+        if match is not None:
+            runs = self.runs()
+            offset = int(match.group(1) or 0)
+            if offset >= len(runs):
+                raise RunNotFoundError(
+                    'No run {} in {}'.format(reference, self._directory)
+                )
+            return self.path(runs[-1 - offset])
+        if os.path.isfile(reference):
+            return reference
+        path = self.path(reference)
+        if not os.path.isfile(path):
+            raise RunNotFoundError(
+                'No run {} in {}'.format(reference, self._directory)
+            )
+        return path
+
+    def load(self, reference: str) -> RunSummary:
+        with open(self.resolve(reference)) as f:
+            return RunSummary.from_dict(json.load(f))
+
+
+class RegressionCheck(object):
+    """
+    Compare a run to a baseline run, step by step.
+
+    - `latency`: a percentile regressed when it increased by more than the
+      tolerance (relative) and the latency distributions differ at the
+      `alpha` significance level (Mann-Whitney U test)
+    - `error_rate`: regressed when it increased by more than the tolerance
+      (absolute)
+    - `throughput`: regressed when it decreased by more than the tolerance
+      (relative)
+
+    Steps are matched by name, or by position when unnamed.
+    """
+    def __init__(self, tolerances: dict = None,
+                 percentiles=DEFAULT_PERCENTILES, alpha: float = 0.05):
+        self._tolerances = dict(DEFAULT_TOLERANCES)
+        for metric, tolerance in (tolerances or {}).items():
+            if metric not in DEFAULT_TOLERANCES:
+                raise ValueError('Unknown tolerance metric: {}'.format(metric))
+            self._tolerances[metric] = float(tolerance)
+        self._percentiles = [float(p) for p in percentiles]
+        self._alpha = float(alpha)
+
+    @classmethod
+    def from_definition(cls, definition, tolerances=None):
+        """
+        Create a check from the sequence-level `history` option; the
+        `tolerances` override those of the sequence file.
+        """
+        options = dict(definition) if isinstance(definition, dict) else {}
+        options = {
+            key: options[key]
+            for key in ('tolerances', 'percentiles', 'alpha')
+            if key in options
+        }
+        options['tolerances'] = dict(
+            options.get('tolerances') or {},
+            **(tolerances or {})
+        )
+        return cls(**options)
+
+    def compare(self, baseline: RunSummary, current: RunSummary) -> list:
+        """ :return: a `Regression` per step and metric """
+        results = []
+        steps = [('total', baseline.total, current.total)]
+        baseline_steps = {_key(step): step for step in baseline.steps}
+        for step in current.steps:
+            matched = baseline_steps.get(_key(step))
+            if matched is not None:
+                steps.append((
+                    _label(step),
+                    matched['statistics'],
+                    step['statistics']
+                ))
+        for label, before, after in steps:
+            if not before.requests or not after.requests:
+                continue
+            results.extend(self._latency(label, before, after))
+            results.append(self._regression(
+                label,
+                'error_rate',
+                before.error_rate,
+                after.error_rate,
+                after.error_rate - before.error_rate >
+                self._tolerances['error_rate']
+            ))
+            before_throughput = baseline.throughput(before)
+            after_throughput = current.throughput(after)
+            if before_throughput and after_throughput is not None:
+                results.append(self._regression(
+                    label,
+                    'throughput',
+                    before_throughput,
+                    after_throughput,
+                    after_throughput < before_throughput *
+                    (1 - self._tolerances['throughput'])
+                ))
+        return results
+
+    def _latency(self, label, before, after):
+        test = mann_whitney(before.latency, after.latency)
+        significant = test is not None and test.p_value < self._alpha
+        for percentile in self._percentiles:
+            value_before = before.latency.percentile(percentile)
+            value_after = after.latency.percentile(percentile)
+            yield self._regression(
+                label,
+                'p{:g}'.format(percentile),
+                value_before,
+                value_after,
+                significant and value_after > value_before *
+                (1 + self._tolerances['latency'])
+            )
+
+    @staticmethod
+    def _regression(step, metric, baseline, current, regressed):
+        if baseline:
+            change = (current - baseline) / baseline
+        else:
+            change = None
+        return Regression(
+            step=step,
+            metric=metric,
+            baseline=baseline,
+            current=current,
+            change=change,
+            regressed=bool(regressed)
+        )
+
+    @staticmethod
+    def report(baseline: RunSummary, current: RunSummary,
+               results: list) -> str:
+        lines = [
+            'Baseline: {}'.format(baseline.run_id),
+            'Current:  {}'.format(current.run_id),
+            ''
+        ]
+        width = max([len(result.step) for result in results] + [4])
+        header = '{:<{width}} {:<10} {:>12} {:>12} {:>9} {:>10}'.format(
+            'step', 'metric', 'baseline', 'current', 'change', 'result',
+            width=width
+        )
+        lines.extend([header, '-' * len(header)])
+        for result in results:
+            lines.append(
+                '{:<{width}} {:<10} {:>12} {:>12} {:>9} {:>10}'.format(
+                    result.step,
+                    result.metric,
+                    _format(result.metric, result.baseline),
+                    _format(result.metric, result.current),
+                    '-' if result.change is None
+                    else '{:+.1f}%'.format(100 * result.change),
+                    'REGRESSED' if result.regressed else 'ok',
+                    width=width
+                )
+            )
+        regressions = sum(result.regressed for result in results)
+        lines.extend(['', '{} regression(s)'.format(regressions)])
+        return '\n'.join(lines)
+
+
+def _key(step):
+    return step['name'] if step.get('name') is not None else step['index']
+
+
+def _label(step):
+    return str(step.get('name') or step.get('url') or step['index'])
+
+
+def _format(metric, value):
+    if value is None:
+        return '-'
+    if metric.startswith('p'):
+        return '{:.1f}ms'.format(1000 * value)
+    if metric == 'error_rate':
+        return '{:.2f}%'.format(100 * value)
+    return '{:.2f}/s'.format(value)
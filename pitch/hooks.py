@@ -0,0 +1,83 @@
+from collections import namedtuple
+
+
+def _event(hook, fields):
+    """
+    Create an event type; `hook` is the name of the bus attribute
+    holding the subscribers of the event.
+    """
+    event_type = namedtuple(
+        ''.join(part.capitalize() for part in hook.split('_')),
+        fields
+    )
+    event_type.hook = hook
+    return event_type
+
+
+RunStart = _event('run_start', 'time')
+RunEnd = _event('run_end', 'time duration')
+StepStart = _event('step_start', 'time step item')
+StepEnd = _event('step_end', 'time step item duration')
+RequestSent = _event('request_sent', 'time step request')
+FirstByte = _event('first_byte', 'time step request elapsed')
+ResponseDone = _event('response_done', 'time step request response elapsed')
+PluginDone = _event('plugin_done', 'time step phase plugin duration')
+Error = _event('error', 'time step exception')
+
+EVENTS = (
+    RunStart,
+    RunEnd,
+    StepStart,
+    StepEnd,
+    RequestSent,
+    FirstByte,
+    ResponseDone,
+    PluginDone,
+    Error
+)
+
+
+class HookBus(object):
+    """
+    Publish executor lifecycle events to subscribed callbacks.
+
+    The subscribers of each event are stored in a tuple attribute named
+    after the event (e.g. `bus.response_done`). Emitters check that
+    attribute before creating the event, so events without subscribers
+    cost a single attribute lookup:
+
+        if hooks.response_done:
+            hooks.emit(ResponseDone(...))
+
+    Callbacks are called synchronously, in the emitting thread, with the
+    event as the only argument.
+    """
+    def __init__(self):
+        for event_type in EVENTS:
+            setattr(self, event_type.hook, ())
+
+    def subscribe(self, event_type, callback):
+        self._validate(event_type)
+        setattr(
+            self,
+            event_type.hook,
+            getattr(self, event_type.hook) + (callback,)
+        )
+        return callback
+
+    def unsubscribe(self, event_type, callback):
+        self._validate(event_type)
+        setattr(self, event_type.hook, tuple(
+            subscriber
+            for subscriber in getattr(self, event_type.hook)
+            if subscriber is not callback
+        ))
+
+    def emit(self, event):
+        for callback in getattr(self, event.hook):
+            callback(event)
+
+    @staticmethod
+    def _validate(event_type):
+        if event_type not in EVENTS:
+            raise ValueError('Unknown event type: {}'.format(event_type))
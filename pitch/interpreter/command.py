@@ -1,9 +1,11 @@
 import itertools
-
-import yaml
+import time
 
 from boltons.typeutils import get_all_subclasses
 
+from pitch.encoding import load
+from pitch.hooks import StepStart, StepEnd
+
 
 def get_loop_classes():
     return get_all_subclasses(Loop)
@@ -50,7 +52,7 @@ class Conditional(ControlFlowStatement):
     __default__ = 'true'
 
     def _parse(self, expression):
-        return yaml.safe_load(
+        return load(
             self.context.step['rendering'].render(expression)
         )
 
@@ -110,10 +112,15 @@ class Nested(Loop):
         for item in itertools.product(*self.items):
             yield item
 
+    def iterate(self):
+        return self.evaluate()
+
 
 class Client(object):
-    def __init__(self, context_proxy):
+    def __init__(self, context_proxy, stop_at: float = None):
         self._context_proxy = context_proxy
+        # Monotonic time after which no further loop items are executed
+        self._stop_at = stop_at
 
     @property
     def context(self):
@@ -121,15 +128,48 @@ class Client(object):
 
     def run(self, instruction):
         results = []
-
-        for item in self._generate_loop(instruction).iterate():
+        profiler = self.context.globals['profiler']
+        hooks = self.context.globals['hooks']
+        checkpoint = self.context.globals['checkpoint']
+        step = self.context.step['index']
+
+        with profiler.phase('loop'):
+            loop = self._generate_loop(instruction)
+        for index, item in enumerate(loop.iterate()):
+            if self._stop_at is not None and \
+                    time.monotonic() >= self._stop_at:
+                break
+            if checkpoint is not None and \
+                    checkpoint.is_completed(step, index, item):
+                continue
             self._set_loop_variable(item)
-            if self._evaluate_conditional(instruction):
+            with profiler.phase('conditional'):
+                condition = self._evaluate_conditional(instruction)
+            if condition:
+                if hooks.step_start:
+                    hooks.emit(StepStart(
+                        time=time.time(),
+                        step=step,
+                        item=item
+                    ))
+                started = time.perf_counter()
                 result = Command(fn=instruction['_function']).execute(
                     *instruction['_args'],
                     **instruction['_kwargs']
                 )
                 results.append(result)
+                if checkpoint is not None:
+                    checkpoint.complete(
+                        step, index, item,
+                        self.context.templating['variables']
+                    )
+                if hooks.step_end:
+                    hooks.emit(StepEnd(
+                        time=time.time(),
+                        step=step,
+                        item=item,
+                        duration=time.perf_counter() - started
+                    ))
 
         return results
 
@@ -148,7 +188,8 @@ class Client(object):
         loop_items = self.context.step['rendering'].get(
             instruction[loop.keyword]
         )
-        loop_items = self.context.step['rendering'].get(loop_items)
+        if isinstance(loop_items, str):
+            loop_items = self.context.step['rendering'].get(loop_items)
 
         return loop_items
 
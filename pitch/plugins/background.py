@@ -0,0 +1,79 @@
+import logging
+import queue
+import threading
+
+logger = logging.getLogger(__name__)
+
+_STOP = object()
+
+
+class BackgroundPlugins(object):
+    """
+    Bounded queue of plugin executions, run by a number of worker threads
+    off the request path.
+
+    Submitting blocks while the queue is full, so that slow plugins apply
+    backpressure to the requests instead of accumulating responses in
+    memory. Failed executions are logged and counted; they do not affect
+    the step that submitted them.
+    """
+    def __init__(self, workers: int = 1, queue_size: int = 1000):
+        self._queue = queue.Queue(maxsize=max(1, int(queue_size)))
+        self._errors = 0
+        self._errors_lock = threading.Lock()
+        self._threads = [
+            threading.Thread(
+                target=self._work,
+                name='pitch-background-{}'.format(index),
+                daemon=True
+            )
+            for index in range(max(1, int(workers)))
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    @classmethod
+    def from_definition(cls, definition):
+        """
+        Create the queue from the sequence-level `background_plugins`
+        option; either `true` or a mapping with `workers` and `queue_size`.
+        """
+        if not definition:
+            return None
+        if definition is True:
+            definition = {}
+        return cls(**definition)
+
+    @property
+    def errors(self) -> int:
+        return self._errors
+
+    def submit(self, function, *args):
+        self._queue.put((function, args))
+
+    def _work(self):
+        while True:
+            task = self._queue.get()
+            try:
+                if task is _STOP:
+                    return
+                function, args = task
+                try:
+                    function(*args)
+                except Exception:
+                    logger.exception('Background plugin execution failed')
+                    with self._errors_lock:
+                        self._errors += 1
+            finally:
+                self._queue.task_done()
+
+    def close(self):
+        """ Wait for the pending executions and stop the workers. """
+        for _ in self._threads:
+            self._queue.put(_STOP)
+        for thread in self._threads:
+            thread.join()
+        if self._errors:
+            logger.warning(
+                '{} background plugin executions failed'.format(self._errors)
+            )
@@ -6,6 +6,9 @@ class BasePlugin(object):
     _phase = None
     _name = None
     _result = None
+    # Plugins only reading the context, e.g. writing output, may run
+    # in the background when the `background_plugins` option is set.
+    _detached = False
 
     @property
     def name(self):
@@ -23,6 +26,19 @@ class BasePlugin(object):
     def get_phase(cls):
         return cls._phase
 
+    @classmethod
+    def is_detached(cls):
+        return cls._detached
+
+    @classmethod
+    def raw_arguments(cls, arguments: dict) -> set:
+        """
+        :return: the names of the arguments passed to the plugin as
+            written, e.g. expressions evaluated by the plugin itself,
+            instead of rendered
+        """
+        return set()
+
     def execute(self, plugin_context):
         pass
 
@@ -32,6 +48,7 @@ class LoggerPlugin(BasePlugin):
     Setup a logger, attach a file handler and log a message.
     """
     _name = 'logger'
+    _detached = True
 
     def __init__(self, logger_name=None, message=None, **kwargs):
         if logger_name is None:
@@ -62,7 +79,12 @@ class DelayPlugin(BasePlugin):
         self._delay_seconds = float(seconds)
 
     def execute(self, plugin_context):
-        time.sleep(self._delay_seconds)
+        deadline = plugin_context.step['deadline']
+        if deadline is None:
+            time.sleep(self._delay_seconds)
+        else:
+            time.sleep(min(self._delay_seconds, deadline.remaining()))
+            deadline.check()
 
 
 class UpdateContext(BasePlugin):
@@ -8,6 +8,11 @@ import requests
 
 from pitch.plugins.common import BasePlugin, LoggerPlugin, UpdateContext
 from pitch.common.utils import to_iterable
+from pitch.retention import extract_paths
+from pitch.sinks import get_sink
+from pitch.templating.jinja_custom_extensions import compile_query, \
+    query_document
+from pitch.validation import get_validator
 
 logger = logging.getLogger()
 
@@ -18,9 +23,80 @@ class BaseResponsePlugin(BasePlugin):
 
 class ResponseUpdateContext(UpdateContext, BaseResponsePlugin):
     """ Add variables to the template context after the response has completed
+
+    Variables listed in `keep` are evaluated as expressions, without being
+    rendered first, and only the given sub-paths of the result are stored,
+    e.g. `keep: {user: [id, name]}`.
+    Variables listed in `extract` are set to the result of a JMESPath (or
+    JSONPath, when starting with `$`) query over the JSON response, or over
+    the result of the `source` expression.
     """
     _name = 'post_register'
 
+    def __init__(self, keep=None, extract=None, source=None, **updates):
+        self._keep = keep or {}
+        unknown = set(self._keep) - set(updates)
+        if unknown:
+            raise ValueError(
+                'Cannot keep unregistered variables: {}'.format(
+                    ', '.join(sorted(unknown))
+                )
+            )
+        self._extract = {
+            name: compile_query(expression)
+            for name, expression in (extract or {}).items()
+        }
+        duplicate = set(self._extract) & set(updates)
+        if duplicate:
+            raise ValueError(
+                'Cannot both register and extract variables: {}'.format(
+                    ', '.join(sorted(duplicate))
+                )
+            )
+        self._source = source
+        super(ResponseUpdateContext, self).__init__(**updates)
+
+    @classmethod
+    def raw_arguments(cls, arguments):
+        return set(arguments.get('keep') or {})
+
+    def execute(self, plugin_context):
+        updates = dict(self._updates)
+        for name, paths in self._keep.items():
+            value = updates[name]
+            if isinstance(value, str):
+                value = plugin_context.step['rendering'].get(value)
+            updates[name] = extract_paths(value, to_iterable(paths))
+        if self._extract:
+            if self._source is None:
+                document = plugin_context.templating['response']
+            else:
+                document = plugin_context.step['rendering'].get(self._source)
+            document = query_document(document)
+            for name, query in self._extract.items():
+                updates[name] = query.search(document)
+        plugin_context.templating['variables'].update(updates)
+
+
+class ShareVariablesPlugin(BaseResponsePlugin):
+    """
+    Add variables to the store shared by all threads and processes
+    """
+    _name = 'share'
+
+    def __init__(self, ttl=None, **updates):
+        self._ttl = ttl
+        self._updates = updates
+
+    def execute(self, plugin_context):
+        shared = plugin_context.templating['shared']
+        if shared is None:
+            raise RuntimeError(
+                'The share plugin requires the shared_variables option'
+            )
+        for name, value in self._updates.items():
+            shared.set(name, value, ttl=self._ttl)
+
 
 class JSONResponsePlugin(BaseResponsePlugin):
     """
@@ -38,6 +114,35 @@ class JSONResponsePlugin(BaseResponsePlugin):
             self._result = (False, e)
 
 
+class ValidateResponsePlugin(BaseResponsePlugin):
+    """
+    Validate the JSON response against a schema and count the violations
+    """
+    _name = 'validate_response'
+
+    def __init__(self, schema=None, schema_file=None, marshmallow=None,
+                 many=False, sample=1, name=None):
+        self._validator = get_validator(
+            schema=schema,
+            schema_file=schema_file,
+            marshmallow=marshmallow,
+            many=many,
+            sample=sample,
+            name=name
+        )
+        super(ValidateResponsePlugin, self).__init__()
+
+    def execute(self, plugin_context):
+        if not self._validator.sampled():
+            return
+        response = plugin_context.templating['response']
+        try:
+            document = query_document(response)
+        except ValueError:
+            document = None
+        self._result = self._validator.validate(document, url=response.url)
+
+
 class ResponseLoggerPlugin(LoggerPlugin, BaseResponsePlugin):
     """
     Setup a logger, attach a file handler and log a message.
@@ -50,6 +155,7 @@ class JSONFileOutputPlugin(BaseResponsePlugin):
     Write a JSON-serializable response to a file
     """
     _name = 'json_file_output'
+    _detached = True
 
     def __init__(self, filename, create_dirs=True):
 
@@ -71,6 +177,90 @@ class JSONFileOutputPlugin(BaseResponsePlugin):
             json.dump(plugin_context.templating['response'].json(), f)
 
 
+# Media types which may or may not be used for JSON bodies
+_AMBIGUOUS_MEDIA_TYPES = ('', 'text/plain', 'application/octet-stream')
+# Closing delimiter of JSON texts, by opening delimiter
+_JSON_DELIMITERS = {ord('{'): ord('}'), ord('['): ord(']'), ord('"'): ord('"')}
+
+
+def _is_json(response, body: bytes) -> bool:
+    """
+    Whether a stripped response body is JSON text; the body is only parsed
+    when neither `response_as_json` nor the content type tell.
+    """
+    if getattr(response, 'as_json', None) is not None:
+        return True
+    media_type = response.headers.get('Content-Type', '').split(';')[0]
+    media_type = media_type.strip().lower()
+    if media_type == 'application/json' or media_type.endswith('+json'):
+        # Truncated bodies no longer end with the closing delimiter
+        if len(body) > 1 and _JSON_DELIMITERS.get(body[0]) == body[-1]:
+            return True
+    elif media_type not in _AMBIGUOUS_MEDIA_TYPES:
+        return False
+    try:
+        json.loads(body)
+    except ValueError:
+        return False
+    return True
+
+
+class JSONLinesOutputPlugin(BaseResponsePlugin):
+    """
+    Append each JSON response as a line to a buffered JSON Lines file;
+    other responses are written as `{"body": text}`
+    """
+    _name = 'jsonl_output'
+    _detached = True
+
+    def __init__(self, filename, create_dirs=True, compression=None,
+                 include_metadata=False, buffer_size=1 << 20,
+                 flush_interval=1.0, max_bytes=None, rotate_interval=None):
+        filename = os.path.abspath(os.path.expanduser(filename))
+        directory = os.path.dirname(filename)
+        if not os.path.exists(directory):
+            if create_dirs:
+                os.makedirs(directory, exist_ok=True)
+            else:
+                raise OSError(
+                    "Directory {} does not exist".format(directory)
+                )
+        self._sink = get_sink(
+            filename,
+            compression=compression,
+            buffer_size=buffer_size,
+            flush_interval=flush_interval,
+            max_bytes=max_bytes,
+            rotate_interval=rotate_interval
+        )
+        self._include_metadata = include_metadata
+        super(JSONLinesOutputPlugin, self).__init__()
+
+    def execute(self, plugin_context):
+        response = plugin_context.templating['response']
+        # JSON text can only contain line breaks as insignificant
+        # whitespace, so JSON bodies are written as-is on a single line
+        # instead of being re-encoded; other bodies are written as text.
+        body = response.content.strip().replace(b'\r', b' ').replace(
+            b'\n', b' '
+        )
+        if not body:
+            body = b'null'
+        elif not _is_json(response, body):
+            body = json.dumps(response.text).encode()
+            if not self._include_metadata:
+                body = b''.join([b'{"body": ', body, b'}'])
+        if self._include_metadata:
+            body = b''.join([
+                b'{"url": ', json.dumps(response.url).encode(),
+                b', "status_code": ', str(response.status_code).encode(),
+                b', "elapsed": ',
+                str(response.elapsed.total_seconds()).encode(),
+                b', "body": ', body, b'}'
+            ])
+        self._sink.write(body)
+
+
 class ProfilerPlugin(BaseResponsePlugin):
     """ Keep track of the time required for the HTTP request & processing
     """
@@ -104,6 +294,7 @@ class StdOutWriterPlugin(BaseResponsePlugin):
     Print a JSON-serializable response to STDOUT
     """
     _name = 'stdout_writer'
+    _detached = True
 
     def execute(self, plugin_context):
         sys.stdout.write(
@@ -1,14 +1,18 @@
-from copy import deepcopy
+from copy import copy, deepcopy
 import inspect
 import importlib
 import itertools
 import logging
 import re
+import time
 
 from pitch.exceptions import InvalidPluginPhaseError, UnknownPluginError
+from pitch.hooks import PluginDone
+from requests.structures import CaseInsensitiveDict
 from pitch.plugins.structures import registry
 from pitch.plugins.request import BaseRequestPlugin
 from pitch.plugins.response import BaseResponsePlugin
+from pitch.structures import Context, JinjaEvaluator
 
 logger = logging.getLogger(__name__)
 
@@ -92,7 +96,15 @@ def list_plugins():
     return plugins
 
 
-def execute_plugins(context):
+def execute_plugins(context, on_complete=None):
+    """
+    Execute the plugins of the current step phase.
+
+    With a background queue in the context globals, detached plugins are
+    executed on the queue with a snapshot of the context; their arguments
+    are still rendered inline. `on_complete` is called once all plugins,
+    including the detached ones, have been executed.
+    """
     step_plugins = context.step['definition'].get('plugins')
     phase_plugins = registry.by_phase(context.step['phase'])
     step_phase_plugins = filter(
@@ -104,15 +116,56 @@ def execute_plugins(context):
     _valid_phase_or_raise(context.step['phase'])
 
     phase_object = context.templating[context.step['phase']]
+    background = context.globals['background']
 
     phase_object.plugins = []
+    detached = []
     for plugin_execution_args in step_phase_plugins:
+        plugin_name, plugin_args = _render_plugin_args(
+            context,
+            plugin_execution_args
+        )
+        if background is not None and \
+                phase_plugins[plugin_name].is_detached():
+            detached.append((plugin_name, plugin_args))
+            continue
         phase_object.plugins.append(
-            _execute_plugin(
-                context=context,
-                plugin_args=plugin_execution_args
-            )
+            _execute_plugin(context, plugin_name, plugin_args)
+        )
+
+    if detached:
+        background.submit(
+            _execute_detached,
+            snapshot_context(context),
+            detached,
+            on_complete
         )
+    elif on_complete is not None:
+        on_complete()
+
+
+def snapshot_context(context):
+    """
+    Copy of the context for plugins executed after the step has moved on;
+    it keeps the current request, response and variables.
+    """
+    templating = CaseInsensitiveDict(context.templating)
+    templating['variables'] = copy(templating['variables'])
+    step = CaseInsensitiveDict(context.step)
+    step['rendering'] = JinjaEvaluator(
+        templating,
+        profiler=context.globals['profiler']
+    )
+    return Context(globals=context.globals, templating=templating, step=step)
+
+
+def _execute_detached(context, plugins, on_complete=None):
+    try:
+        for plugin_name, plugin_args in plugins:
+            _execute_plugin(context, plugin_name, plugin_args)
+    finally:
+        if on_complete is not None:
+            on_complete()
 
 
 def _valid_phase_or_raise(name):
@@ -120,26 +173,44 @@ def _valid_phase_or_raise(name):
         raise InvalidPluginPhaseError('Invalid Phase: {}'.format(name))
 
 
-def _execute_plugin(context, plugin_args):
-    phase = context.step['phase']
+def _render_plugin_args(context, plugin_args):
     renderer = context.step['rendering'].render_nested
-    plugin_execution_args = renderer(
-        deepcopy(plugin_args)
-    )
-    plugin_name = renderer(plugin_execution_args['plugin'])
+    plugin_name = renderer(plugin_args['plugin'])
+    plugin_class = registry.by_phase(context.step['phase']).get(plugin_name)
+    raw = set() if plugin_class is None \
+        else plugin_class.raw_arguments(plugin_args)
+    return plugin_name, {
+        key: deepcopy(value) if key in raw else renderer(deepcopy(value))
+        for key, value in plugin_args.items()
+        if key != 'plugin'
+    }
+
+
+def _execute_plugin(context, plugin_name, plugin_args):
+    phase = context.step['phase']
     current_plugin_display_info = "plugin={}.plugins.{}".format(
         phase,
         plugin_name
     )
-    plugin_instance = registry.by_phase(phase)[plugin_name](
-        **{key: value
-           for key, value in plugin_execution_args.items()
-           if key != 'plugin'}
-    )
-    logger.info(
-        "{} status={}".format(current_plugin_display_info, 'running')
-    )
-    plugin_instance.execute(context)
+    started = time.perf_counter()
+    with context.globals['profiler'].phase(
+            '{}.plugins.{}'.format(phase, plugin_name)):
+        plugin_instance = registry.by_phase(phase)[plugin_name](
+            **plugin_args
+        )
+        logger.info(
+            "{} status={}".format(current_plugin_display_info, 'running')
+        )
+        plugin_instance.execute(context)
+    hooks = context.globals['hooks']
+    if hooks.plugin_done:
+        hooks.emit(PluginDone(
+            time=time.time(),
+            step=context.step['index'],
+            phase=phase,
+            plugin=plugin_name,
+            duration=time.perf_counter() - started
+        ))
     logger.info(
         "{} status={}".format(current_plugin_display_info, 'done')
     )
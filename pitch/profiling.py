@@ -0,0 +1,253 @@
+import cProfile
+import logging
+import os
+import pstats
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import nullcontext
+
+logger = logging.getLogger(__name__)
+
+
+class NullProfiler(object):
+    """ Profiler used when profiling is disabled; all timers are no-ops. """
+    _timer = nullcontext()
+
+    def phase(self, name):
+        return self._timer
+
+    def start_thread(self):
+        pass
+
+    def stop_thread(self):
+        pass
+
+
+NULL_PROFILER = NullProfiler()
+
+
+class _PhaseTimer(object):
+    __slots__ = ('_profiler', '_name')
+
+    def __init__(self, profiler, name):
+        self._profiler = profiler
+        self._name = name
+
+    def __enter__(self):
+        self._profiler._enter(self._name)
+
+    def __exit__(self, *exc_info):
+        self._profiler._exit()
+
+
+class PhaseProfiler(NullProfiler):
+    """
+    Accumulate wall-clock time per execution phase.
+
+    Phases may be nested (e.g. template rendering inside request plugins);
+    both the inclusive time and the self time, excluding nested phases, are
+    kept. Each thread accumulates into its own table, which are merged only
+    when the statistics are requested.
+
+    Optionally each worker thread also runs under `cProfile` and a
+    background thread samples the stacks of all threads, in the collapsed
+    format used by flamegraph tools.
+    """
+    def __init__(self, cprofile_output=None, stacks_output=None,
+                 sample_interval=0.005):
+        self._cprofile_output = cprofile_output
+        self._stacks_output = stacks_output
+        self._sample_interval = sample_interval
+        self._initialize()
+
+    def _initialize(self):
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._tables = []
+        self._profiles = []
+        self._stacks = Counter()
+        self._sampler = None
+
+    def __getstate__(self):
+        return {
+            '_cprofile_output': self._cprofile_output,
+            '_stacks_output': self._stacks_output,
+            '_sample_interval': self._sample_interval
+        }
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._initialize()
+
+    def phase(self, name):
+        return _PhaseTimer(self, name)
+
+    def _enter(self, name):
+        try:
+            stack = self._local.stack
+        except AttributeError:
+            stack = self._register_thread()
+        stack.append([name, time.perf_counter(), 0.0])
+
+    def _exit(self):
+        stack = self._local.stack
+        name, start, nested = stack.pop()
+        elapsed = time.perf_counter() - start
+        entry = self._local.table.get(name)
+        if entry is None:
+            entry = self._local.table[name] = [0, 0.0, 0.0]
+        entry[0] += 1
+        entry[1] += elapsed
+        entry[2] += elapsed - nested
+        if stack:
+            stack[-1][2] += elapsed
+
+    def _register_thread(self):
+        self._local.stack = []
+        self._local.table = {}
+        with self._lock:
+            self._tables.append(self._local.table)
+        return self._local.stack
+
+    @property
+    def cprofile_output(self):
+        return self._cprofile_output
+
+    @property
+    def stacks_output(self):
+        return self._stacks_output
+
+    def start_thread(self):
+        if self._cprofile_output is None:
+            return
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+        except ValueError:
+            # Interpreters which allow a single active profiler
+            # can only profile one thread at a time.
+            logger.warning('cProfile is already active in another thread')
+            return
+        self._local.profile = profile
+
+    def stop_thread(self):
+        profile = getattr(self._local, 'profile', None)
+        if profile is None:
+            return
+        profile.disable()
+        del self._local.profile
+        with self._lock:
+            self._profiles.append(profile)
+
+    def start_sampling(self):
+        if self._stacks_output is None:
+            return
+        self._sampler = threading.Thread(
+            target=self._sample,
+            name='pitch-profiler-sampler',
+            daemon=True
+        )
+        self._sampler_stop = threading.Event()
+        self._sampler.start()
+
+    def stop_sampling(self):
+        if self._sampler is None:
+            return
+        self._sampler_stop.set()
+        self._sampler.join()
+        self._sampler = None
+
+    def _sample(self):
+        own_id = threading.get_ident()
+        while not self._sampler_stop.wait(self._sample_interval):
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append('{}:{}'.format(
+                        os.path.basename(code.co_filename),
+                        code.co_name
+                    ))
+                    frame = frame.f_back
+                self._stacks[';'.join(reversed(stack))] += 1
+
+    def stats(self) -> dict:
+        """
+        :return: mapping of phase name to `[calls, total time, self time]`
+        """
+        merged = {}
+        with self._lock:
+            tables = list(self._tables)
+        for table in tables:
+            for name, (calls, total, own) in list(table.items()):
+                entry = merged.setdefault(name, [0, 0.0, 0.0])
+                entry[0] += calls
+                entry[1] += total
+                entry[2] += own
+        return merged
+
+    def stacks(self) -> Counter:
+        return Counter(self._stacks)
+
+    def merge(self, stats: dict, stacks: Counter = None):
+        """ Add statistics collected by another (worker process) profiler. """
+        with self._lock:
+            self._tables.append({
+                name: list(entry) for name, entry in stats.items()
+            })
+            if stacks:
+                self._stacks.update(stacks)
+
+    def report(self) -> str:
+        rows = sorted(
+            self.stats().items(),
+            key=lambda item: item[1][2],
+            reverse=True
+        )
+        header = '{:<48} {:>10} {:>12} {:>12} {:>12}'.format(
+            'phase', 'calls', 'total (s)', 'self (s)', 'mean (ms)'
+        )
+        lines = [header, '-' * len(header)]
+        for name, (calls, total, own) in rows:
+            lines.append('{:<48} {:>10} {:>12.4f} {:>12.4f} {:>12.4f}'.format(
+                name, calls, total, own, 1000 * total / calls
+            ))
+        return '\n'.join(lines)
+
+    def dump_cprofile(self, path: str):
+        """ Write the merged `cProfile` statistics of all worker threads. """
+        with self._lock:
+            profiles = list(self._profiles)
+        if not profiles:
+            return False
+        statistics = pstats.Stats(profiles[0])
+        for profile in profiles[1:]:
+            statistics.add(profile)
+        statistics.dump_stats(path)
+        return True
+
+    @staticmethod
+    def merge_cprofile(path: str, dumps):
+        """
+        Merge the `cProfile` statistics dumped by worker processes into
+        a single file and remove the worker files.
+        """
+        dumps = sorted(set(dumps))
+        if not dumps:
+            return False
+        statistics = pstats.Stats(dumps[0])
+        for dump in dumps[1:]:
+            statistics.add(dump)
+        statistics.dump_stats(path)
+        for dump in dumps:
+            os.remove(dump)
+        return True
+
+    def dump_stacks(self, path: str):
+        with open(path, 'w') as f:
+            for stack, count in sorted(self._stacks.items()):
+                f.write('{} {}\n'.format(stack, count))
@@ -0,0 +1,173 @@
+import logging
+import os
+import re
+import sys
+import threading
+import time
+
+try:
+    import resource
+except ImportError:  # pragma: no cover
+    resource = None
+
+logger = logging.getLogger(__name__)
+
+_SIZE_UNITS = {
+    '': 1,
+    'K': 1 << 10,
+    'M': 1 << 20,
+    'G': 1 << 30
+}
+
+
+def parse_size(size) -> int:
+    """
+    Convert a size such as `512MB`, `2G` or `1048576` to bytes.
+    """
+    if isinstance(size, (int, float)):
+        return int(size)
+    match = re.match(
+        r'^\s*(\d+(?:\.\d+)?)\s*([KMG]?)i?B?\s*$',
+        str(size),
+        re.IGNORECASE
+    )
+    if match is None:
+        raise ValueError('Invalid size: {}'.format(size))
+    return int(float(match.group(1)) * _SIZE_UNITS[match.group(2).upper()])
+
+
+def resident_memory() -> int:
+    """
+    :return: the resident set size of the current process in bytes
+    """
+    try:
+        with open('/proc/self/statm') as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        if resource is None:
+            return 0
+        # Peak instead of current usage; kilobytes on Linux, bytes on macOS
+        usage = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return usage if sys.platform == 'darwin' else usage * 1024
+
+
+def deep_sizeof(obj, seen=None) -> int:
+    """ Approximate memory size of an object and the objects it contains. """
+    if seen is None:
+        seen = set()
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(
+            deep_sizeof(key, seen) + deep_sizeof(value, seen)
+            for key, value in obj.items()
+        )
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        size += sum(deep_sizeof(item, seen) for item in obj)
+    return size
+
+
+def extract_paths(document, paths):
+    """
+    Copy only the given dotted paths (e.g. `user.id`, `items.0.name`)
+    of a JSON-like document; missing paths are skipped.
+    """
+    extracted = {}
+    for path in paths:
+        value = document
+        keys = str(path).split('.')
+        try:
+            for key in keys:
+                if isinstance(value, (list, tuple)):
+                    value = value[int(key)]
+                else:
+                    value = value[key]
+        except (KeyError, IndexError, ValueError, TypeError):
+            continue
+        target = extracted
+        for key in keys[:-1]:
+            target = target.setdefault(key, {})
+        target[keys[-1]] = value
+    return extracted
+
+
+class RetentionPolicy(object):
+    """
+    Bound the memory retained by sequence executions.
+
+    - `release_body`: drop the response body, the parsed JSON document and
+      the plugin instances once the response plugins of a step complete;
+      the status code, headers and URL remain available.
+    - `max_memory`: warn when the resident memory of the process exceeds
+      the given size, reporting the largest registered variables. The
+      memory is checked at most once every `check_interval` seconds.
+    """
+    def __init__(self, release_body: bool = False, max_memory=None,
+                 check_interval: float = 10.0, report: int = 5):
+        self._release_body = release_body
+        self._max_memory = None if max_memory is None \
+            else parse_size(max_memory)
+        self._check_interval = float(check_interval)
+        self._report = int(report)
+        self._lock = threading.Lock()
+        self._last_check = 0.0
+
+    @classmethod
+    def from_definition(cls, definition):
+        """
+        Create a policy from the sequence-level `retention` option.
+        """
+        if not definition:
+            return None
+        return cls(**definition)
+
+    @property
+    def max_memory(self):
+        return self._max_memory
+
+    def release(self, request, response):
+        if not self._release_body:
+            return
+        for phase_object in (request, response):
+            if hasattr(phase_object, 'plugins'):
+                phase_object.plugins = []
+        response._content = b''
+        response._content_consumed = True
+        response.as_json = None
+
+    def check(self, variables):
+        if self._max_memory is None:
+            return
+        now = time.monotonic()
+        with self._lock:
+            if now - self._last_check < self._check_interval:
+                return
+            self._last_check = now
+        memory = resident_memory()
+        if memory <= self._max_memory:
+            return
+        logger.warning(
+            'Memory usage %d bytes exceeds the retention limit of %d bytes; '
+            'largest variables: %s',
+            memory,
+            self._max_memory,
+            ', '.join(
+                '{}={}'.format(name, size)
+                for name, size in self.largest(variables)
+            ) or 'none'
+        )
+
+    def largest(self, variables) -> list:
+        """
+        :return: the names and approximate sizes in bytes of the largest
+            variables, in decreasing order of size
+        """
+        sizes = [
+            (name, deep_sizeof(value))
+            for name, value in list(variables.items())
+        ]
+        sizes.sort(key=lambda item: item[1], reverse=True)
+        return sizes[:self._report]
@@ -1,20 +1,326 @@
+import importlib
+import os
+from contextlib import contextmanager
+
+from pitch.capture import close_captures
+from pitch.checkpoint import CheckpointStore
+from pitch.concurrency import ProcessPool, raise_first
+from pitch.history import RegressionCheck, RunHistory, RunSummary
+from pitch.hooks import HookBus
+from pitch.profiling import PhaseProfiler
 from pitch.sequence.executor import SequenceLoader
+from pitch.sequence.scenarios import ScenarioMix, load_sequence
+from pitch.sequence.feeders import close_feeders, load_feeders
+from pitch.sequence.warmup import measurement_duration
+from pitch.plugins.background import BackgroundPlugins
 from pitch.plugins.utils import loader as plugin_loader
-from pitch.runner.structures import PitchRunner
+from pitch.runner.capacity import CapacitySearch
+from pitch.runner.compare import Comparison
+from pitch.runner.structures import PitchRunner, ScenarioRunner
+from pitch.shared import SharedVariables
+from pitch.sinks import close_sinks
+from pitch.thresholds import ThresholdMonitor
+from pitch.tracing import Tracer
+from pitch.transport.adapters import create_adapter
+from pitch.transport.cassette import Cassette
+from pitch.validation import collect_counters, merge_counters
+
+# Resources created by the parent process and handed over to
+# each worker process on startup.
+_worker_resources = {}
+
+
+@contextmanager
+def process_resources(sequence_loader, resources: dict):
+    """
+    Create the resources of the current process, i.e. the background
+    plugins and the transport adapter, into `resources` and release them,
+    with the feeders, captures and sinks of the process, on exit.
+    """
+    # Worker threads are started in each process
+    background = BackgroundPlugins.from_definition(
+        sequence_loader.get('background_plugins', None)
+    )
+    # Connections are opened by each process
+    adapter = create_adapter(sequence_loader.get('transport', None))
+    if adapter is not None:
+        resources['adapter'] = adapter
+    resources['background'] = background
+    try:
+        yield resources
+    finally:
+        if background is not None:
+            background.close()
+        if adapter is not None:
+            adapter.close()
+        close_feeders(resources.get('feeders'))
+        close_captures()
+        close_sinks()
+
+
+def start_process(sequence_loader, logger, process_index=0, thresholds=None,
+                  **resources):
+    if isinstance(sequence_loader, ScenarioMix):
+        runner_class = ScenarioRunner
+    else:
+        runner_class = PitchRunner
+    with process_resources(sequence_loader, resources):
+        runner = runner_class(
+            sequence_loader,
+            logger=logger,
+            process_index=process_index,
+            **resources
+        )
+        runner.warm_up()
+        # The clock starts after the warm-up phase
+        if thresholds is not None:
+            thresholds.start(measurement_duration(sequence_loader))
+        profiler = resources.get('profiler')
+        if profiler is not None:
+            profiler.start_sampling()
+        try:
+            runner.run()
+        finally:
+            if thresholds is not None:
+                thresholds.stop()
+            if profiler is not None:
+                profiler.stop_sampling()
+
+
+def _initialize_worker(request_plugins, response_plugins, resources):
+    plugin_loader(request_plugins, response_plugins)
+    _worker_resources.update(resources)
+
+
+def _start_worker_process(process_index, sequence_loader, logger):
+    start_process(
+        sequence_loader,
+        logger,
+        process_index=process_index,
+        **_worker_resources
+    )
+    results = {}
+    profiler = _worker_resources.get('profiler')
+    if profiler is not None:
+        if profiler.cprofile_output is not None:
+            path = '{}.{}'.format(profiler.cprofile_output, os.getpid())
+            if profiler.dump_cprofile(path):
+                results['cprofile'] = path
+        results['profile'] = (profiler.stats(), profiler.stacks())
+    thresholds = _worker_resources.get('thresholds')
+    if thresholds is not None:
+        results['statistics'] = thresholds.statistics
+        results['elapsed'] = thresholds.elapsed
+    results['validation'] = collect_counters()
+    return results
+
+
+def _create_resources(sequence_loader, **kwargs):
+    resources = {
+        'feeders': load_feeders(sequence_loader.get('feeders', None))
+    }
+    if kwargs.get('record') is not None:
+        resources['cassette'] = Cassette(kwargs['record'], mode='record')
+    elif kwargs.get('replay') is not None:
+        resources['cassette'] = Cassette(kwargs['replay'], mode='replay')
+    checkpoints = CheckpointStore.from_definition(
+        sequence_loader.get('checkpoint', None),
+        resume=kwargs.get('resume', False)
+    )
+    if checkpoints is not None:
+        if not kwargs.get('resume'):
+            checkpoints.reset()
+        resources['checkpoints'] = checkpoints
+    shared = SharedVariables.from_definition(
+        sequence_loader.get('shared_variables', None),
+        processes=kwargs.get('processes') or 1
+    )
+    if shared is not None:
+        resources['shared'] = shared
+    if kwargs.get('hooks'):
+        resources['hooks'] = HookBus()
+        for module_path in kwargs['hooks']:
+            importlib.import_module(module_path).register_hooks(
+                resources['hooks']
+            )
+    if kwargs.get('trace'):
+        resources['tracer'] = Tracer(
+            kwargs['trace'],
+            format=kwargs.get('trace_format') or 'chrome',
+            propagate=kwargs.get('trace_propagation', True)
+        )
+        resources['tracer'].reset()
+    if kwargs.get('profile'):
+        resources['profiler'] = PhaseProfiler(
+            cprofile_output=kwargs.get('profile_cprofile'),
+            stacks_output=kwargs.get('profile_stacks')
+        )
+    return resources
 
 
-def start_process(sequence, logger):
-    sequence_loader = SequenceLoader(sequence)
-    runner = PitchRunner(sequence_loader, logger=logger)
-    runner.run()
+def _create_history(sequence_loader, **kwargs):
+    """
+    :return: the run history, the baseline summary and the regression
+        check of a run; `None` when not used
+    """
+    definition = sequence_loader.get('history', None)
+    reference = kwargs.get('baseline')
+    if reference is None and isinstance(definition, dict):
+        reference = definition.get('baseline')
+    history = RunHistory.from_definition(
+        definition,
+        directory=kwargs.get('history')
+    )
+    if history is None and reference is None:
+        return None, None, None
+    if history is None:
+        history = RunHistory()
+    if reference is None:
+        return history, None, None
+    check = RegressionCheck.from_definition(
+        definition,
+        tolerances=kwargs.get('tolerances')
+    )
+    # Loaded before the run, which becomes the latest one
+    return history, history.load(reference), check
 
 
 def bootstrap(**kwargs):
-    scheme = kwargs['sequence_file']
+    """
+    Run a sequence file and return the resources shared by the run
+    (e.g. the profiler) for reporting.
+    """
+    sequence_loader = load_sequence(kwargs['sequence_file'])
     logger = kwargs['logger']
     plugin_loader(
         kwargs.get('request_plugins'),
         kwargs.get('response_plugins')
     )
+    processes = kwargs.get('processes') or \
+        int(sequence_loader.get('processes', 1))
+    resources = _create_resources(
+        sequence_loader,
+        **dict(kwargs, processes=processes)
+    )
+    profiler = resources.get('profiler')
+    thresholds = ThresholdMonitor.from_definition(
+        sequence_loader.get('thresholds', None),
+        steps=sequence_loader.get('steps', ()),
+        processes=processes
+    )
+    history, baseline, check = _create_history(sequence_loader, **kwargs)
+    if thresholds is None and history is not None:
+        # Collects the statistics of the run summary
+        thresholds = ThresholdMonitor([], processes=processes)
+    if thresholds is not None:
+        thresholds.subscribe(resources.setdefault('hooks', HookBus()))
+        resources['thresholds'] = thresholds
+
+    validation = {}
+    try:
+        if processes == 1:
+            start_process(sequence_loader, logger=logger, **resources)
+            if profiler is not None and profiler.cprofile_output is not None:
+                profiler.dump_cprofile(profiler.cprofile_output)
+            validation = collect_counters()
+        else:
+            pool = ProcessPool(
+                loops=processes,
+                concurrency=processes,
+                initializer=_initialize_worker,
+                initargs=(
+                    kwargs.get('request_plugins'),
+                    kwargs.get('response_plugins'),
+                    resources
+                )
+            )
+            promises, exceptions = pool.run_indexed(
+                _start_worker_process,
+                sequence_loader,
+                logger
+            )
+            raise_first(exceptions)
+            elapsed = []
+            dumps = []
+            for promise in promises:
+                results = promise.result()
+                if 'profile' in results:
+                    profiler.merge(*results['profile'])
+                if 'cprofile' in results:
+                    dumps.append(results['cprofile'])
+                if 'statistics' in results:
+                    thresholds.statistics.merge(results['statistics'])
+                    elapsed.append(results['elapsed'])
+                merge_counters(validation, results['validation'])
+            if dumps:
+                profiler.merge_cprofile(profiler.cprofile_output, dumps)
+            if thresholds is not None:
+                thresholds.stop(max(elapsed))
+    finally:
+        close_feeders(resources['feeders'])
+        if 'shared' in resources:
+            resources['shared'].shutdown()
+
+    if profiler is not None and profiler.stacks_output is not None:
+        profiler.dump_stacks(profiler.stacks_output)
+    if validation:
+        resources['validation'] = validation
+    if history is not None:
+        summary = RunSummary.from_run(
+            thresholds.statistics,
+            thresholds.elapsed,
+            sequence_loader,
+            processes=processes
+        )
+        history.save(summary)
+        resources['summary'] = summary
+        if baseline is not None:
+            resources['baseline'] = baseline
+            resources['regressions'] = check.compare(baseline, summary)
+    return resources
+
 
-    start_process(scheme, logger=logger)
+def capacity(**kwargs):
+    """
+    Search for the maximum throughput of the target of a sequence file
+    within a latency and error rate objective.
+    """
+    sequence_loader = SequenceLoader(kwargs.pop('sequence_file'))
+    plugin_loader(
+        kwargs.pop('request_plugins', None),
+        kwargs.pop('response_plugins', None)
+    )
+    resources = _create_resources(
+        sequence_loader,
+        hooks=kwargs.pop('hooks', None)
+    )
+    logger = kwargs.pop('logger')
+    with process_resources(sequence_loader, resources):
+        search = CapacitySearch(
+            sequence_loader,
+            logger=logger,
+            **dict(kwargs, **resources)
+        )
+        search.run()
+    return search
+
+
+def compare(**kwargs):
+    """
+    Execute a sequence file against two base URLs and compare the results.
+    """
+    sequence_loader = SequenceLoader(kwargs.pop('sequence_file'))
+    plugin_loader(
+        kwargs.pop('request_plugins', None),
+        kwargs.pop('response_plugins', None)
+    )
+    resources = _create_resources(sequence_loader)
+    logger = kwargs.pop('logger')
+    with process_resources(sequence_loader, resources):
+        comparison = Comparison(
+            sequence_loader,
+            logger=logger,
+            **dict(kwargs, **resources)
+        )
+        comparisons = comparison.run()
+    return comparison, comparisons
@@ -0,0 +1,220 @@
+import logging
+import time
+from collections import namedtuple
+
+from pitch.concurrency import ThreadPool, raise_first
+from pitch.hooks import HookBus
+from pitch.runner.structures import configure_executor_options
+from pitch.sequence.executor import SequenceExecutor, SequenceLoader
+from pitch.sequence.think_time import ThinkTime
+from pitch.stats import RunStatistics
+
+logger = logging.getLogger(__name__)
+
+STRATEGIES = ('aimd', 'binary')
+
+CapacityStep = namedtuple(
+    'CapacityStep',
+    'concurrency duration requests throughput p50 latency error_rate passed'
+)
+
+
+class CapacitySearch(object):
+    """
+    Search for the highest throughput a target sustains within a latency
+    and error rate objective (SLO).
+
+    The sequence is executed repeatedly by a number of concurrent threads
+    for `step_duration` seconds; the concurrency of the next step is chosen
+    by the controller depending on whether the SLO was met:
+
+    - `aimd`: additive increase by `increase` while the SLO is met,
+      multiplicative decrease by `decrease` when it is violated; the search
+      stops when the next increase would reach a level already violating
+      the SLO.
+    - `binary`: the concurrency doubles until the SLO is violated, then the
+      boundary is located by bisection.
+    """
+    def __init__(self, sequence_loader: SequenceLoader,
+                 logger: logging.Logger, latency: float,
+                 percentile: float = 99.0, max_error_rate: float = 0.01,
+                 strategy: str = 'aimd', start: int = 1,
+                 max_concurrency: int = 64, step_duration: float = 10.0,
+                 increase: int = 1, decrease: float = 0.5,
+                 max_steps: int = 20, **executor_options):
+        if strategy not in STRATEGIES:
+            raise ValueError('Unknown strategy: {}'.format(strategy))
+        self._sequence_loader = sequence_loader
+        self._logger = logger
+        self._latency = float(latency)
+        self._percentile = float(percentile)
+        self._max_error_rate = float(max_error_rate)
+        self._strategy = strategy
+        self._start = max(1, int(start))
+        self._max_concurrency = max(self._start, int(max_concurrency))
+        self._step_duration = float(step_duration)
+        self._increase = max(1, int(increase))
+        self._decrease = float(decrease)
+        self._max_steps = int(max_steps)
+        self._hooks = executor_options.pop('hooks', None) or HookBus()
+        self._executor_options = configure_executor_options(
+            sequence_loader,
+            executor_options
+        )
+        self._executor_options.setdefault(
+            'think_time',
+            ThinkTime.from_definition(sequence_loader.get('think_time', None))
+        )
+        self._steps = []
+
+    @property
+    def steps(self) -> list:
+        return self._steps
+
+    @property
+    def best(self):
+        """
+        :return: the step with the highest throughput meeting the SLO
+        """
+        return max(
+            (step for step in self._steps if step.passed),
+            key=lambda step: step.throughput,
+            default=None
+        )
+
+    def run(self) -> list:
+        if self._strategy == 'aimd':
+            self._aimd()
+        else:
+            self._binary()
+        return self._steps
+
+    def _aimd(self):
+        concurrency = self._start
+        violated = None
+        while len(self._steps) < self._max_steps:
+            step = self._measure(concurrency)
+            if step.passed:
+                following = min(
+                    self._max_concurrency,
+                    concurrency + self._increase
+                )
+                if following == concurrency or \
+                        (violated is not None and following >= violated):
+                    break
+            else:
+                violated = concurrency if violated is None \
+                    else min(violated, concurrency)
+                following = max(1, int(concurrency * self._decrease))
+                if following == concurrency:
+                    break
+            concurrency = following
+
+    def _binary(self):
+        concurrency = self._start
+        highest_passed = 0
+        lowest_violated = None
+        while len(self._steps) < self._max_steps:
+            step = self._measure(concurrency)
+            if step.passed:
+                highest_passed = concurrency
+                if lowest_violated is None:
+                    following = min(self._max_concurrency, concurrency * 2)
+                else:
+                    following = (highest_passed + lowest_violated) // 2
+            else:
+                lowest_violated = concurrency
+                following = (highest_passed + lowest_violated) // 2
+            if following in (concurrency, highest_passed) or following < 1:
+                break
+            concurrency = following
+
+    def _measure(self, concurrency) -> CapacityStep:
+        statistics = RunStatistics().subscribe(self._hooks)
+        deadline = time.monotonic() + self._step_duration
+        started = time.perf_counter()
+        pool = ThreadPool(loops=concurrency, concurrency=concurrency)
+        try:
+            _, exceptions = pool.run(self._execute_until, deadline)
+        finally:
+            statistics.unsubscribe(self._hooks)
+        raise_first(exceptions)
+        duration = time.perf_counter() - started
+
+        total = statistics.total
+        latency = total.latency.percentile(self._percentile)
+        # Without a successful request there is no latency to compare
+        passed = total.requests > 0 and latency is not None and \
+            latency <= self._latency and \
+            total.error_rate <= self._max_error_rate
+        step = CapacityStep(
+            concurrency=concurrency,
+            duration=duration,
+            requests=total.requests,
+            throughput=total.requests / duration,
+            p50=total.latency.percentile(50),
+            latency=latency,
+            error_rate=total.error_rate,
+            passed=passed
+        )
+        self._logger.info(
+            '[capacity] concurrency={} throughput={:.2f} '
+            'latency={} error_rate={:.4f} passed={}'.format(
+                concurrency,
+                step.throughput,
+                latency,
+                step.error_rate,
+                passed
+            )
+        )
+        self._steps.append(step)
+        return step
+
+    def _execute_until(self, deadline):
+        while time.monotonic() < deadline:
+            executor = SequenceExecutor(
+                self._sequence_loader,
+                logger=self._logger,
+                hooks=self._hooks,
+                **self._executor_options
+            )
+            try:
+                executor.run()
+            except (Exception, SystemExit) as e:
+                # Counted as failed requests; the target is being pushed
+                # to its limits and failures are expected. Failfast status
+                # assertions raise `SystemExit`.
+                logger.debug('Sequence execution failed: {}'.format(e))
+
+    def report(self) -> str:
+        header = '{:>11} {:>10} {:>14} {:>10} {:>12} {:>10} {:>6}'.format(
+            'concurrency', 'requests', 'throughput/s', 'p50 (ms)',
+            'p{:g} (ms)'.format(self._percentile), 'errors', 'SLO'
+        )
+        lines = [header, '-' * len(header)]
+        for step in self._steps:
+            lines.append(
+                '{:>11} {:>10} {:>14.2f} {:>10} {:>12} {:>9.2f}% {:>6}'.format(
+                    step.concurrency,
+                    step.requests,
+                    step.throughput,
+                    _milliseconds(step.p50),
+                    _milliseconds(step.latency),
+                    100 * step.error_rate,
+                    'pass' if step.passed else 'fail'
+                )
+            )
+        lines.append('')
+        best = self.best
+        if best is None:
+            lines.append('No concurrency level met the SLO')
+        else:
+            lines.append(
+                'Maximum sustainable throughput: {:.2f} requests/s '
+                'at concurrency {}'.format(best.throughput, best.concurrency)
+            )
+        return '\n'.join(lines)
+
+
+def _milliseconds(seconds):
+    return '-' if seconds is None else '{:.1f}'.format(1000 * seconds)
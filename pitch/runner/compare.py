@@ -0,0 +1,318 @@
+import itertools
+import logging
+import threading
+import time
+from collections import namedtuple
+from concurrent import futures
+
+from pitch.concurrency import ThreadPool, raise_first
+from pitch.hooks import HookBus
+from pitch.runner.structures import configure_executor_options
+from pitch.sequence.executor import SequenceExecutor, SequenceLoader
+from pitch.sequence.feeders import load_feeders
+from pitch.sequence.think_time import ThinkTime
+from pitch.stats import RunStatistics, mann_whitney
+
+logger = logging.getLogger(__name__)
+
+MODES = ('interleaved', 'parallel')
+
+StepComparison = namedtuple(
+    'StepComparison',
+    'name requests p50 p95 errors p_value significant'
+)
+
+
+class Target(object):
+    """ Sequence with its `base_url` replaced. """
+    def __init__(self, sequence_loader: SequenceLoader, base_url: str):
+        self._sequence_loader = sequence_loader
+        self._base_url = base_url
+
+    @property
+    def base_url(self):
+        return self._base_url
+
+    @property
+    def filename(self):
+        return self._sequence_loader.filename
+
+    def get(self, key, default=SequenceLoader._MISSING):
+        if key == 'base_url':
+            return self._base_url
+        return self._sequence_loader.get(key, default)
+
+
+class FeederTape(object):
+    """
+    Feeder proxy recording the rows drawn by one execution, so that the
+    execution against the other target can be given the same rows.
+
+    Replaying tapes wait for rows still to be drawn by the recording
+    execution when both run at the same time.
+    """
+    def __init__(self, feeder, rows=None, condition=None, closed=None):
+        self._feeder = feeder
+        self._recording = rows is None
+        self._rows = [] if rows is None else rows
+        self._condition = condition or threading.Condition()
+        self._closed = closed if closed is not None else [False]
+        self._position = 0
+
+    def replay(self) -> 'FeederTape':
+        return FeederTape(
+            self._feeder,
+            rows=self._rows,
+            condition=self._condition,
+            closed=self._closed
+        )
+
+    def close(self):
+        """ Mark the end of the recording. """
+        with self._condition:
+            self._closed[0] = True
+            self._condition.notify_all()
+
+    def next(self):
+        if self._recording:
+            row = self._feeder.next()
+            with self._condition:
+                self._rows.append(row)
+                self._condition.notify_all()
+            return row
+        with self._condition:
+            while self._position >= len(self._rows):
+                if self._closed[0]:
+                    raise StopIteration
+                self._condition.wait()
+            row = self._rows[self._position]
+        self._position += 1
+        return row
+
+    def take(self, count):
+        return itertools.islice(self, int(count))
+
+    def __iter__(self):
+        while True:
+            try:
+                yield self.next()
+            except StopIteration:
+                return
+
+
+class Comparison(object):
+    """
+    Execute a sequence against two base URLs with the same loop items and
+    feeder rows, and compare the latency distributions of each step.
+
+    Every thread executes the sequence `repeat` times against each target:
+    - `interleaved`: one target after the other, alternating which goes
+      first
+    - `parallel`: against both targets at the same time
+
+    Latency differences are tested with the Mann-Whitney U test at the
+    `alpha` significance level. Throughput is the number of requests per
+    second of execution time of each target.
+    """
+    def __init__(self, sequence_loader: SequenceLoader,
+                 logger: logging.Logger, base_urls, mode: str = 'interleaved',
+                 alpha: float = 0.05, **executor_options):
+        if len(base_urls) != 2:
+            raise ValueError('Exactly two base URLs are compared')
+        if mode not in MODES:
+            raise ValueError('Unknown mode: {}'.format(mode))
+        self._sequence_loader = sequence_loader
+        self._logger = logger
+        self._targets = [
+            Target(sequence_loader, base_url)
+            for base_url in base_urls
+        ]
+        self._mode = mode
+        self._alpha = float(alpha)
+        executor_options.pop('hooks', None)
+        self._feeders = executor_options.pop('feeders', None)
+        if self._feeders is None:
+            self._feeders = load_feeders(
+                sequence_loader.get('feeders', None)
+            )
+        self._executor_options = configure_executor_options(
+            sequence_loader,
+            executor_options
+        )
+        self._executor_options.setdefault(
+            'think_time',
+            ThinkTime.from_definition(sequence_loader.get('think_time', None))
+        )
+        self._hooks = [HookBus() for _ in self._targets]
+        self._statistics = [
+            RunStatistics().subscribe(hooks)
+            for hooks in self._hooks
+        ]
+        self._busy = [0.0 for _ in self._targets]
+        self._lock = threading.Lock()
+
+    @property
+    def statistics(self) -> list:
+        """ Statistics of each target. """
+        return self._statistics
+
+    def run(self):
+        threads = int(self._sequence_loader.get('threads', 1))
+        repeat = int(self._sequence_loader.get('repeat', 1))
+        pool = ThreadPool(loops=threads, concurrency=threads)
+        _, exceptions = pool.run_indexed(self._execute_pairs, repeat)
+        raise_first(exceptions)
+        return self.compare()
+
+    def _execute_pairs(self, thread_id, repeat):
+        with futures.ThreadPoolExecutor(max_workers=1) as pool:
+            for iteration in range(repeat):
+                tapes = {
+                    name: FeederTape(feeder)
+                    for name, feeder in self._feeders.items()
+                }
+                replays = {
+                    name: tape.replay()
+                    for name, tape in tapes.items()
+                }
+                # Alternate the target executed first, which draws the rows
+                first = (thread_id + iteration) % 2
+                second = 1 - first
+                if self._mode == 'parallel':
+                    promise = pool.submit(self._execute, second, replays)
+                    try:
+                        self._execute(first, tapes)
+                    finally:
+                        # The second target waits for the recorded rows
+                        self._close(tapes)
+                    promise.result()
+                else:
+                    self._execute(first, tapes)
+                    self._close(tapes)
+                    self._execute(second, replays)
+
+    @staticmethod
+    def _close(tapes):
+        for tape in tapes.values():
+            tape.close()
+
+    def _execute(self, index, feeders):
+        executor = SequenceExecutor(
+            self._targets[index],
+            logger=self._logger,
+            hooks=self._hooks[index],
+            feeders=feeders,
+            **self._executor_options
+        )
+        started = time.perf_counter()
+        try:
+            executor.run()
+        except BaseException as e:
+            # Counted as errors of the target, including failfast exits
+            logger.debug('Sequence execution failed: {}'.format(e))
+        finally:
+            with self._lock:
+                self._busy[index] += time.perf_counter() - started
+
+    def throughput(self) -> list:
+        threads = int(self._sequence_loader.get('threads', 1))
+        return [
+            statistics.total.requests * threads / busy if busy else 0.0
+            for statistics, busy in zip(self._statistics, self._busy)
+        ]
+
+    def compare(self) -> list:
+        """
+        :return: a `StepComparison` per step and one for all steps, with
+            `(first, second)` pairs of values
+        """
+        steps = self._sequence_loader.get('steps')
+        first, second = self._statistics
+        comparisons = []
+        rows = [
+            (
+                step.get('name') or step.get('url') or str(index),
+                first.step(index),
+                second.step(index)
+            )
+            for index, step in enumerate(steps)
+        ]
+        rows.append(('total', first.total, second.total))
+        for name, first_step, second_step in rows:
+            test = mann_whitney(first_step.latency, second_step.latency)
+            comparisons.append(StepComparison(
+                name=name,
+                requests=(first_step.requests, second_step.requests),
+                p50=(
+                    first_step.latency.percentile(50),
+                    second_step.latency.percentile(50)
+                ),
+                p95=(
+                    first_step.latency.percentile(95),
+                    second_step.latency.percentile(95)
+                ),
+                errors=(first_step.error_rate, second_step.error_rate),
+                p_value=None if test is None else test.p_value,
+                significant=test is not None and test.p_value < self._alpha
+            ))
+        return comparisons
+
+    def report(self, comparisons: list) -> str:
+        first, second = (target.base_url for target in self._targets)
+        lines = ['A: {}'.format(first), 'B: {}'.format(second), '']
+        width = max([len(comparison.name) for comparison in comparisons])
+        header = (
+            '{:<{width}} {:>13} {:>9} {:>9} {:>8} {:>9} {:>9} {:>8} '
+            '{:>13} {:>9}'
+        ).format(
+            'step', 'requests A/B', 'p50 A', 'p50 B', 'delta',
+            'p95 A', 'p95 B', 'delta', 'errors A/B', 'p-value',
+            width=width
+        )
+        lines.extend([header, '-' * len(header)])
+        for comparison in comparisons:
+            lines.append((
+                '{:<{width}} {:>13} {:>9} {:>9} {:>8} {:>9} {:>9} {:>8} '
+                '{:>13} {:>9}{}'
+            ).format(
+                comparison.name,
+                '{}/{}'.format(*comparison.requests),
+                _milliseconds(comparison.p50[0]),
+                _milliseconds(comparison.p50[1]),
+                _delta(*comparison.p50),
+                _milliseconds(comparison.p95[0]),
+                _milliseconds(comparison.p95[1]),
+                _delta(*comparison.p95),
+                '{:.1f}%/{:.1f}%'.format(
+                    100 * comparison.errors[0],
+                    100 * comparison.errors[1]
+                ),
+                '-' if comparison.p_value is None
+                else '{:.4f}'.format(comparison.p_value),
+                ' *' if comparison.significant else '',
+                width=width
+            ))
+        throughput = self.throughput()
+        lines.extend([
+            '',
+            'Throughput: A {:.2f}/s, B {:.2f}/s ({})'.format(
+                throughput[0],
+                throughput[1],
+                _delta(*throughput)
+            ),
+            'Latency percentiles in milliseconds; delta of B relative to A; '
+            '* significant at alpha={:g} (Mann-Whitney U)'.format(
+                self._alpha
+            )
+        ])
+        return '\n'.join(lines)
+
+
+def _milliseconds(seconds):
+    return '-' if seconds is None else '{:.1f}'.format(1000 * seconds)
+
+
+def _delta(first, second):
+    if not first or second is None:
+        return '-'
+    return '{:+.1f}%'.format(100.0 * (second - first) / first)
@@ -1,10 +1,136 @@
+import itertools
+import logging
+import random
+import time
+
+from requests.adapters import HTTPAdapter
+
+from pitch.capture import TailCapture
+from pitch.checkpoint import CheckpointStore
+from pitch.concurrency import ThreadPool, raise_first
+from pitch.hooks import HookBus
+from pitch.retention import RetentionPolicy
+from pitch.sequence.coalescing import RequestCoalescer
 from pitch.sequence.executor import SequenceExecutor
+from pitch.sequence.scenarios import ScenarioMix
+from pitch.sequence.skeletons import RequestSkeletons
+from pitch.sequence.think_time import ThinkTime
+from pitch.sequence.warmup import Warmup
+
+logger = logging.getLogger(__name__)
+
+
+def configure_executor_options(sequence_loader,
+                               executor_options: dict) -> dict:
+    """
+    Add the sequence-level options shared by all executions of a process;
+    coalescing, memory checks and captures apply across threads.
+    """
+    executor_options.setdefault(
+        'coalescer',
+        RequestCoalescer.from_definition(
+            sequence_loader.get('coalesce', None)
+        )
+    )
+    executor_options.setdefault(
+        'retention',
+        RetentionPolicy.from_definition(
+            sequence_loader.get('retention', None)
+        )
+    )
+    executor_options.setdefault('skeletons', RequestSkeletons())
+    executor_options.setdefault(
+        'capture',
+        TailCapture.from_definition(sequence_loader.get('capture', None))
+    )
+    return executor_options
+
+
+def _stop_at(sequence_loader):
+    """
+    :return: monotonic time at which the run stops, from the sequence-level
+        `duration` option in seconds
+    """
+    duration = sequence_loader.get('duration', None)
+    if duration is None:
+        return None
+    return time.monotonic() + float(duration)
+
+
+def _warm_up(warmup: Warmup, executor_options: dict, base_urls, threads,
+             create_executor):
+    """
+    Pre-open connections and run the warm-up executions of each thread;
+    executions get a hook bus of their own and no capture, tracer,
+    profiler or background plugins, so that they are neither counted in
+    the run statistics nor exported. Nothing is recorded into a cassette,
+    while replayed cassettes still serve the warm-up requests.
+    """
+    adapter = executor_options.get('adapter')
+    if adapter is not None and executor_options.get('cassette') is None:
+        warmup.prewarm(adapter, [
+            url for url in base_urls
+            if url and '{' not in url
+        ])
+    if not warmup.executes:
+        return
+    started = time.monotonic()
+    options = dict(
+        executor_options,
+        hooks=HookBus(),
+        capture=None,
+        tracer=None,
+        profiler=None,
+        background=None
+    )
+    cassette = options.get('cassette')
+    if cassette is not None and cassette.mode == 'record':
+        options['cassette'] = None
+
+    def execute(thread_id):
+        for _ in warmup.executions(started):
+            try:
+                create_executor(thread_id, options).run()
+            except Exception as e:
+                logger.warning('[warmup] Execution failed: {}'.format(e))
+
+    pool = ThreadPool(loops=threads, concurrency=threads)
+    _, exceptions = pool.run_indexed(execute)
+    raise_first(exceptions)
+
+
+def _shared_adapter(warmup: Warmup, executor_options: dict, threads: int):
+    """ Share the connection pools of pre-warmed connections. """
+    if warmup is not None and warmup.connections:
+        executor_options.setdefault(
+            'adapter',
+            HTTPAdapter(pool_maxsize=max(threads, warmup.connections))
+        )
 
 
 class PitchRunner(object):
-    def __init__(self, sequence_loader, logger):
+    def __init__(self, sequence_loader, logger, process_index=0,
+                 checkpoints: CheckpointStore = None, **executor_options):
         self._sequence_loader = sequence_loader
         self._logger = logger
+        self._process_index = process_index
+        self._checkpoints = checkpoints
+        self._executor_options = configure_executor_options(
+            sequence_loader,
+            executor_options
+        )
+        self._executor_options.setdefault(
+            'think_time',
+            ThinkTime.from_definition(sequence_loader.get('think_time', None))
+        )
+        self._warmup = Warmup.from_definition(
+            sequence_loader.get('warmup', None)
+        )
+        _shared_adapter(
+            self._warmup,
+            self._executor_options,
+            int(sequence_loader.get('threads', 1))
+        )
         self._responses = []
 
     @property
@@ -15,6 +141,173 @@ class PitchRunner(object):
     def sequence_loader(self):
         return self._sequence_loader
 
+    def warm_up(self):
+        if self._warmup is None:
+            return
+        _warm_up(
+            self._warmup,
+            self._executor_options,
+            [self._sequence_loader.get('base_url', None)],
+            int(self._sequence_loader.get('threads', 1)),
+            lambda thread_id, options: SequenceExecutor(
+                self._sequence_loader,
+                logger=self.logger,
+                **options
+            )
+        )
+
     def run(self):
-        executor = SequenceExecutor(self._sequence_loader, logger=self.logger)
-        return executor.run()
+        threads = int(self._sequence_loader.get('threads', 1))
+        stop_at = _stop_at(self._sequence_loader)
+        if stop_at is not None:
+            pool = ThreadPool(loops=threads, concurrency=threads)
+            promises, exceptions = pool.run_indexed(
+                self._execute_until,
+                threads,
+                stop_at
+            )
+            raise_first(exceptions)
+            return [
+                result
+                for promise in promises
+                for result in promise.result()
+            ]
+        repeat = int(self._sequence_loader.get('repeat', 1))
+        pool = ThreadPool(loops=threads * repeat, concurrency=threads)
+        promises, exceptions = pool.run_indexed(self._execute)
+        raise_first(exceptions)
+        return [promise.result() for promise in promises]
+
+    def _execute_until(self, thread_id, threads, stop_at):
+        """
+        Repeat the sequence until the run duration elapses; loops are
+        numbered as in runs with a fixed `repeat`.
+        """
+        results = []
+        loop_id = thread_id
+        while time.monotonic() < stop_at:
+            results.append(self._execute(loop_id, stop_at=stop_at))
+            loop_id += threads
+        return results
+
+    def _execute(self, loop_id, stop_at=None):
+        executor_options = self._executor_options
+        if stop_at is not None:
+            executor_options = dict(executor_options, stop_at=stop_at)
+        checkpoint = None
+        if self._checkpoints is not None:
+            checkpoint = self._checkpoints.open(
+                '{}.{}'.format(self._process_index, loop_id)
+            )
+            executor_options = dict(executor_options, checkpoint=checkpoint)
+        try:
+            executor = SequenceExecutor(
+                self._sequence_loader,
+                logger=self.logger,
+                **executor_options
+            )
+            return executor.run()
+        finally:
+            if checkpoint is not None:
+                checkpoint.close()
+
+
+class ScenarioRunner(object):
+    """
+    Execute the scenarios of a mix on a single thread pool, sharing the
+    connection pools and the hook bus of the process.
+    """
+    def __init__(self, scenario_mix: ScenarioMix, logger, process_index=0,
+                 checkpoints: CheckpointStore = None, **executor_options):
+        if checkpoints is not None:
+            raise ValueError(
+                'Checkpoints are not supported for scenario mixes'
+            )
+        self._scenario_mix = scenario_mix
+        self._logger = logger
+        self._process_index = process_index
+        self._executor_options = configure_executor_options(
+            scenario_mix,
+            executor_options
+        )
+        self._shared = [
+            scenario
+            for scenario in scenario_mix.scenarios
+            if scenario.threads is None
+        ]
+        self._weights = [scenario.weight for scenario in self._shared]
+        # Scenario of each thread; `None` for threads picking at random
+        self._assignments = []
+        if self._shared:
+            self._assignments.extend(
+                [None] * int(scenario_mix.get('threads', 1))
+            )
+        for scenario in scenario_mix.scenarios:
+            if scenario.threads is not None:
+                self._assignments.extend([scenario] * scenario.threads)
+        self._warmup = Warmup.from_definition(
+            scenario_mix.get('warmup', None)
+        )
+        _shared_adapter(
+            self._warmup,
+            self._executor_options,
+            len(self._assignments)
+        )
+        self._executor_options.setdefault(
+            'adapter',
+            HTTPAdapter(pool_maxsize=max(1, len(self._assignments)))
+        )
+
+    @property
+    def logger(self):
+        return self._logger
+
+    def warm_up(self):
+        if self._warmup is None:
+            return
+        _warm_up(
+            self._warmup,
+            self._executor_options,
+            [
+                scenario.sequence_loader.get('base_url', None)
+                for scenario in self._scenario_mix.scenarios
+            ],
+            len(self._assignments),
+            self._executor
+        )
+
+    def run(self):
+        concurrency = len(self._assignments)
+        pool = ThreadPool(loops=concurrency, concurrency=concurrency)
+        promises, exceptions = pool.run_indexed(
+            self._execute,
+            _stop_at(self._scenario_mix)
+        )
+        raise_first(exceptions)
+        return [promise.result() for promise in promises]
+
+    def _execute(self, thread_id, stop_at=None):
+        if stop_at is None:
+            executions = range(int(self._scenario_mix.get('repeat', 1)))
+        else:
+            executions = itertools.takewhile(
+                lambda _: time.monotonic() < stop_at,
+                itertools.count()
+            )
+        executor_options = dict(self._executor_options, stop_at=stop_at)
+        for _ in executions:
+            self._executor(thread_id, executor_options).run()
+
+    def _executor(self, thread_id, executor_options):
+        scenario = self._assignments[thread_id]
+        if scenario is None:
+            scenario = random.choices(
+                self._shared,
+                weights=self._weights
+            )[0]
+        return SequenceExecutor(
+            scenario.sequence_loader,
+            logger=self.logger,
+            think_time=scenario.think_time,
+            **executor_options
+        )
@@ -0,0 +1,80 @@
+import copy
+
+from requests import PreparedRequest, Response
+
+from pitch.concurrency import SingleFlight
+from pitch.tracing import TRACEPARENT_HEADER
+
+IDEMPOTENT_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+
+def _copy_response(response: Response) -> Response:
+    """
+    Copy of a response whose body has been read, with mutable attributes
+    of its own; response plugins attach attributes and update headers.
+    """
+    copied = copy.copy(response)
+    copied.headers = response.headers.copy()
+    copied.cookies = response.cookies.copy()
+    copied.history = list(response.history)
+    return copied
+
+
+class RequestCoalescer(object):
+    """
+    Share a single upstream call between identical idempotent requests
+    that are in flight at the same time.
+
+    Requests are considered identical when the method, the URL and the
+    selected headers (all request headers except trace context by default)
+    match. Requests with a body are never coalesced.
+    """
+    def __init__(self, methods=('GET', 'HEAD'), headers=None):
+        methods = tuple(method.upper() for method in methods)
+        unsafe = set(methods) - set(IDEMPOTENT_METHODS)
+        if unsafe:
+            raise ValueError(
+                'Only idempotent methods can be coalesced: {}'.format(
+                    ', '.join(sorted(unsafe))
+                )
+            )
+        self._methods = methods
+        self._headers = None if headers is None else tuple(headers)
+        self._flight = SingleFlight()
+
+    @classmethod
+    def from_definition(cls, definition):
+        """
+        Create a coalescer from the sequence-level `coalesce` option;
+        either a boolean or a mapping of constructor arguments.
+        """
+        if not definition:
+            return None
+        if definition is True:
+            return cls()
+        return cls(**definition)
+
+    def key(self, request: PreparedRequest):
+        if request.method not in self._methods or request.body:
+            return None
+        if self._headers is None:
+            headers = sorted(
+                (name.lower(), value)
+                for name, value in request.headers.items()
+                if name.lower() != TRACEPARENT_HEADER
+            )
+        else:
+            headers = [
+                (name.lower(), request.headers.get(name))
+                for name in self._headers
+            ]
+        return request.method, request.url, tuple(headers)
+
+    def send(self, request: PreparedRequest, send):
+        key = self.key(request)
+        if key is None:
+            return send(request)
+        response, _ = self._flight.do(key, send, request)
+        # Waiters may still be copying the shared response when the leader
+        # returns, so the leader gets a copy as well.
+        return _copy_response(response)
@@ -0,0 +1,171 @@
+import heapq
+import itertools
+import os
+import socket
+import threading
+import time
+
+from pitch.exceptions import StepTimeoutError
+
+
+def parse_timeout(definition):
+    """
+    Convert the `timeout` request parameter to the `requests` form;
+    either seconds, a `[connect, read]` pair or a mapping with `connect`
+    and `read`.
+    """
+    if definition is None:
+        return None
+    if isinstance(definition, dict):
+        return (
+            _seconds(definition.get('connect')),
+            _seconds(definition.get('read'))
+        )
+    if isinstance(definition, (list, tuple)):
+        connect, read = definition
+        return _seconds(connect), _seconds(read)
+    return _seconds(definition)
+
+
+def _seconds(value):
+    return None if value is None else float(value)
+
+
+class Deadline(object):
+    """
+    Point in time by which a step iteration must complete; request
+    timeouts and plugin waits are capped at the remaining time.
+    """
+    def __init__(self, seconds: float):
+        self._seconds = float(seconds)
+        self._expires = time.monotonic() + self._seconds
+
+    @property
+    def seconds(self):
+        return self._seconds
+
+    @property
+    def expires(self):
+        return self._expires
+
+    def remaining(self) -> float:
+        return max(0.0, self._expires - time.monotonic())
+
+    def check(self):
+        if time.monotonic() >= self._expires:
+            raise self.error()
+
+    def error(self, activity: str = None) -> StepTimeoutError:
+        message = 'Step deadline of {}s exceeded'.format(self._seconds)
+        if activity is not None:
+            message = '{} while {}'.format(message, activity)
+        return StepTimeoutError(message)
+
+    def timeout(self, timeout=None):
+        """
+        :return: the request timeout, with each of its parts capped at the
+            remaining time
+        """
+        self.check()
+        remaining = self.remaining()
+        if isinstance(timeout, tuple):
+            return tuple(
+                remaining if part is None else min(part, remaining)
+                for part in timeout
+            )
+        return remaining if timeout is None else min(timeout, remaining)
+
+
+class Watchdog(object):
+    """
+    Call functions at a given time from a single background thread; used
+    to cancel requests whose deadline has passed while a thread is blocked
+    reading from the socket.
+    """
+    def __init__(self):
+        self._condition = threading.Condition()
+        self._schedule = []
+        self._pending = set()
+        self._counter = itertools.count()
+        self._thread = threading.Thread(
+            target=self._watch,
+            name='pitch-watchdog',
+            daemon=True
+        )
+        self._thread.start()
+
+    def schedule(self, expires: float, callback) -> int:
+        """
+        :param expires: monotonic time of the call
+        :return: handle for cancelling the call
+        """
+        handle = next(self._counter)
+        with self._condition:
+            heapq.heappush(self._schedule, (expires, handle, callback))
+            self._pending.add(handle)
+            self._condition.notify()
+        return handle
+
+    def cancel(self, handle: int):
+        with self._condition:
+            self._pending.discard(handle)
+
+    def _watch(self):
+        while True:
+            with self._condition:
+                while not self._schedule:
+                    self._condition.wait()
+                expires, handle, callback = self._schedule[0]
+                delay = expires - time.monotonic()
+                if delay > 0 and handle in self._pending:
+                    self._condition.wait(delay)
+                    continue
+                heapq.heappop(self._schedule)
+                if handle not in self._pending:
+                    continue
+                self._pending.discard(handle)
+            callback()
+
+
+_watchdogs = {}
+_watchdogs_lock = threading.Lock()
+
+
+def get_watchdog() -> Watchdog:
+    """ Return the watchdog of the current process. """
+    with _watchdogs_lock:
+        watchdog = _watchdogs.get(os.getpid())
+        if watchdog is None:
+            watchdog = _watchdogs[os.getpid()] = Watchdog()
+        return watchdog
+
+
+class SocketCanceller(object):
+    """
+    Shut down the connection of a streamed response, so that a thread
+    blocked reading its body wakes up; responses of multiplexed
+    connections are cancelled on their own instead.
+    """
+    def __init__(self, response):
+        self._response = response
+        self._cancelled = False
+
+    @property
+    def cancelled(self):
+        return self._cancelled
+
+    def __call__(self):
+        cancel = getattr(self._response.raw, 'cancel', None)
+        if cancel is not None:
+            self._cancelled = True
+            cancel()
+            return
+        connection = getattr(self._response.raw, 'connection', None)
+        sock = getattr(connection, 'sock', None)
+        if sock is None:
+            return
+        self._cancelled = True
+        try:
+            sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
@@ -0,0 +1,208 @@
+from jinja2 import Environment, nodes
+from jinja2.exceptions import TemplateSyntaxError
+
+from pitch.common.utils import to_iterable
+from pitch.plugins.structures import registry
+
+# Plugins registering variables, mapped to the namespace prefix of the
+# variable names and their arguments which are not variables
+REGISTER_PLUGINS = {
+    'pre_register': ('', ()),
+    'post_register': ('', ('keep', 'extract', 'source')),
+    'share': ('shared.', ('ttl',))
+}
+# Context entries holding variables, mapped to their name prefix
+NAMESPACES = {
+    'variables': '',
+    'shared': 'shared.'
+}
+# Context entries which carry the state of the previously executed step
+PREVIOUS_STEP_REFERENCES = ('request', 'response')
+# Keys evaluated as bare Jinja expressions
+EXPRESSION_KEYS = ('when', 'with_items', 'with_indexed_items', 'with_nested')
+
+
+class TemplateReferences(object):
+    """
+    Context references found in the templates of a step definition.
+    """
+    def __init__(self):
+        self.variables = set()
+        self.all_variables = False
+        self.previous_step = False
+
+    def add(self, text: str, expression: bool = False):
+        sources = [text]
+        if expression and '{{' not in text:
+            sources.append('{{ ' + text + ' }}')
+        for source in sources:
+            try:
+                self._add_template(_environment.parse(source))
+            except TemplateSyntaxError:
+                pass
+
+    def _add_template(self, template):
+        consumed = 0
+        for node in template.find_all((nodes.Getattr, nodes.Getitem)):
+            if not isinstance(node.node, nodes.Name) or \
+                    node.node.name not in NAMESPACES:
+                continue
+            consumed += 1
+            prefix = NAMESPACES[node.node.name]
+            if isinstance(node, nodes.Getattr):
+                self.variables.add(prefix + node.attr)
+            elif isinstance(node.arg, nodes.Const):
+                self.variables.add(prefix + str(node.arg.value))
+            else:
+                self.all_variables = True
+
+        names = [node.name for node in template.find_all(nodes.Name)]
+        if sum(names.count(namespace) for namespace in NAMESPACES) > \
+                consumed:
+            self.all_variables = True
+        if any(name in PREVIOUS_STEP_REFERENCES for name in names):
+            self.previous_step = True
+
+    def reads(self, variable) -> bool:
+        return self.all_variables or variable in self.variables
+
+
+_environment = Environment()
+
+
+def _collect(structure, references, expression=False):
+    if isinstance(structure, dict):
+        for key, value in structure.items():
+            _collect(value, references, expression or key in EXPRESSION_KEYS)
+    elif isinstance(structure, (list, tuple)):
+        for value in structure:
+            _collect(value, references, expression)
+    elif isinstance(structure, str):
+        references.add(structure, expression=expression)
+
+
+def _runs_before_request(plugin_name):
+    return plugin_name in registry.request_plugins or \
+        plugin_name not in registry.response_plugins
+
+
+class StepDependencies(object):
+    """
+    Dependency graph of the steps of a sequence.
+
+    A step depends on an earlier step when:
+
+    - it reads a variable registered by the earlier step through the
+      `pre_register`/`post_register`/`share` plugins
+    - it is the next step and refers to `request`/`response` outside its
+      own plugins, or reads a variable registered with such a reference
+    - it is listed in its `depends_on` (step names or zero-based indexes)
+
+    Steps are grouped in waves; steps of the same wave have no
+    dependencies between them and can run concurrently.
+    """
+    def __init__(self, steps: list):
+        self._steps = steps
+        self._names = {
+            step['name']: index
+            for index, step in enumerate(steps)
+            if step.get('name') is not None
+        }
+        self._dependencies = [
+            self._analyze(index) for index in range(len(steps))
+        ]
+
+    @property
+    def dependencies(self) -> list:
+        return self._dependencies
+
+    def _analyze(self, index):
+        step = self._steps[index]
+        references = TemplateReferences()
+        _collect(
+            {key: value for key, value in step.items() if key != 'plugins'},
+            references
+        )
+        for plugin in step.get('plugins') or []:
+            name = plugin.get('plugin')
+            plugin_references = TemplateReferences()
+            # Registered values may be expressions evaluated later on
+            _collect(
+                {key: value for key, value in plugin.items()
+                 if key != 'plugin'},
+                plugin_references,
+                expression=name in REGISTER_PLUGINS
+            )
+            references.variables |= plugin_references.variables
+            references.all_variables |= plugin_references.all_variables
+            # Response plugins refer to the response of their own step
+            if plugin_references.previous_step and \
+                    _runs_before_request(name):
+                references.previous_step = True
+
+        dependencies = set()
+        if references.previous_step and index > 0:
+            dependencies.add(index - 1)
+        for previous in range(index):
+            for variable, lazy in self._writes(previous).items():
+                if references.reads(variable):
+                    dependencies.add(previous)
+                    if lazy:
+                        dependencies.add(index - 1)
+        explicit = step.get('depends_on')
+        for dependency in to_iterable([] if explicit is None else explicit):
+            dependencies.add(self._resolve(dependency, index))
+        return dependencies
+
+    def _writes(self, index) -> dict:
+        """
+        :return: registered variable names of a step, mapped to whether
+            their value refers to the state of the previous step
+        """
+        writes = {}
+        for plugin in self._steps[index].get('plugins') or []:
+            if plugin.get('plugin') not in REGISTER_PLUGINS:
+                continue
+            prefix, arguments = REGISTER_PLUGINS[plugin['plugin']]
+            keep = plugin.get('keep') or {}
+            # Extracted from the response of the step itself
+            for key in plugin.get('extract') or {}:
+                writes[prefix + key] = False
+            for key, value in plugin.items():
+                if key == 'plugin' or key in arguments:
+                    continue
+                references = TemplateReferences()
+                _collect(value, references, expression=True)
+                # Kept sub-paths are extracted when registered
+                writes[prefix + key] = references.previous_step and \
+                    isinstance(value, str) and '{{' not in value and \
+                    key not in keep
+        return writes
+
+    def _resolve(self, dependency, index):
+        if isinstance(dependency, int):
+            resolved = dependency
+        elif dependency in self._names:
+            resolved = self._names[dependency]
+        else:
+            raise ValueError(
+                'Step {}: unknown dependency {}'.format(index, dependency)
+            )
+        if not 0 <= resolved < index:
+            raise ValueError(
+                'Step {}: can only depend on earlier steps, '
+                'not {}'.format(index, dependency)
+            )
+        return resolved
+
+    def waves(self) -> list:
+        levels = []
+        for dependencies in self._dependencies:
+            levels.append(
+                1 + max((levels[dependency] for dependency in dependencies),
+                        default=-1)
+            )
+        waves = [[] for _ in range(max(levels, default=-1) + 1)]
+        for index, level in enumerate(levels):
+            waves[level].append(index)
+        return waves
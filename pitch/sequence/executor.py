@@ -1,25 +1,101 @@
-from copy import deepcopy
-from itertools import chain
+from concurrent import futures
+from copy import copy, deepcopy
+from functools import partial
 import logging
+import time
 
-from pitch.common.utils import compose_url
+from boltons.typeutils import make_sentinel
+from pitch.common.utils import to_iterable
 import requests
+from requests.adapters import BaseAdapter
+from requests.structures import CaseInsensitiveDict
+from urllib3.exceptions import ReadTimeoutError
 
+from pitch.capture import TailCapture
+from pitch.plugins.background import BackgroundPlugins
 from pitch.plugins.utils import execute_plugins
-from pitch.structures import Context, ContextProxy, JinjaEvaluator, \
-    HTTPRequest, KEYWORDS
+from pitch.structures import Context, ContextProxy, JinjaEvaluator
 from pitch.interpreter.command import Client
-from pitch.encoding import yaml
+from pitch.checkpoint import Checkpoint
+from pitch.sequence.loading import load_sequence_file
+from pitch.hooks import HookBus, RunStart, RunEnd, RequestSent, FirstByte, \
+    ResponseDone, Error
+from pitch.profiling import NULL_PROFILER, PhaseProfiler
+from pitch.retention import RetentionPolicy
+from pitch.shared import SharedVariables
+from pitch.tracing import NULL_SPAN, TRACEPARENT_HEADER, Tracer
+from pitch.transport.cassette import Cassette
+from pitch.sequence.coalescing import RequestCoalescer
+from pitch.sequence.deadlines import Deadline, SocketCanceller, \
+    get_watchdog
+from pitch.sequence.dependencies import StepDependencies
+from pitch.sequence.feeders import load_feeders
+from pitch.sequence.skeletons import RequestSkeletons
+from pitch.sequence.think_time import ThinkTime
+
+
+def _branch_session(session: requests.Session) -> requests.Session:
+    """
+    Session of a concurrent step, starting from the cookies and settings
+    of the sequence session and sharing its connection pools; sessions are
+    not thread-safe.
+    """
+    branch = requests.Session()
+    branch.headers = session.headers.copy()
+    branch.cookies = session.cookies.copy()
+    branch.proxies = dict(session.proxies)
+    branch.params = dict(session.params)
+    branch.hooks = {
+        event: list(hooks) for event, hooks in session.hooks.items()
+    }
+    for name in ('auth', 'verify', 'cert', 'max_redirects', 'trust_env'):
+        setattr(branch, name, getattr(session, name))
+    branch.adapters.clear()
+    for prefix, adapter in session.adapters.items():
+        branch.mount(prefix, adapter)
+    return branch
+
+
+def _cookie_values(jar) -> dict:
+    return {
+        (cookie.domain, cookie.path, cookie.name): (cookie.value,
+                                                    cookie.expires)
+        for cookie in jar
+    }
+
+
+def _merge_cookies(jar, branch_jar, original: dict):
+    """
+    Apply the cookies set or cleared by a branch since the start of its
+    wave to the sequence cookie jar.
+    """
+    values = _cookie_values(branch_jar)
+    for cookie in branch_jar:
+        key = (cookie.domain, cookie.path, cookie.name)
+        if original.get(key) != values[key]:
+            jar.set_cookie(copy(cookie))
+    for domain, path, name in set(original) - set(values):
+        try:
+            jar.clear(domain, path, name)
+        except KeyError:
+            pass
 
 
 class SequenceLoader(object):
+    _MISSING = make_sentinel()
+
     def __init__(self, filename: str):
         self._filename = filename
-        with open(filename, 'r') as f:
-            self._sequence = yaml.safe_load(f)
+        self._sequence = load_sequence_file(filename)
 
-    def get(self, key):
-        return self._sequence[key]
+    @property
+    def filename(self):
+        return self._filename
+
+    def get(self, key, default=_MISSING):
+        if default is self._MISSING:
+            return self._sequence[key]
+        return self._sequence.get(key, default)
 
     def validate(self):
         """
@@ -32,11 +108,48 @@ class SequenceExecutor(object):
     def __init__(
             self,
             sequence_loader: SequenceLoader,
-            logger: logging.Logger):
+            logger: logging.Logger,
+            feeders: dict = None,
+            coalescer: RequestCoalescer = None,
+            cassette: Cassette = None,
+            profiler: PhaseProfiler = None,
+            hooks: HookBus = None,
+            checkpoint: Checkpoint = None,
+            retention: RetentionPolicy = None,
+            think_time: ThinkTime = None,
+            adapter: BaseAdapter = None,
+            shared: SharedVariables = None,
+            background: BackgroundPlugins = None,
+            tracer: Tracer = None,
+            skeletons: RequestSkeletons = None,
+            capture: TailCapture = None,
+            stop_at: float = None):
         self._sequence_loader = sequence_loader
+        self._skeletons = RequestSkeletons() if skeletons is None \
+            else skeletons
+        self._stop_at = stop_at
+        self._capture = capture
+        self._tracer = tracer
+        self._trace = None
+        self._background = background
+        self._shared = shared
+        self._think_time = think_time
+        self._adapter = adapter
+        self._checkpoint = checkpoint
+        self._retention = retention
+        self._hooks = HookBus() if hooks is None else hooks
+        self._cassette = cassette
+        self._profiler = NULL_PROFILER if profiler is None else profiler
+        if feeders is None:
+            feeders = load_feeders(sequence_loader.get('feeders', None))
+        self._feeders = feeders
+        self._coalescer = coalescer
         self._context = self._initialize_context()
         self._context_proxy = ContextProxy(self._context)
-        self._command_client = Client(context_proxy=self._context_proxy)
+        self._command_client = Client(
+            context_proxy=self._context_proxy,
+            stop_at=self._stop_at
+        )
         self._logger = logger
 
     @property
@@ -45,46 +158,72 @@ class SequenceExecutor(object):
 
     def _initialize_context(self) -> Context:
         context = Context()
+        context.globals['profiler'] = self._profiler
+        context.globals['hooks'] = self._hooks
+        context.globals['checkpoint'] = self._checkpoint
+        context.globals['background'] = self._background
         context.step['http_session'] = requests.Session()
+        adapter = self._adapter
+        if self._cassette is not None:
+            adapter = self._cassette.adapter()
+        if adapter is not None:
+            context.step['http_session'].mount('http://', adapter)
+            context.step['http_session'].mount('https://', adapter)
         context.templating['response'] = requests.Response()
-        context.templating['variables'] = self._sequence_loader.get(
-            'variables'
+        # Executions must not share the variables they register
+        context.templating['variables'] = deepcopy(
+            self._sequence_loader.get('variables')
         )
+        if self._checkpoint is not None:
+            variables = self._checkpoint.restore_variables()
+            if variables is not None:
+                context.templating['variables'] = variables
+        context.templating['feeders'] = self._feeders
+        context.templating['shared'] = self._shared
         context.step['rendering'] = JinjaEvaluator(
-            context.templating
+            context.templating,
+            profiler=self._profiler
         )
         return context
 
-    def _get_base_http_parameters(self):
-        base_url = self._sequence_loader.get('base_url')
-        step_definition = self.context.step['definition']
-        url = compose_url(
-            base_url,
-            self.context.step['definition']['url']
-        )
-        method = self.context.step['rendering'].render(
-            step_definition.get('method', 'GET').upper()
-        )
-        url = self.context.step['rendering'].render(url)
-        return {
-            'url': url,
-            'method': method
-        }
-
     @property
     def context(self) -> Context:
         return self._context
 
     def on_before_request(self):
-        request = HTTPRequest()
-        request.update(**self._get_request_parameters())
-        self.context.templating['request'] = request.prepare()
+        span = self.context.step['span']
+        with self._profiler.phase('build_request'), span.child('render'):
+            skeleton = self._skeletons.get(
+                self._sequence_loader,
+                self.context.step['index'],
+                self.context.step['definition']
+            )
+            values = skeleton.render(self.context.step['rendering'])
+            self.context.step['timeout'] = skeleton.timeout(values)
+            prepared = skeleton.prepare(
+                self.context.step['http_session'],
+                values
+            )
+            if span is not NULL_SPAN and self._tracer.propagate:
+                prepared.headers[TRACEPARENT_HEADER] = span.traceparent
+            self.context.templating['request'] = prepared
         self.context.step['phase'] = 'request'
-        execute_plugins(self.context)
+        with self._profiler.phase('request_plugins'), \
+                span.child('request_plugins'):
+            execute_plugins(self.context)
+        if self.context.step['deadline'] is not None:
+            self.context.step['deadline'].check()
 
     def on_before_response(self):
-        response = self._send_request()
+        span = self.context.step['span']
+        with self._profiler.phase('send'), span.child('send', kind='client'):
+            response = self._send_request()
         self.context.templating['response'] = response
+        span.update({
+            'http.method': self.context.templating['request'].method,
+            'http.url': response.url,
+            'http.status_code': response.status_code
+        })
 
     def on_after_response(self):
         self.logger.info(
@@ -93,37 +232,190 @@ class SequenceExecutor(object):
             )
         )
         self.context.step['phase'] = 'response'
-        execute_plugins(self.context)
+        release = None
+        if self._retention is not None:
+            # Detached plugins may still need the response body
+            release = partial(
+                self._retention.release,
+                self.context.templating['request'],
+                self.context.templating['response']
+            )
+        with self._profiler.phase('response_plugins'), \
+                self.context.step['span'].child('response_plugins'):
+            execute_plugins(self.context, on_complete=release)
+        if self.context.step['deadline'] is not None:
+            self.context.step['deadline'].check()
+        if self._retention is not None:
+            self._retention.check(self.context.templating['variables'])
 
     def run(self):
         steps = deepcopy(self._sequence_loader.get('steps'))
-        for step in steps:
-            self.context.step['definition'] = step
-            step.update({
-                '_function': self._step_execution,
-                '_args': (),
-                '_kwargs': {}
-            })
-            self._command_client.run(step)
+        started = time.perf_counter()
+        if self._hooks.run_start:
+            self._hooks.emit(RunStart(time=time.time()))
+        concurrency = int(self._sequence_loader.get('concurrent_steps', 1))
+        if self._tracer is not None:
+            self._trace = self._tracer.start_span('sequence')
+        self._profiler.start_thread()
+        try:
+            if concurrency > 1:
+                self._run_concurrently(steps, concurrency)
+            else:
+                for index, step in enumerate(steps):
+                    if self._stopped():
+                        break
+                    if index > 0 and self._think_time is not None:
+                        self._think_time.pause()
+                    self._run_step(index, step)
+        finally:
+            self._profiler.stop_thread()
+            if self._trace is not None:
+                self._trace.end()
+                self._tracer.export(self._trace)
+            if self._hooks.run_end:
+                self._hooks.emit(RunEnd(
+                    time=time.time(),
+                    duration=time.perf_counter() - started
+                ))
 
-    def _step_execution(self):
-        self.on_before_request()
-        self.on_before_response()
-        self.on_after_response()
-
-    def _get_request_parameters(self):
-        request_definition = self._sequence_loader.get('requests')
-        parameters = self.context.step['rendering'].render_nested({
-            key: value
-            for key, value in chain(
-                request_definition.items(),
-                self.context.step['definition'].items()
-            )
-            if key not in KEYWORDS
+    def _run_step(self, index, step):
+        self.context.step['definition'] = step
+        self.context.step['index'] = index
+        step.update({
+            '_function': self._step_execution,
+            '_args': (),
+            '_kwargs': {}
         })
-        base_http_parameters = self._get_base_http_parameters()
-        parameters.update(base_http_parameters)
-        return parameters
+        self._command_client.run(step)
+
+    def _run_concurrently(self, steps, concurrency):
+        """
+        Execute independent steps concurrently, one wave of the
+        step dependency graph at a time.
+
+        Each step of a wave runs on a branch of the context, which sees the
+        variables and cookies as they were at the start of the wave and the
+        response of the preceding step. Registered variables and cookies
+        are merged back in step order, so the result is the same as in
+        sequential execution.
+        """
+        responses = {}
+        waves = StepDependencies(steps).waves()
+        session = self.context.step['http_session']
+        with futures.ThreadPoolExecutor(max_workers=concurrency) as pool:
+            for wave_index, wave in enumerate(waves):
+                if self._stopped():
+                    break
+                if wave_index > 0 and self._think_time is not None:
+                    self._think_time.pause()
+                variables = self.context.templating['variables']
+                cookies = _cookie_values(session.cookies)
+                branches = []
+                for index in wave:
+                    branch = self._branch(responses.get(index - 1))
+                    branches.append((
+                        index,
+                        branch,
+                        pool.submit(branch._run_step, index, steps[index])
+                    ))
+                for index, branch, promise in branches:
+                    promise.result()
+                    for key, value in \
+                            branch.context.templating['variables'].items():
+                        if key not in variables or variables[key] is not value:
+                            variables[key] = value
+                    _merge_cookies(
+                        session.cookies,
+                        branch.context.step['http_session'].cookies,
+                        cookies
+                    )
+                    responses[index] = branch.context.templating['response']
+        if len(steps) - 1 in responses:
+            self.context.templating['response'] = responses[len(steps) - 1]
+
+    def _stopped(self):
+        """ Whether the run duration has elapsed. """
+        return self._stop_at is not None and time.monotonic() >= self._stop_at
+
+    def _branch(self, response=None):
+        branch = copy(self)
+        templating = CaseInsensitiveDict(self.context.templating)
+        templating['variables'] = copy(templating['variables'])
+        if response is not None:
+            templating['response'] = response
+        step = CaseInsensitiveDict(self.context.step)
+        step['http_session'] = _branch_session(step['http_session'])
+        step['rendering'] = JinjaEvaluator(
+            templating,
+            profiler=self._profiler
+        )
+        branch._context = Context(
+            globals=self.context.globals,
+            templating=templating,
+            step=step
+        )
+        branch._context_proxy = ContextProxy(branch._context)
+        branch._command_client = Client(
+            context_proxy=branch._context_proxy,
+            stop_at=self._stop_at
+        )
+        return branch
+
+    def _step_execution(self):
+        if self._trace is None:
+            return self._execute_step()
+        step = self.context.step['definition']
+        span = self._tracer.start_span(
+            step.get('name') or step.get('url'),
+            parent=self._trace,
+            attributes={'step.index': self.context.step['index']}
+        )
+        self.context.step['span'] = span
+        try:
+            with span:
+                return self._execute_step()
+        finally:
+            self.context.step['span'] = NULL_SPAN
+            self._tracer.export(span)
+
+    def _execute_step(self):
+        compute_once = self.context.step['definition'].get('compute_once')
+        if compute_once and self._shared is not None:
+            names = to_iterable(compute_once)
+            if not self._shared.acquire(names):
+                # Computed by another execution
+                return
+            try:
+                return self._execute_phases()
+            finally:
+                self._shared.release(names)
+        return self._execute_phases()
+
+    def _execute_phases(self):
+        deadline = self.context.step['definition'].get(
+            'deadline',
+            self._sequence_loader.get('deadline', None)
+        )
+        self.context.step['deadline'] = None if deadline is None \
+            else Deadline(deadline)
+        if self._capture is not None:
+            self._capture.start()
+        try:
+            self.on_before_request()
+            self.on_before_response()
+            self.on_after_response()
+        except BaseException as e:
+            if self._hooks.error:
+                self._hooks.emit(Error(
+                    time=time.time(),
+                    step=self.context.step['index'],
+                    exception=e
+                ))
+            if self._capture is not None:
+                self._capture.end(self.context, e)
+            raise
+        if self._capture is not None:
+            self._capture.end(self.context)
 
     def _send_request(self):
         request = self.context.templating['request']
@@ -132,4 +424,79 @@ class SequenceExecutor(object):
                 request.url
             )
         )
-        return self.context.step['http_session'].send(request)
+        if self._hooks.request_sent:
+            self._hooks.emit(RequestSent(
+                time=time.time(),
+                step=self.context.step['index'],
+                request=request
+            ))
+        if self._capture is not None:
+            self._capture.request(request)
+        started = time.perf_counter()
+        if self._coalescer is not None:
+            response = self._coalescer.send(request, self._transmit)
+        else:
+            response = self._transmit(request)
+        elapsed = time.perf_counter() - started
+        if self._hooks.response_done:
+            self._hooks.emit(ResponseDone(
+                time=time.time(),
+                step=self.context.step['index'],
+                request=request,
+                response=response,
+                elapsed=elapsed
+            ))
+        if self._capture is not None:
+            self._capture.response(self.context, response, elapsed)
+        return response
+
+    def _transmit(self, request):
+        # The body is read separately, so that the arrival of the
+        # response headers can be reported.
+        timeout = self.context.step['timeout']
+        deadline = self.context.step['deadline']
+        if deadline is not None:
+            timeout = deadline.timeout(timeout)
+        response = self.context.step['http_session'].send(
+            request,
+            stream=True,
+            timeout=timeout
+        )
+        if self._hooks.first_byte:
+            self._hooks.emit(FirstByte(
+                time=time.time(),
+                step=self.context.step['index'],
+                request=request,
+                elapsed=response.elapsed.total_seconds()
+            ))
+        self._read_body(response, deadline)
+        return response
+
+    def _read_body(self, response, deadline=None):
+        """
+        Read the response body; when the step deadline passes first, the
+        connection is shut down to release the blocked thread.
+        """
+        canceller = None
+        if deadline is not None:
+            canceller = SocketCanceller(response)
+            watchdog = get_watchdog()
+            handle = watchdog.schedule(deadline.expires, canceller)
+        try:
+            response.content
+        except requests.RequestException as e:
+            if canceller is not None and canceller.cancelled:
+                raise deadline.error('reading the response') from e
+            if e.args and isinstance(e.args[0], ReadTimeoutError):
+                # Reported by `requests` as a connection error
+                raise requests.exceptions.ReadTimeout(
+                    e,
+                    request=response.request,
+                    response=response
+                ) from e
+            raise
+        finally:
+            if canceller is not None:
+                watchdog.cancel(handle)
+        if canceller is not None and canceller.cancelled:
+            raise deadline.error('reading the response')
@@ -0,0 +1,279 @@
+import atexit
+import csv
+import itertools
+import json
+import mmap
+import multiprocessing
+import os
+import random
+import tempfile
+from array import array
+
+from pitch.exceptions import InvalidFeederError
+
+FORMATS = ('csv', 'jsonl')
+STRATEGIES = ('once', 'circular', 'random')
+
+_EXTENSIONS = {
+    '.csv': 'csv',
+    '.jsonl': 'jsonl',
+    '.ndjson': 'jsonl'
+}
+_CHUNK_SIZE = 4096
+
+
+class LineReader(object):
+    """
+    Positional line access on a file. Reads use `pread`, so the same
+    descriptor can be used concurrently by threads and forked processes.
+    """
+    def __init__(self, path: str):
+        self._path = path
+        self._open()
+
+    def _open(self):
+        self._fd = os.open(self._path, os.O_RDONLY)
+        self._size = os.fstat(self._fd).st_size
+
+    def __getstate__(self):
+        return {'_path': self._path}
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._open()
+
+    @property
+    def size(self):
+        return self._size
+
+    def close(self):
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+
+    def read_line(self, offset: int):
+        """
+        Read the line starting at the given byte offset.
+
+        :return: the raw line and the offset of the following line
+        """
+        if self._fd is None:
+            raise ValueError('I/O operation on closed file')
+        chunks = []
+        position = offset
+        while position < self._size:
+            chunk = os.pread(self._fd, _CHUNK_SIZE, position)
+            if not chunk:
+                break
+            end = chunk.find(b'\n')
+            if end >= 0:
+                chunks.append(chunk[:end + 1])
+                position += end + 1
+                break
+            chunks.append(chunk)
+            position += len(chunk)
+        return b''.join(chunks), position
+
+
+class OffsetIndex(object):
+    """
+    Byte offsets of all non-empty lines of a file, starting from `start`.
+    The offsets are kept in a memory-mapped temporary file, so that worker
+    processes share the same pages instead of building their own copy.
+    """
+    def __init__(self, path: str, start: int = 0):
+        offsets = array('Q')
+        with tempfile.NamedTemporaryFile(prefix='pitch-feeder-',
+                                         suffix='.idx',
+                                         delete=False) as index_file, \
+                open(path, 'rb') as f:
+            f.seek(start)
+            position = start
+            for line in f:
+                if line.strip():
+                    offsets.append(position)
+                position += len(line)
+                if len(offsets) >= 65536:
+                    offsets.tofile(index_file)
+                    del offsets[:]
+            offsets.tofile(index_file)
+            self._path = index_file.name
+
+        atexit.register(self._remove, os.getpid())
+        self._open()
+
+    def _open(self):
+        self._map = None
+        self._offsets = ()
+        with open(self._path, 'rb') as f:
+            if os.fstat(f.fileno()).st_size > 0:
+                self._map = mmap.mmap(
+                    f.fileno(), 0, access=mmap.ACCESS_READ
+                )
+                self._offsets = memoryview(self._map).cast('Q')
+
+    def _remove(self, owner_pid):
+        if os.getpid() == owner_pid:
+            try:
+                os.unlink(self._path)
+            except OSError:
+                pass
+
+    def __getstate__(self):
+        return {'_path': self._path}
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._open()
+
+    def __len__(self):
+        return len(self._offsets)
+
+    def __getitem__(self, position):
+        return self._offsets[position]
+
+
+class Feeder(object):
+    """
+    Stream rows of a CSV (with a header line) or JSON Lines file.
+
+    Rows are read lazily; only the cursor is kept in memory. The cursor
+    lives in shared memory, so threads and worker processes created after
+    the feeder draw from the same position:
+
+    - `once`: every row is returned exactly once, then the feeder is exhausted
+    - `circular`: rows are returned in order, restarting after the last one
+    - `random`: rows are picked at random using an offset index
+
+    CSV fields containing line breaks are not supported.
+    """
+    def __init__(self, name: str, path: str, format: str = None,
+                 strategy: str = 'once', delimiter: str = ',',
+                 encoding: str = 'utf-8'):
+        self._name = name
+        self._path = os.path.abspath(os.path.expanduser(path))
+        if format is None:
+            format = _EXTENSIONS.get(os.path.splitext(self._path)[1].lower())
+        if format not in FORMATS:
+            raise InvalidFeederError(
+                'Feeder {}: unknown format {}'.format(name, format)
+            )
+        if strategy not in STRATEGIES:
+            raise InvalidFeederError(
+                'Feeder {}: unknown strategy {}'.format(name, strategy)
+            )
+        if not os.path.isfile(self._path):
+            raise InvalidFeederError(
+                'Feeder {}: file {} does not exist'.format(name, self._path)
+            )
+        self._format = format
+        self._strategy = strategy
+        self._delimiter = delimiter
+        self._encoding = encoding
+        self._reader = LineReader(self._path)
+
+        self._header = None
+        self._start = 0
+        if self._format == 'csv':
+            line, self._start = self._reader.read_line(0)
+            self._header = self._parse_csv(line)
+
+        self._cursor = multiprocessing.Value('Q', self._start)
+        self._rows = None
+        if self._strategy == 'random':
+            self._index = OffsetIndex(self._path, self._start)
+        else:
+            self._index = None
+
+    @property
+    def name(self):
+        return self._name
+
+    @property
+    def strategy(self):
+        return self._strategy
+
+    def next(self):
+        """
+        Return the next row. Raises `StopIteration` when no rows are left.
+        """
+        line, wrapped = b'', False
+        while not line.strip():
+            if wrapped and not self._has_rows():
+                # A full pass of a circular feeder without any row
+                raise InvalidFeederError(
+                    'Feeder {}: file {} has no rows'.format(
+                        self._name, self._path
+                    )
+                )
+            line, wraps = self._next_line()
+            wrapped = wrapped or wraps
+        if self._format == 'csv':
+            return dict(zip(self._header, self._parse_csv(line)))
+        return json.loads(line.decode(self._encoding))
+
+    def take(self, count):
+        """ Iterate over at most `count` rows. """
+        return itertools.islice(self, int(count))
+
+    def __iter__(self):
+        while True:
+            try:
+                yield self.next()
+            except StopIteration:
+                return
+
+    def _parse_csv(self, line):
+        return next(csv.reader(
+            [line.decode(self._encoding).rstrip('\r\n')],
+            delimiter=self._delimiter
+        ))
+
+    def _next_line(self):
+        """ :return: the next line and whether the cursor wrapped around """
+        if self._index is not None:
+            if len(self._index) == 0:
+                raise StopIteration
+            offset = self._index[random.randrange(len(self._index))]
+            return self._reader.read_line(offset)[0], False
+
+        wrapped = False
+        with self._cursor.get_lock():
+            offset = self._cursor.value
+            if offset >= self._reader.size:
+                if self._strategy == 'once' or offset == self._start:
+                    raise StopIteration
+                offset = self._start
+                wrapped = True
+            line, self._cursor.value = self._reader.read_line(offset)
+        return line, wrapped
+
+    def _has_rows(self):
+        if self._rows is None:
+            self._rows = False
+            offset = self._start
+            while offset < self._reader.size:
+                line, offset = self._reader.read_line(offset)
+                if line.strip():
+                    self._rows = True
+                    break
+        return self._rows
+
+    def close(self):
+        """ Close the file; the feeder cannot be used afterwards. """
+        self._reader.close()
+
+
+def load_feeders(definition) -> dict:
+    """
+    Create the feeders declared under the sequence-level `feeders` key.
+    """
+    return {
+        name: Feeder(name=name, **options)
+        for name, options in (definition or {}).items()
+    }
+
+
+def close_feeders(feeders: dict):
+    for feeder in (feeders or {}).values():
+        feeder.close()
@@ -0,0 +1,183 @@
+import copy
+import hashlib
+import logging
+import os
+import pickle
+import tempfile
+
+from pitch.encoding import load
+from pitch.version import get_version
+
+logger = logging.getLogger(__name__)
+
+INCLUDE_KEY = 'include'
+# Entries kept in the parse cache; the least recently written are evicted
+MAX_CACHE_ENTRIES = 64
+
+
+def default_cache_directory():
+    """
+    Directory of the parsed sequence cache, from `PITCH_CACHE_DIR`; the
+    cache is disabled when it is not set or empty.
+    """
+    return os.environ.get('PITCH_CACHE_DIR') or None
+
+
+def _digest(content: bytes) -> str:
+    return hashlib.sha256(content).hexdigest()
+
+
+class SequenceParser(object):
+    """
+    Parse a sequence file, replacing list items of the form
+    `{include: path}` with the contents of the referenced YAML fragment.
+    Fragments containing a list are spliced into the including list.
+
+    Fragment paths are relative to the including file. Each fragment is
+    parsed once, however many times it is included.
+    """
+    def __init__(self):
+        self._fragments = {}
+        self._dependencies = {}
+
+    @property
+    def dependencies(self) -> dict:
+        """ Digest of each included file, by absolute path. """
+        return self._dependencies
+
+    def parse(self, path: str, content: bytes = None):
+        path = os.path.abspath(path)
+        if content is None:
+            with open(path, 'rb') as f:
+                content = f.read()
+        return self._resolve(load(content), path, (path,))
+
+    def _fragment(self, path, stack):
+        if path in stack:
+            raise ValueError(
+                'Circular include: {}'.format(' -> '.join(stack + (path,)))
+            )
+        if path not in self._fragments:
+            with open(path, 'rb') as f:
+                content = f.read()
+            self._dependencies[path] = _digest(content)
+            self._fragments[path] = self._resolve(
+                load(content),
+                path,
+                stack + (path,)
+            )
+        return self._fragments[path]
+
+    def _resolve(self, structure, path, stack):
+        if isinstance(structure, dict):
+            return {
+                key: self._resolve(value, path, stack)
+                for key, value in structure.items()
+            }
+        if not isinstance(structure, list):
+            return structure
+        resolved = []
+        for item in structure:
+            if isinstance(item, dict) and list(item) == [INCLUDE_KEY]:
+                fragment = copy.deepcopy(self._fragment(
+                    os.path.join(os.path.dirname(path), item[INCLUDE_KEY]),
+                    stack
+                ))
+                if isinstance(fragment, list):
+                    resolved.extend(fragment)
+                else:
+                    resolved.append(fragment)
+            else:
+                resolved.append(self._resolve(item, path, stack))
+        return resolved
+
+
+class SequenceCache(object):
+    """
+    Parsed sequences, pickled on disk and keyed by the sequence file path.
+
+    An entry is used only if the digests of the sequence file and of all
+    the fragments it includes match the ones it was parsed from. At most
+    `max_entries` entries are kept.
+    """
+    def __init__(self, directory: str, max_entries: int = MAX_CACHE_ENTRIES):
+        self._directory = directory
+        self._max_entries = int(max_entries)
+
+    def _entry_path(self, path):
+        name = hashlib.sha1(
+            '{}:{}'.format(get_version(), path).encode('utf-8')
+        ).hexdigest()
+        return os.path.join(self._directory, name + '.pickle')
+
+    def get(self, path: str, digest: str):
+        try:
+            with open(self._entry_path(path), 'rb') as f:
+                cached_digest, dependencies, sequence = pickle.load(f)
+        except (OSError, EOFError, pickle.UnpicklingError, ValueError):
+            return None
+        if cached_digest != digest:
+            return None
+        for dependency, dependency_digest in dependencies.items():
+            try:
+                with open(dependency, 'rb') as f:
+                    if _digest(f.read()) != dependency_digest:
+                        return None
+            except OSError:
+                return None
+        return sequence
+
+    def put(self, path: str, digest: str, dependencies: dict, sequence):
+        try:
+            os.makedirs(self._directory, exist_ok=True)
+            fd, temporary = tempfile.mkstemp(dir=self._directory)
+            with os.fdopen(fd, 'wb') as f:
+                pickle.dump(
+                    (digest, dependencies, sequence),
+                    f,
+                    protocol=pickle.HIGHEST_PROTOCOL
+                )
+            os.replace(temporary, self._entry_path(path))
+            self._evict()
+        except OSError as e:
+            logger.debug('Cannot cache sequence {}: {}'.format(path, e))
+
+    def _evict(self):
+        entries = []
+        for name in os.listdir(self._directory):
+            if not name.endswith('.pickle'):
+                continue
+            entry = os.path.join(self._directory, name)
+            try:
+                entries.append((os.stat(entry).st_mtime, entry))
+            except OSError:
+                continue
+        entries.sort(reverse=True)
+        for _, entry in entries[self._max_entries:]:
+            try:
+                os.remove(entry)
+            except OSError:
+                pass
+
+
+def load_sequence_file(path: str, cache_directory=None):
+    """
+    Parse a sequence file and its includes, using the parse cache
+    when possible.
+    """
+    path = os.path.abspath(path)
+    with open(path, 'rb') as f:
+        content = f.read()
+    if cache_directory is None:
+        cache_directory = default_cache_directory()
+    if not cache_directory:
+        return SequenceParser().parse(path, content)
+
+    cache = SequenceCache(cache_directory)
+    digest = _digest(content)
+    sequence = cache.get(path, digest)
+    if sequence is None:
+        parser = SequenceParser()
+        sequence = parser.parse(path, content)
+        cache.put(path, digest, parser.dependencies, sequence)
+    return sequence
@@ -0,0 +1,122 @@
+import os
+
+from pitch.sequence.executor import SequenceLoader
+from pitch.sequence.think_time import ThinkTime
+
+
+def _resolve_feeders(loader: SequenceLoader) -> dict:
+    """
+    :return: the feeders of a file with their paths relative to the file
+    """
+    directory = os.path.dirname(os.path.abspath(loader.filename))
+    feeders = {}
+    for name, options in (loader.get('feeders', None) or {}).items():
+        options = dict(options)
+        if 'path' in options:
+            options['path'] = os.path.normpath(os.path.join(
+                directory,
+                os.path.expanduser(options['path'])
+            ))
+        feeders[name] = options
+    return feeders
+
+
+class Scenario(object):
+    """ Sequence file participating in a scenario mix. """
+    def __init__(self, sequence_loader: SequenceLoader, weight: float = 1,
+                 threads: int = None, think_time: ThinkTime = None):
+        if weight < 0:
+            raise ValueError('Scenario weight must not be negative')
+        self._sequence_loader = sequence_loader
+        self._weight = weight
+        self._threads = None if threads is None else int(threads)
+        self._think_time = think_time
+
+    @property
+    def sequence_loader(self):
+        return self._sequence_loader
+
+    @property
+    def name(self):
+        return self._sequence_loader.filename
+
+    @property
+    def weight(self):
+        return self._weight
+
+    @property
+    def threads(self):
+        return self._threads
+
+    @property
+    def think_time(self):
+        return self._think_time
+
+
+class ScenarioMix(object):
+    """
+    Traffic model composed of several sequence files.
+
+    Scenarios without their own `threads` share the `threads` of the mix;
+    each of these threads picks a scenario at random, proportionally to the
+    scenario weights, for every execution. Scenarios with `threads` run on
+    dedicated threads. Sequence file paths are relative to the scenario
+    file and feeder paths to the file declaring the feeder.
+    """
+    def __init__(self, loader: SequenceLoader):
+        self._loader = loader
+        directory = os.path.dirname(os.path.abspath(loader.filename))
+        default_think_time = loader.get('think_time', None)
+        self._scenarios = []
+        for definition in loader.get('scenarios'):
+            definition = dict(definition)
+            sequence_loader = SequenceLoader(
+                os.path.join(directory, definition.pop('sequence'))
+            )
+            think_time = definition.pop(
+                'think_time',
+                sequence_loader.get('think_time', default_think_time)
+            )
+            self._scenarios.append(Scenario(
+                sequence_loader,
+                think_time=ThinkTime.from_definition(think_time),
+                **definition
+            ))
+
+    @property
+    def filename(self):
+        return self._loader.filename
+
+    @property
+    def scenarios(self) -> list:
+        return self._scenarios
+
+    def get(self, key, default=SequenceLoader._MISSING):
+        if key == 'feeders':
+            return self._feeders()
+        return self._loader.get(key, default)
+
+    def _feeders(self):
+        """
+        Feeders of all scenarios, shared by name across scenarios.
+        """
+        feeders = _resolve_feeders(self._loader)
+        for scenario in self._scenarios:
+            for name, options in \
+                    _resolve_feeders(scenario.sequence_loader).items():
+                if feeders.setdefault(name, options) != options:
+                    raise ValueError(
+                        'Conflicting definitions of feeder {}'.format(name)
+                    )
+        return feeders
+
+
+def load_sequence(filename: str):
+    """
+    :return: a `ScenarioMix` for scenario files, which have a top-level
+        `scenarios` key, otherwise a `SequenceLoader`
+    """
+    loader = SequenceLoader(filename)
+    if loader.get('scenarios', None) is not None:
+        return ScenarioMix(loader)
+    return loader
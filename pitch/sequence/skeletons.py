@@ -0,0 +1,252 @@
+import threading
+from copy import deepcopy
+from http.cookiejar import CookieJar
+from itertools import chain
+
+from requests import PreparedRequest
+from requests.cookies import RequestsCookieJar, cookiejar_from_dict, \
+    merge_cookies
+from requests.sessions import merge_hooks, merge_setting
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_netrc_auth
+
+from pitch.common.utils import compose_url
+from pitch.sequence.deadlines import parse_timeout
+from pitch.structures import KEYWORDS
+
+# Step keys passed to the request; others are ignored
+PARAMETERS = (
+    'method', 'url', 'headers', 'files', 'data', 'json', 'params', 'auth',
+    'cookies', 'hooks', 'timeout'
+)
+
+_TEMPLATE_MARKERS = ('{{', '{%', '{#')
+
+
+def is_static(value) -> bool:
+    """ Whether rendering a step value leaves it unchanged. """
+    if isinstance(value, str):
+        # Rendering also strips a trailing newline
+        return not value.endswith('\n') and \
+            not any(marker in value for marker in _TEMPLATE_MARKERS)
+    if isinstance(value, (dict, CaseInsensitiveDict)):
+        return all(is_static(item) for item in value.values())
+    if isinstance(value, (list, tuple)):
+        return all(is_static(item) for item in value)
+    return True
+
+
+class RequestSkeleton(object):
+    """
+    Request of a step with its static parts prepared once: the method, the
+    URL composed with the `base_url` and encoded with its query parameters,
+    the headers and the body.
+
+    Only templated values are rendered and prepared on each execution; the
+    result is the same as `requests.Session.prepare_request`. Session-level
+    headers, parameters, authentication and hooks are merged with the static
+    values once, and again only when they change; the cookies of the session
+    jar are merged on each execution.
+    """
+    def __init__(self, base_url: str, defaults: dict, definition: dict):
+        parameters = {
+            key: value
+            for key, value in chain(defaults.items(), definition.items())
+            if key in PARAMETERS and key not in KEYWORDS
+        }
+        parameters['method'] = parameters.get('method', 'GET').upper()
+        parameters['url'] = compose_url(base_url, definition['url'])
+        self._templates = {
+            key: value
+            for key, value in parameters.items()
+            if not is_static(value)
+        }
+        self._values = {
+            key: value
+            for key, value in parameters.items()
+            if key not in self._templates
+        }
+        self._method = None
+        if 'method' in self._values:
+            prepared = PreparedRequest()
+            prepared.prepare_method(self._values['method'])
+            self._method = prepared.method
+        self._static_url = 'url' not in self._templates and \
+            'params' not in self._templates
+        self._timeout = parse_timeout(self._values.get('timeout'))
+        self._static_headers = 'headers' not in self._templates
+        # The content length of empty bodies depends on the method
+        self._static_body = not any(
+            key in self._templates
+            for key in ('method', 'headers', 'data', 'files', 'json')
+        )
+        # Static values merged with the session defaults, by the defaults
+        self._session_values = (None, None)
+        self._body = None
+        self._body_headers = None
+
+    def render(self, rendering) -> dict:
+        """ :return: the request parameters of an execution """
+        values = dict(self._values)
+        for key, template in self._templates.items():
+            # Rendering replaces nested values in place
+            values[key] = rendering.render_nested(deepcopy(template))
+        return values
+
+    def timeout(self, values: dict):
+        """ :return: the parsed `timeout` parameter of an execution """
+        if 'timeout' in self._templates:
+            return parse_timeout(values['timeout'])
+        return self._timeout
+
+    def prepare(self, session, values: dict) -> PreparedRequest:
+        """ Prepare the request of an execution for the session. """
+        merged = self._merge_session_values(session)
+        prepared = PreparedRequest()
+        if self._method is not None:
+            prepared.method = self._method
+        else:
+            prepared.prepare_method(values['method'].upper())
+        if 'url' in merged:
+            prepared.url = merged['url']
+        else:
+            prepared.prepare_url(
+                values['url'],
+                merge_setting(values.get('params'), session.params)
+            )
+        if 'headers' in merged:
+            prepared.headers = merged['headers'].copy()
+        else:
+            prepared.headers = _merge_headers(session, values)
+        prepared.prepare_cookies(_merge_cookies(session, values))
+        if self._static_body:
+            self._prepare_static_body(prepared, values)
+        else:
+            prepared.prepare_body(
+                values.get('data'),
+                values.get('files'),
+                values.get('json')
+            )
+        if 'auth' in merged:
+            auth = merged['auth']
+        else:
+            auth = _merge_auth(session, values.get('auth'), prepared.url)
+        prepared.prepare_auth(auth, prepared.url)
+        if 'hooks' in merged:
+            prepared.prepare_hooks(merged['hooks'])
+        else:
+            prepared.prepare_hooks(
+                merge_hooks(values.get('hooks'), session.hooks)
+            )
+        return prepared
+
+    def _merge_session_values(self, session) -> dict:
+        """
+        :return: the static values merged with the defaults of the session,
+            by name
+        """
+        defaults = (
+            tuple(session.headers.items()),
+            dict(session.params),
+            session.auth,
+            {event: list(hooks) for event, hooks in session.hooks.items()},
+            session.trust_env
+        )
+        cached_defaults, merged = self._session_values
+        if cached_defaults == defaults:
+            return merged
+        merged = {}
+        if self._static_url:
+            prepared = PreparedRequest()
+            prepared.prepare_url(
+                self._values['url'],
+                merge_setting(self._values.get('params'), session.params)
+            )
+            merged['url'] = prepared.url
+            if 'auth' not in self._templates:
+                merged['auth'] = _merge_auth(
+                    session,
+                    self._values.get('auth'),
+                    prepared.url
+                )
+        if self._static_headers:
+            merged['headers'] = _merge_headers(session, self._values)
+        if 'hooks' not in self._templates:
+            merged['hooks'] = merge_hooks(
+                self._values.get('hooks'),
+                session.hooks
+            )
+        self._session_values = (defaults, merged)
+        return merged
+
+    def _prepare_static_body(self, prepared, values):
+        # Static bodies imply static headers, which are the same on
+        # every execution
+        if self._body_headers is None:
+            body = PreparedRequest()
+            body.method = prepared.method
+            body.headers = prepared.headers.copy()
+            body.prepare_body(
+                values.get('data'),
+                values.get('files'),
+                values.get('json')
+            )
+            self._body = body.body
+            # Headers added for the body, e.g. its type and length
+            self._body_headers = {
+                name: value
+                for name, value in body.headers.items()
+                if prepared.headers.get(name) != value
+            }
+        prepared.body = self._body
+        prepared.headers.update(self._body_headers)
+
+
+def _merge_headers(session, values) -> CaseInsensitiveDict:
+    prepared = PreparedRequest()
+    prepared.prepare_headers(merge_setting(
+        values.get('headers'),
+        session.headers,
+        dict_class=CaseInsensitiveDict
+    ))
+    return prepared.headers
+
+
+def _merge_cookies(session, values):
+    cookies = values.get('cookies') or {}
+    if not session.cookies:
+        return cookies
+    if not isinstance(cookies, CookieJar):
+        cookies = cookiejar_from_dict(cookies)
+    return merge_cookies(
+        merge_cookies(RequestsCookieJar(), session.cookies),
+        cookies
+    )
+
+
+def _merge_auth(session, auth, url):
+    if session.trust_env and not auth and not session.auth:
+        auth = get_netrc_auth(url)
+    return merge_setting(auth, session.auth)
+
+
+class RequestSkeletons(object):
+    """ Skeletons of the requests of each step, shared by executions. """
+    def __init__(self):
+        self._skeletons = {}
+        self._lock = threading.Lock()
+
+    def get(self, sequence_loader, index: int,
+            definition: dict) -> RequestSkeleton:
+        key = (sequence_loader, index)
+        skeleton = self._skeletons.get(key)
+        if skeleton is None:
+            with self._lock:
+                skeleton = self._skeletons.get(key)
+                if skeleton is None:
+                    skeleton = self._skeletons[key] = RequestSkeleton(
+                        sequence_loader.get('base_url'),
+                        sequence_loader.get('requests'),
+                        definition
+                    )
+        return skeleton
@@ -0,0 +1,63 @@
+import random
+import time
+
+DISTRIBUTIONS = ('constant', 'uniform', 'exponential')
+
+
+class ThinkTime(object):
+    """
+    Pause between the steps of a sequence, emulating a user reading a
+    page before the next action.
+
+    - `constant`: always `seconds`
+    - `uniform`: uniformly distributed between `min` and `max`
+    - `exponential`: exponentially distributed with the given `mean`,
+      optionally capped at `max`
+    """
+    def __init__(self, distribution: str = 'constant', seconds: float = None,
+                 min: float = None, max: float = None, mean: float = None):
+        if distribution not in DISTRIBUTIONS:
+            raise ValueError(
+                'Unknown think time distribution: {}'.format(distribution)
+            )
+        required = {
+            'constant': ('seconds', seconds),
+            'uniform': ('min', min if max is not None else None),
+            'exponential': ('mean', mean)
+        }[distribution]
+        if required[1] is None:
+            raise ValueError(
+                '{} think time requires {}'.format(
+                    distribution,
+                    'min and max' if distribution == 'uniform'
+                    else required[0]
+                )
+            )
+        self._distribution = distribution
+        self._seconds = seconds
+        self._min = min
+        self._max = max
+        self._mean = mean
+
+    @classmethod
+    def from_definition(cls, definition):
+        """
+        Create a think time from a `think_time` option; either a number of
+        seconds or a mapping of constructor arguments.
+        """
+        if definition is None:
+            return None
+        if isinstance(definition, (int, float)):
+            return cls(seconds=definition)
+        return cls(**definition)
+
+    def sample(self) -> float:
+        if self._distribution == 'constant':
+            return float(self._seconds)
+        if self._distribution == 'uniform':
+            return random.uniform(self._min, self._max)
+        seconds = random.expovariate(1.0 / self._mean)
+        return seconds if self._max is None else min(seconds, self._max)
+
+    def pause(self):
+        time.sleep(self.sample())
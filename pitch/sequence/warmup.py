@@ -0,0 +1,140 @@
+import logging
+import time
+from concurrent import futures
+
+from requests import PreparedRequest
+
+logger = logging.getLogger(__name__)
+
+
+class Warmup(object):
+    """
+    Warm-up phase executed before the measured part of a run.
+
+    - `connections`: connections opened to each base URL, including the
+      TLS handshake, and kept in the connection pool shared by the threads
+    - `iterations`: sequence executions of each thread
+    - `duration`: minimum warm-up time in seconds
+
+    Warm-up executions are not checkpointed, traced, captured or recorded
+    into a cassette and their failures are only logged.
+    """
+    def __init__(self, duration: float = 0.0, iterations: int = 0,
+                 connections: int = 0):
+        self._duration = float(duration)
+        self._iterations = int(iterations)
+        self._connections = int(connections)
+
+    @classmethod
+    def from_definition(cls, definition):
+        """
+        Create a warm-up phase from the sequence-level `warmup` option;
+        either a duration in seconds or a mapping of constructor arguments.
+        """
+        if not definition:
+            return None
+        if isinstance(definition, dict):
+            return cls(**definition)
+        return cls(duration=definition)
+
+    @property
+    def duration(self):
+        return self._duration
+
+    @property
+    def iterations(self):
+        return self._iterations
+
+    @property
+    def connections(self):
+        return self._connections
+
+    @property
+    def executes(self) -> bool:
+        return self._duration > 0 or self._iterations > 0
+
+    def executions(self, started: float):
+        """
+        Iterate once per warm-up execution of a thread.
+
+        :param started: monotonic start time of the warm-up phase
+        """
+        iteration = 0
+        while iteration < self._iterations or \
+                time.monotonic() - started < self._duration:
+            yield iteration
+            iteration += 1
+
+    def prewarm(self, adapter, urls):
+        """
+        Open `connections` connections to each URL through the adapter
+        and return them to its pools.
+        """
+        if not self._connections:
+            return
+        for url in set(urls):
+            if hasattr(adapter, 'prewarm'):
+                # Multiplexing transports open connections of their own
+                logger.info('[warmup] Opened {} connections to {}'.format(
+                    adapter.prewarm(url, self._connections),
+                    url
+                ))
+                continue
+            pool = _connection_pool(adapter, url)
+            if not hasattr(pool, '_get_conn'):
+                logger.warning(
+                    '[warmup] Cannot pre-open connections to {}'.format(url)
+                )
+                continue
+            # Taken from the pool, so that they replace its empty slots;
+            # urllib3 has no public API for opening pooled connections
+            connections = [
+                pool._get_conn()
+                for _ in range(min(self._connections, pool.pool.maxsize))
+            ]
+            with futures.ThreadPoolExecutor(
+                    max_workers=min(len(connections), 16)) as executor:
+                connected = sum(executor.map(_connect, connections))
+            for connection in connections:
+                pool._put_conn(connection)
+            logger.info('[warmup] Opened {} connections to {}'.format(
+                connected,
+                url
+            ))
+
+
+def _connection_pool(adapter, url):
+    """
+    :return: the urllib3 pool the adapter sends the requests to the URL
+        through
+    """
+    if hasattr(adapter, 'get_connection_with_tls_context'):
+        # requests >= 2.32 keys pools by their TLS settings
+        request = PreparedRequest()
+        request.prepare_url(url, None)
+        return adapter.get_connection_with_tls_context(request, True)
+    return adapter.get_connection(url)
+
+
+def _connect(connection) -> bool:
+    try:
+        connection.connect()
+    except OSError as e:
+        logger.warning('[warmup] Connection failed: {}'.format(e))
+        connection.close()
+        return False
+    return True
+
+
+def measurement_duration(sequence_loader):
+    """
+    :return: length of the measurement window of runs with a `duration`,
+        excluding the sequence-level `cooldown` at the end, or `None`
+    """
+    duration = sequence_loader.get('duration', None)
+    if duration is None:
+        return None
+    return max(
+        0.0,
+        float(duration) - float(sequence_loader.get('cooldown', 0) or 0)
+    )
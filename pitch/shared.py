@@ -0,0 +1,181 @@
+import multiprocessing
+import os
+import threading
+import time
+from collections.abc import Mapping
+from multiprocessing.managers import SyncManager
+
+from pitch.exceptions import SharedVariablesTimeoutError
+
+
+class SharedVariables(Mapping):
+    """
+    Variables shared by all threads and processes of a run, available in
+    templates as `shared`.
+
+    With multiple processes the values are kept by a manager process.
+    Reads are served from a per-process cache, which is invalidated through
+    a generation counter in shared memory whenever a value changes, so
+    reading unchanged values needs no inter-process communication.
+
+    Values may expire after a TTL. Steps computing shared values can be
+    executed once: the first execution acquires a lease on the values it
+    computes and the others wait until the values are available.
+    """
+    def __init__(self, values, leases, condition, generation, ttl=None,
+                 wait_timeout: float = 60.0, lease_timeout: float = 60.0,
+                 manager: SyncManager = None):
+        self._values = values
+        self._leases = leases
+        self._condition = condition
+        self._generation = generation
+        self._ttl = ttl
+        self._wait_timeout = float(wait_timeout)
+        self._lease_timeout = float(lease_timeout)
+        self._manager = manager
+        self._initialize_cache()
+
+    def _initialize_cache(self):
+        self._cache = {}
+        self._cache_generation = None
+        self._cache_lock = threading.Lock()
+
+    @classmethod
+    def create(cls, processes: int = 1, **options):
+        """
+        Create a store for a run; a manager process is started only when
+        the run uses multiple processes.
+        """
+        generation = multiprocessing.Value('Q', 0, lock=False)
+        if processes > 1:
+            manager = SyncManager()
+            manager.start()
+            return cls(
+                manager.dict(),
+                manager.dict(),
+                manager.Condition(),
+                generation,
+                manager=manager,
+                **options
+            )
+        return cls({}, {}, threading.Condition(), generation, **options)
+
+    @classmethod
+    def from_definition(cls, definition, processes: int = 1):
+        """
+        Create a store from the sequence-level `shared_variables` option;
+        either `true` or a mapping with `ttl`, `wait_timeout` and
+        `lease_timeout`.
+        """
+        if not definition:
+            return None
+        if definition is True:
+            definition = {}
+        return cls.create(processes=processes, **definition)
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        for name in ('_cache', '_cache_generation', '_cache_lock',
+                     '_manager'):
+            del state[name]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._manager = None
+        self._initialize_cache()
+
+    def shutdown(self):
+        if self._manager is not None:
+            self._manager.shutdown()
+            self._manager = None
+
+    def __getitem__(self, name):
+        with self._cache_lock:
+            generation = self._generation.value
+            if generation != self._cache_generation:
+                self._cache = {}
+                self._cache_generation = generation
+            entry = self._cache.get(name)
+        if entry is None:
+            entry = self._values[name]
+            with self._cache_lock:
+                if self._cache_generation == generation:
+                    self._cache[name] = entry
+        value, expires = entry
+        if expires is not None and expires <= time.time():
+            raise KeyError(name)
+        return value
+
+    def __iter__(self):
+        now = time.time()
+        return iter([
+            name
+            for name, (_, expires) in self._values.items()
+            if expires is None or expires > now
+        ])
+
+    def __len__(self):
+        return len(list(iter(self)))
+
+    def set(self, name, value, ttl=None):
+        ttl = self._ttl if ttl is None else ttl
+        expires = None if ttl is None else time.time() + float(ttl)
+        with self._condition:
+            self._values[name] = (value, expires)
+            self._generation.value += 1
+            self._condition.notify_all()
+
+    def _fresh(self, names, now):
+        for name in names:
+            entry = self._values.get(name)
+            if entry is None or (entry[1] is not None and entry[1] <= now):
+                return False
+        return True
+
+    def acquire(self, names, owner=None) -> bool:
+        """
+        Wait until the given values are available or a lease on computing
+        them is granted.
+
+        :return: `True` if the caller holds the lease and must compute the
+            values, `False` if they are available
+        :raises SharedVariablesTimeoutError: when the values are still being
+            computed by the lease holder after `wait_timeout`
+        """
+        if owner is None:
+            owner = _owner()
+        key = ','.join(sorted(names))
+        deadline = time.monotonic() + self._wait_timeout
+        with self._condition:
+            while True:
+                now = time.time()
+                if self._fresh(names, now):
+                    return False
+                lease = self._leases.get(key)
+                if lease is None or lease[1] <= now:
+                    # No lease or an expired one (its holder may have died)
+                    self._leases[key] = (owner, now + self._lease_timeout)
+                    return True
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise SharedVariablesTimeoutError(
+                        'Timed out waiting for shared variables {}'.format(
+                            key
+                        )
+                    )
+                self._condition.wait(min(remaining, lease[1] - now, 1.0))
+
+    def release(self, names, owner=None):
+        if owner is None:
+            owner = _owner()
+        key = ','.join(sorted(names))
+        with self._condition:
+            lease = self._leases.get(key)
+            if lease is not None and lease[0] == owner:
+                del self._leases[key]
+            self._condition.notify_all()
+
+
+def _owner():
+    return '{}.{}'.format(os.getpid(), threading.get_ident())
@@ -0,0 +1,186 @@
+import atexit
+import gzip
+import os
+import threading
+import time
+from datetime import datetime
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover
+    fcntl = None
+
+COMPRESSIONS = (None, 'gzip', 'zstd')
+
+_sinks = {}
+_sinks_lock = threading.Lock()
+
+
+def _zstd_compress(data: bytes) -> bytes:
+    try:
+        import zstandard
+    except ImportError:
+        raise ImportError(
+            'zstd compression requires the zstandard package'
+        )
+    return zstandard.ZstdCompressor().compress(data)
+
+
+_COMPRESSORS = {
+    None: lambda data: data,
+    'gzip': gzip.compress,
+    'zstd': _zstd_compress
+}
+
+
+class JSONLinesSink(object):
+    """
+    Buffered, append-only JSON Lines writer.
+
+    Lines are collected in memory and appended to the file in batches.
+    Each batch is written with a single `write` call while holding an
+    exclusive file lock, so multiple threads and processes can safely share
+    the same file. Compressed batches are written as independent gzip members
+    or zstd frames, which concatenate into a valid stream.
+    """
+    def __init__(self, filename: str, compression: str = None,
+                 buffer_size: int = 1 << 20, flush_interval: float = 1.0,
+                 max_bytes: int = None, rotate_interval: float = None):
+        if compression not in COMPRESSIONS:
+            raise ValueError('Unknown compression: {}'.format(compression))
+        self._filename = filename
+        self._compress = _COMPRESSORS[compression]
+        self._buffer_size = int(buffer_size)
+        self._flush_interval = float(flush_interval)
+        self._max_bytes = None if max_bytes is None else int(max_bytes)
+        self._rotate_interval = None if rotate_interval is None \
+            else float(rotate_interval)
+        self._lock = threading.Lock()
+        self._buffer = []
+        self._buffered_bytes = 0
+        self._last_flush = time.monotonic()
+        self._fd = None
+        self._opened_at = None
+
+    @property
+    def filename(self):
+        return self._filename
+
+    def write(self, line: bytes):
+        with self._lock:
+            self._buffer.append(line)
+            self._buffer.append(b'\n')
+            self._buffered_bytes += len(line) + 1
+            if self._buffered_bytes >= self._buffer_size or \
+                    time.monotonic() - self._last_flush >= \
+                    self._flush_interval:
+                self._flush()
+
+    def flush(self):
+        with self._lock:
+            self._flush()
+
+    def close(self):
+        with self._lock:
+            self._flush()
+            if self._fd is not None:
+                os.close(self._fd)
+                self._fd = None
+
+    def _flush(self):
+        self._last_flush = time.monotonic()
+        if not self._buffer:
+            return
+        payload = self._compress(b''.join(self._buffer))
+        self._buffer = []
+        self._buffered_bytes = 0
+
+        if self._fd is None:
+            self._open()
+        self._lock_file()
+        try:
+            self._reopen_if_rotated()
+            if self._should_rotate(len(payload)):
+                self._rotate()
+            view = memoryview(payload)
+            while view:
+                view = view[os.write(self._fd, view):]
+        finally:
+            self._unlock_file()
+
+    def _open(self):
+        self._fd = os.open(
+            self._filename,
+            os.O_WRONLY | os.O_APPEND | os.O_CREAT,
+            0o644
+        )
+        self._opened_at = time.time()
+
+    def _lock_file(self):
+        if fcntl is not None:
+            fcntl.flock(self._fd, fcntl.LOCK_EX)
+
+    def _unlock_file(self):
+        if fcntl is not None:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+
+    def _reopen_if_rotated(self):
+        # Another process may have rotated the file since it was opened.
+        try:
+            current = os.stat(self._filename)
+        except FileNotFoundError:
+            current = None
+        opened = os.fstat(self._fd)
+        if current is None or current.st_ino != opened.st_ino:
+            self._unlock_file()
+            os.close(self._fd)
+            self._open()
+            self._lock_file()
+
+    def _should_rotate(self, incoming: int) -> bool:
+        size = os.fstat(self._fd).st_size
+        if size == 0:
+            return False
+        if self._max_bytes is not None and \
+                size + incoming > self._max_bytes:
+            return True
+        return self._rotate_interval is not None and \
+            time.time() - self._opened_at >= self._rotate_interval
+
+    def _rotate(self):
+        directory, basename = os.path.split(self._filename)
+        root, _, extension = basename.partition('.')
+        rotated = '{}-{}{}'.format(
+            root,
+            datetime.now().strftime('%Y%m%dT%H%M%S.%f'),
+            '.' + extension if extension else ''
+        )
+        os.rename(self._filename, os.path.join(directory, rotated))
+        self._unlock_file()
+        os.close(self._fd)
+        self._open()
+        self._lock_file()
+
+
+def get_sink(filename: str, **options) -> JSONLinesSink:
+    """
+    Return the sink of the current process for the given file, creating it
+    on first use. Threads of the same process share one buffered handle.
+    """
+    key = (os.getpid(), filename)
+    with _sinks_lock:
+        sink = _sinks.get(key)
+        if sink is None:
+            sink = _sinks[key] = JSONLinesSink(filename, **options)
+        return sink
+
+
+def close_sinks():
+    """ Flush and close all sinks opened by the current process. """
+    pid = os.getpid()
+    with _sinks_lock:
+        for key in [key for key in _sinks if key[0] == pid]:
+            _sinks.pop(key).close()
+
+
+atexit.register(close_sinks)
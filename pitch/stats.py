@@ -0,0 +1,300 @@
+import math
+import threading
+import time
+from collections import Counter, namedtuple
+
+from requests.exceptions import Timeout
+
+from pitch.exceptions import StepTimeoutError
+from pitch.hooks import StepStart, ResponseDone, Error
+
+OUTCOMES = ('ok', 'failure', 'timeout', 'error')
+
+TIMEOUT_ERRORS = (Timeout, StepTimeoutError)
+
+
+class LatencyHistogram(object):
+    """
+    Log-linear latency histogram.
+
+    Durations are counted in buckets growing by `precision` (1% by
+    default), so percentiles are accurate within that relative error while
+    memory stays constant regardless of the number of samples.
+    """
+    _MINIMUM = 1e-6
+
+    def __init__(self, precision: float = 0.01):
+        self._precision = precision
+        self._base = math.log1p(precision)
+        self._buckets = Counter()
+        self._count = 0
+        self._sum = 0.0
+        self._min = None
+        self._max = None
+
+    @property
+    def count(self):
+        return self._count
+
+    @property
+    def mean(self):
+        return self._sum / self._count if self._count else None
+
+    @property
+    def min(self):
+        return self._min
+
+    @property
+    def max(self):
+        return self._max
+
+    def record(self, seconds: float):
+        seconds = max(seconds, self._MINIMUM)
+        self._buckets[
+            int(math.log(seconds / self._MINIMUM) / self._base)
+        ] += 1
+        self._count += 1
+        self._sum += seconds
+        self._min = seconds if self._min is None else min(self._min, seconds)
+        self._max = seconds if self._max is None else max(self._max, seconds)
+
+    def merge(self, other: 'LatencyHistogram'):
+        self._buckets.update(other._buckets)
+        self._count += other._count
+        self._sum += other._sum
+        for value in (other._min, other._max):
+            if value is not None:
+                self._min = value if self._min is None \
+                    else min(self._min, value)
+                self._max = value if self._max is None \
+                    else max(self._max, value)
+
+    def percentile(self, percentile: float):
+        """
+        :param percentile: between 0 and 100
+        :return: the latency in seconds or `None` without samples
+        """
+        if not self._count:
+            return None
+        rank = max(1, math.ceil(self._count * percentile / 100.0))
+        seen = 0
+        for bucket in sorted(self._buckets):
+            seen += self._buckets[bucket]
+            if seen >= rank:
+                # Middle of the bucket, clamped to the observed range
+                value = self._MINIMUM * math.exp(self._base * (bucket + 0.5))
+                return min(max(value, self._min), self._max)
+        return self._max
+
+    def items(self):
+        """
+        :return: `(latency, count)` pairs in increasing latency order,
+            using the middle of each bucket
+        """
+        return [
+            (self._MINIMUM * math.exp(self._base * (bucket + 0.5)), count)
+            for bucket, count in sorted(self._buckets.items())
+        ]
+
+    def to_dict(self) -> dict:
+        """ JSON-serializable form of the histogram. """
+        return {
+            'precision': self._precision,
+            'count': self._count,
+            'sum': self._sum,
+            'min': self._min,
+            'max': self._max,
+            'buckets': {
+                str(bucket): count
+                for bucket, count in sorted(self._buckets.items())
+            }
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> 'LatencyHistogram':
+        histogram = cls(precision=data['precision'])
+        histogram._buckets.update({
+            int(bucket): count
+            for bucket, count in data['buckets'].items()
+        })
+        histogram._count = data['count']
+        histogram._sum = data['sum']
+        histogram._min = data['min']
+        histogram._max = data['max']
+        return histogram
+
+
+MannWhitney = namedtuple('MannWhitney', 'u z p_value')
+
+
+def mann_whitney(first: LatencyHistogram, second: LatencyHistogram):
+    """
+    Mann-Whitney U test of two latency distributions, computed on the
+    histogram buckets (samples in the same bucket are ties) with the
+    normal approximation and tie correction.
+
+    :return: `MannWhitney` with the U statistic of `first`, the z-score
+        (positive when `first` is slower) and the two-sided p-value, or
+        `None` without samples
+    """
+    first_count, second_count = first.count, second.count
+    count = first_count + second_count
+    if not first_count or not second_count or count < 2:
+        return None
+    counts = {}
+    for index, histogram in enumerate((first, second)):
+        for latency, bucket_count in histogram.items():
+            counts.setdefault(latency, [0, 0])[index] += bucket_count
+
+    rank_sum = 0.0
+    ties = 0.0
+    ranked = 0
+    for latency in sorted(counts):
+        in_first, in_second = counts[latency]
+        tied = in_first + in_second
+        # Tied samples share the average of their ranks
+        rank_sum += in_first * (ranked + (tied + 1) / 2.0)
+        ties += tied ** 3 - tied
+        ranked += tied
+
+    u = rank_sum - first_count * (first_count + 1) / 2.0
+    mean = first_count * second_count / 2.0
+    variance = first_count * second_count / 12.0 * (
+        (count + 1) - ties / (count * (count - 1))
+    )
+    if variance <= 0:
+        return MannWhitney(u=u, z=0.0, p_value=1.0)
+    z = (u - mean) / math.sqrt(variance)
+    return MannWhitney(u=u, z=z, p_value=math.erfc(abs(z) / math.sqrt(2)))
+
+
+class Statistics(object):
+    """ Latency histogram and outcome counters of a set of requests. """
+    def __init__(self):
+        self.latency = LatencyHistogram()
+        self.outcomes = Counter({outcome: 0 for outcome in OUTCOMES})
+
+    @property
+    def requests(self):
+        return sum(self.outcomes.values())
+
+    @property
+    def error_rate(self):
+        requests = self.requests
+        if not requests:
+            return 0.0
+        return (requests - self.outcomes['ok']) / requests
+
+    def merge(self, other: 'Statistics'):
+        self.latency.merge(other.latency)
+        self.outcomes.update(other.outcomes)
+
+    def to_dict(self) -> dict:
+        return {
+            'outcomes': dict(self.outcomes),
+            'latency': self.latency.to_dict()
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> 'Statistics':
+        statistics = cls()
+        statistics.outcomes.update(data['outcomes'])
+        statistics.latency = LatencyHistogram.from_dict(data['latency'])
+        return statistics
+
+
+class RunStatistics(object):
+    """
+    Collect request statistics, in total and per step, from the events
+    of a `HookBus`.
+
+    Each request has a single outcome: `ok`, `failure` when the response
+    has an error status code or a response plugin raised an error (e.g. a
+    failed assertion), `timeout` when a request timed out or the step
+    deadline passed and `error` when no response was received otherwise.
+
+    Only steps started within the measurement window, unbounded by
+    default, are counted.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._window = (0.0, math.inf)
+        self.total = Statistics()
+        self.steps = {}
+
+    def __getstate__(self):
+        return {
+            'total': self.total,
+            'steps': self.steps,
+            '_window': self._window
+        }
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def subscribe(self, bus):
+        bus.subscribe(StepStart, self._on_step_start)
+        bus.subscribe(ResponseDone, self._on_response_done)
+        bus.subscribe(Error, self._on_error)
+        return self
+
+    def unsubscribe(self, bus):
+        bus.unsubscribe(StepStart, self._on_step_start)
+        bus.unsubscribe(ResponseDone, self._on_response_done)
+        bus.unsubscribe(Error, self._on_error)
+
+    def measure(self, start: float = None, end: float = None):
+        """
+        Count the steps started between `start` (now by default) and `end`,
+        as seconds since the epoch.
+        """
+        self._window = (
+            time.time() if start is None else start,
+            math.inf if end is None else end
+        )
+
+    def step(self, index) -> Statistics:
+        statistics = self.steps.get(index)
+        if statistics is None:
+            statistics = self.steps.setdefault(index, Statistics())
+        return statistics
+
+    def _on_step_start(self, event):
+        self._local.outcome = None
+        start, end = self._window
+        self._local.measured = start <= event.time < end
+
+    def _on_response_done(self, event):
+        if not getattr(self._local, 'measured', True):
+            return
+        outcome = 'ok' if event.response.status_code < 400 else 'failure'
+        self._local.outcome = outcome
+        with self._lock:
+            for statistics in (self.total, self.step(event.step)):
+                statistics.latency.record(event.elapsed)
+                statistics.outcomes[outcome] += 1
+
+    def _on_error(self, event):
+        if not getattr(self._local, 'measured', True):
+            return
+        outcome = getattr(self._local, 'outcome', None)
+        self._local.outcome = None
+        timeout = isinstance(event.exception, TIMEOUT_ERRORS)
+        with self._lock:
+            for statistics in (self.total, self.step(event.step)):
+                if outcome is None:
+                    statistics.outcomes['timeout' if timeout else 'error'] += 1
+                elif outcome == 'ok':
+                    statistics.outcomes['ok'] -= 1
+                    statistics.outcomes[
+                        'timeout' if timeout else 'failure'
+                    ] += 1
+
+    def merge(self, other: 'RunStatistics'):
+        with self._lock:
+            self.total.merge(other.total)
+            for index, statistics in other.steps.items():
+                self.step(index).merge(statistics)
@@ -2,12 +2,12 @@ from jinja2 import Environment, Undefined
 from requests.structures import CaseInsensitiveDict
 from boltons.typeutils import make_sentinel
 
+from pitch.hooks import HookBus
+from pitch.profiling import NULL_PROFILER
+from pitch.tracing import NULL_SPAN
 from pitch.templating.jinja_custom_extensions import \
     get_registered_filters, get_registered_tests
 
-from requests import Request
-from argparse import Namespace
-
 
 KEYWORDS = (
     'plugins',
@@ -17,7 +17,11 @@ KEYWORDS = (
     'with_indexed_items',
     'with_nested',
     'use_default_plugins',
-    'use_scheme_plugins'
+    'use_scheme_plugins',
+    'name',
+    'depends_on',
+    'compute_once',
+    'deadline'
 )
 
 DEFAULT_PLUGINS = (
@@ -26,28 +30,17 @@ DEFAULT_PLUGINS = (
 )
 
 
-class HTTPRequest(Request):
-    def __init__(self, *args, **kwargs):
-        super(HTTPRequest, self).__init__(*args, **kwargs)
-        self.__pitch_properties = Namespace()
-
-    @property
-    def pitch_properties(self):
-        return self.__pitch_properties
-
-    def update(self, **kwargs):
-        for property_name, value in kwargs.items():
-            setattr(self.__pitch_properties, property_name, value)
-            setattr(self, property_name, value)
-
-
 class Context(CaseInsensitiveDict):
     def __init__(self, *args, **kwargs):
         super(Context, self).__init__(*args, **kwargs)
         self.setdefault(
             'globals',
             CaseInsensitiveDict(
-                failfast=True
+                failfast=True,
+                profiler=NULL_PROFILER,
+                hooks=HookBus(),
+                checkpoint=None,
+                background=None
             )
         )
         self.setdefault(
@@ -55,7 +48,8 @@ class Context(CaseInsensitiveDict):
             CaseInsensitiveDict(
                 variables=CaseInsensitiveDict(),
                 response=None,
-                request=None
+                request=None,
+                shared=None
             )
         )
         self.setdefault(
@@ -63,7 +57,11 @@ class Context(CaseInsensitiveDict):
             CaseInsensitiveDict(
                 rendering=None,
                 http_session=None,
-                definition=None
+                definition=None,
+                index=None,
+                span=NULL_SPAN,
+                timeout=None,
+                deadline=None
             )
         )
 
@@ -99,8 +97,9 @@ class ContextProxy(object):
 class JinjaEvaluator(object):
     _MISSING = make_sentinel()
 
-    def __init__(self, context: Context):
+    def __init__(self, context: Context, profiler=NULL_PROFILER):
         self._context = context
+        self._profiler = profiler
         self._environment = Environment()
         self._environment.filters.update(get_registered_filters())
         self._environment.tests.update(get_registered_tests())
@@ -110,13 +109,13 @@ class JinjaEvaluator(object):
         Evaluate a Jinja expression and return the corresponding
         Python object.
         """
-        expression = expression.strip().lstrip('{').rstrip('}').strip()
-        environment = Environment()
-        expression = environment.compile_expression(
-            expression,
-            undefined_to_none=False
-        )
-        value = expression(**self._context)
+        with self._profiler.phase('render'):
+            expression = expression.strip().lstrip('{').rstrip('}').strip()
+            expression = self._environment.compile_expression(
+                expression,
+                undefined_to_none=False
+            )
+            value = expression(**self._context)
 
         if isinstance(value, Undefined):
             return default
@@ -125,8 +124,9 @@ class JinjaEvaluator(object):
 
     def render(self, expression, default=_MISSING):
         if isinstance(expression, str):
-            expression = self._environment.from_string(expression)
-            value = expression.render(**self._context)
+            with self._profiler.phase('render'):
+                expression = self._environment.from_string(expression)
+                value = expression.render(**self._context)
         else:
             value = expression
 
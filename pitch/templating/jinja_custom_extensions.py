@@ -1,13 +1,24 @@
+import functools
 import json
 import os
 from typing import Callable
 
+try:
+    import jmespath
+except ImportError:  # pragma: no cover
+    jmespath = None
+
+try:
+    import jsonpath_ng.ext
+except ImportError:  # pragma: no cover
+    jsonpath_ng = None
+
 _FILTERS = {}
 _TESTS = {}
 
 
 def _get_name(name):
-    return name.split('_', 2)[-1]
+    return name.lstrip('_').split('_', 2)[-1]
 
 
 def register_filter(func: Callable):
@@ -32,6 +43,65 @@ def _core_filter_from_json(value):
     return json.loads(value)
 
 
+@functools.lru_cache(maxsize=1024)
+def compile_query(expression: str, language: str = None):
+    """
+    Compile a path query once. Unless the `language` is given, expressions
+    starting with `$` are JSONPath queries and all others JMESPath queries.
+    """
+    if language is None:
+        language = 'jsonpath' if expression.lstrip().startswith('$') \
+            else 'jmespath'
+    if language == 'jsonpath':
+        if jsonpath_ng is None:
+            raise ImportError(
+                'JSONPath queries require the jsonpath-ng package'
+            )
+        return _JSONPathQuery(jsonpath_ng.ext.parse(expression))
+    if language == 'jmespath':
+        if jmespath is None:
+            raise ImportError('JMESPath queries require the jmespath package')
+        return jmespath.compile(expression)
+    raise ValueError('Unknown query language: {}'.format(language))
+
+
+class _JSONPathQuery(object):
+    def __init__(self, path):
+        self._path = path
+
+    def search(self, document):
+        return [match.value for match in self._path.find(document)]
+
+
+def query_document(value):
+    """ JSON document of a response, a JSON string or the value itself. """
+    if isinstance(value, (str, bytes)):
+        return json.loads(value)
+    if callable(getattr(value, 'json', None)):
+        document = getattr(value, 'as_json', None)
+        return value.json() if document is None else document
+    return value
+
+
+def search(expression: str, value, language: str = None):
+    """
+    :return: the result of a JMESPath query or the list of matches of a
+        JSONPath query
+    """
+    return compile_query(expression, language).search(query_document(value))
+
+
+def _core_filter_jmespath(value, expression):
+    return search(expression, value, 'jmespath')
+
+
+def _core_filter_jsonpath(value, expression, first=False, default=None):
+    matches = search(expression, value, 'jsonpath')
+    if first:
+        return matches[0] if matches else default
+    return matches
+
+
 def _core_test_json_serializable(value):
     try:
         json.loads(value)
@@ -43,8 +113,17 @@ def _core_test_json_serializable(value):
 register_filter(_core_filter_from_environment)
 register_filter(_core_filter_to_json)
 register_filter(_core_filter_from_json)
+register_filter(_core_filter_jmespath)
+register_filter(_core_filter_jsonpath)
 register_test(_core_test_json_serializable)
 
+# Names of the core filters and tests before their prefix was dropped
+for _alias, _name in (('filter_from_environment', 'from_environment'),
+                      ('filter_to_json', 'to_json'),
+                      ('filter_from_json', 'from_json')):
+    _FILTERS[_alias] = _FILTERS[_name]
+_TESTS['test_json_serializable'] = _TESTS['json_serializable']
+
 
 def get_registered_filters():
     return _FILTERS.copy()
@@ -0,0 +1,249 @@
+import threading
+import time
+from collections import namedtuple
+
+from pitch.exceptions import ThresholdBreachedError
+from pitch.hooks import StepStart, ResponseDone
+from pitch.stats import RunStatistics
+
+METRICS = ('latency', 'error_rate', 'throughput', 'requests')
+# Metrics summed over the processes of a run
+ADDITIVE_METRICS = ('throughput', 'requests')
+
+ThresholdResult = namedtuple('ThresholdResult', 'threshold value passed')
+
+
+class Threshold(object):
+    """
+    Bound on an aggregate statistic of the run, e.g. the 95th latency
+    percentile of a step, the error rate or the throughput.
+    """
+    def __init__(self, metric: str, max: float = None, min: float = None,
+                 percentile: float = 99.0, step=None, abort: bool = False,
+                 delay: float = 10.0):
+        if metric not in METRICS:
+            raise ValueError('Unknown threshold metric: {}'.format(metric))
+        if max is None and min is None:
+            raise ValueError(
+                'Threshold on {} requires a min or max value'.format(metric)
+            )
+        self._metric = metric
+        self._max = max
+        self._min = min
+        self._percentile = float(percentile)
+        self._step = step
+        self._step_index = step if isinstance(step, int) else None
+        self._abort = abort
+        self._delay = float(delay)
+
+    @property
+    def step(self):
+        return self._step
+
+    def resolve(self, names: dict):
+        """ Resolve the step name to its index in the sequence. """
+        if self._step is None or isinstance(self._step, int):
+            return
+        if self._step not in names:
+            raise ValueError('Unknown threshold step: {}'.format(self._step))
+        self._step_index = names[self._step]
+
+    @property
+    def abort(self):
+        return self._abort
+
+    @property
+    def delay(self):
+        return self._delay
+
+    def __str__(self):
+        if self._metric == 'latency':
+            description = 'p{:g} latency'.format(self._percentile)
+        else:
+            description = self._metric.replace('_', ' ')
+        if self._step is not None:
+            description += ' of step {}'.format(self._step)
+        bounds = []
+        if self._min is not None:
+            bounds.append('>= {}'.format(self._min))
+        if self._max is not None:
+            bounds.append('<= {}'.format(self._max))
+        return '{} {}'.format(description, ' and '.join(bounds))
+
+    def measure(self, statistics: RunStatistics, duration: float):
+        """
+        :param duration: elapsed run time in seconds
+        :return: the current value of the metric or `None` when no
+            requests have been recorded
+        """
+        if self._step is None:
+            aggregate = statistics.total
+        else:
+            aggregate = statistics.step(self._step_index)
+        if self._metric == 'requests':
+            return aggregate.requests
+        if not aggregate.requests:
+            return None
+        if self._metric == 'latency':
+            return aggregate.latency.percentile(self._percentile)
+        if self._metric == 'error_rate':
+            return aggregate.error_rate
+        return aggregate.requests / duration if duration > 0 else None
+
+    def check(self, value, share: float = 1.0) -> bool:
+        """
+        :param share: share of the run the value was measured on, e.g. one
+            of several processes; bounds of additive metrics are scaled
+            by it
+        """
+        if value is None:
+            return False
+        if self._metric not in ADDITIVE_METRICS:
+            share = 1.0
+        if self._min is not None and value < self._min * share:
+            return False
+        return self._max is None or value <= self._max * share
+
+
+class ThresholdMonitor(object):
+    """
+    Evaluate thresholds over the statistics collected from a `HookBus`.
+
+    Thresholds with `abort` enabled are checked at most once every
+    `interval` seconds while the run progresses, after their `delay`;
+    once one is breached, executions stop before their next step. With
+    multiple processes each process checks its own statistics, and its
+    throughput and request count against an equal per-process share of
+    the bounds. All thresholds are evaluated on the final statistics by
+    `evaluate`.
+    """
+    def __init__(self, thresholds: list, interval: float = 1.0,
+                 processes: int = 1):
+        self._thresholds = thresholds
+        self._interval = float(interval)
+        self._processes = processes
+        self._statistics = RunStatistics()
+        self._lock = threading.Lock()
+        self._started = None
+        self._duration = None
+        self._elapsed = None
+        self._last_check = 0.0
+        self._breach = None
+
+    @classmethod
+    def from_definition(cls, definition, steps=(), processes=1):
+        """
+        Create a monitor from the sequence-level `thresholds` option; steps
+        may be referred to by name or zero-based index.
+        """
+        if not definition:
+            return None
+        names = {
+            step['name']: index
+            for index, step in enumerate(steps)
+            if step.get('name') is not None
+        }
+        thresholds = []
+        for options in definition:
+            threshold = Threshold(**options)
+            threshold.resolve(names)
+            thresholds.append(threshold)
+        return cls(thresholds, processes=processes)
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state['_lock']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    @property
+    def statistics(self) -> RunStatistics:
+        return self._statistics
+
+    def subscribe(self, bus):
+        self._statistics.subscribe(bus)
+        bus.subscribe(StepStart, self._on_step_start)
+        if any(threshold.abort for threshold in self._thresholds):
+            bus.subscribe(ResponseDone, self._on_response_done)
+        return self
+
+    def start(self, duration: float = None):
+        """
+        Start measuring, e.g. after a warm-up phase.
+
+        :param duration: length of the measurement window, when known
+        """
+        self._started = time.monotonic()
+        self._duration = duration
+        self._elapsed = None
+        if duration is not None:
+            self._statistics.measure(end=time.time() + duration)
+
+    def stop(self, elapsed: float = None):
+        """ Stop the clock, or set the measured time of the run. """
+        self._elapsed = self.elapsed if elapsed is None else elapsed
+
+    @property
+    def elapsed(self):
+        if self._elapsed is not None:
+            return self._elapsed
+        if self._started is None:
+            return 0.0
+        elapsed = time.monotonic() - self._started
+        if self._duration is not None:
+            elapsed = min(elapsed, self._duration)
+        return elapsed
+
+    def _on_step_start(self, event):
+        if self._breach is not None:
+            raise ThresholdBreachedError(
+                'Threshold breached: {} (value: {})'.format(*self._breach)
+            )
+
+    def _on_response_done(self, event):
+        now = time.monotonic()
+        with self._lock:
+            if self._breach is not None or \
+                    now - self._last_check < self._interval:
+                return
+            self._last_check = now
+            elapsed = self.elapsed
+            for threshold in self._thresholds:
+                if not threshold.abort or elapsed < threshold.delay:
+                    continue
+                value = threshold.measure(self._statistics, elapsed)
+                if not threshold.check(value, share=1.0 / self._processes):
+                    self._breach = (threshold, value)
+                    return
+
+    def evaluate(self, duration: float = None) -> list:
+        if duration is None:
+            duration = self.elapsed
+        results = []
+        for threshold in self._thresholds:
+            value = threshold.measure(self._statistics, duration)
+            results.append(ThresholdResult(
+                threshold=threshold,
+                value=value,
+                passed=threshold.check(value)
+            ))
+        return results
+
+    @staticmethod
+    def report(results: list) -> str:
+        width = max([len(str(result.threshold)) for result in results] + [9])
+        header = '{:<{width}} {:>14} {:>6}'.format(
+            'threshold', 'value', 'result', width=width
+        )
+        lines = [header, '-' * len(header)]
+        for result in results:
+            lines.append('{:<{width}} {:>14} {:>6}'.format(
+                str(result.threshold),
+                '-' if result.value is None else '{:.6g}'.format(result.value),
+                'pass' if result.passed else 'fail',
+                width=width
+            ))
+        return '\n'.join(lines)
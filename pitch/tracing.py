@@ -0,0 +1,245 @@
+import json
+import os
+import random
+import time
+
+from pitch.sinks import get_sink
+
+FORMATS = ('chrome', 'otlp')
+
+TRACEPARENT_HEADER = 'traceparent'
+
+# OTLP span kinds
+_KINDS = {'internal': 1, 'server': 2, 'client': 3}
+
+
+class NullSpan(object):
+    """ Span used when tracing is disabled; all operations are no-ops. """
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        pass
+
+    def child(self, name, kind='internal'):
+        return self
+
+    def update(self, attributes: dict):
+        pass
+
+
+NULL_SPAN = NullSpan()
+
+
+class Span(NullSpan):
+    """
+    Timed operation of a trace; children are exported together with
+    their parent.
+    """
+    def __init__(self, name, trace_id, parent_id=None, kind='internal',
+                 attributes=None):
+        self._name = name
+        self._trace_id = trace_id
+        self._span_id = '{:016x}'.format(random.getrandbits(64))
+        self._parent_id = parent_id
+        self._kind = kind
+        self._attributes = dict(attributes or {})
+        self._children = []
+        self._start = time.time_ns()
+        self._started = time.perf_counter_ns()
+        self._duration = None
+        self._error = None
+
+    @property
+    def name(self):
+        return self._name
+
+    @property
+    def trace_id(self):
+        return self._trace_id
+
+    @property
+    def span_id(self):
+        return self._span_id
+
+    @property
+    def parent_id(self):
+        return self._parent_id
+
+    @property
+    def kind(self):
+        return self._kind
+
+    @property
+    def attributes(self):
+        return self._attributes
+
+    @property
+    def children(self) -> list:
+        return self._children
+
+    @property
+    def start(self) -> int:
+        """ Start time in nanoseconds since the epoch. """
+        return self._start
+
+    @property
+    def duration(self) -> int:
+        """ Duration in nanoseconds; `None` while the span is open. """
+        return self._duration
+
+    @property
+    def error(self):
+        return self._error
+
+    @property
+    def traceparent(self) -> str:
+        """ W3C Trace Context header value with this span as parent. """
+        return '00-{}-{}-01'.format(self._trace_id, self._span_id)
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_value is not None:
+            self._error = repr(exc_value)
+        self.end()
+
+    def child(self, name, kind='internal'):
+        span = Span(name, self._trace_id, self._span_id, kind=kind)
+        self._children.append(span)
+        return span
+
+    def update(self, attributes: dict):
+        self._attributes.update(attributes)
+
+    def end(self):
+        if self._duration is None:
+            self._duration = time.perf_counter_ns() - self._started
+
+    def walk(self):
+        """ Iterate over the span and its descendants. """
+        yield self
+        for child in self._children:
+            yield from child.walk()
+
+
+class Tracer(object):
+    """
+    Record spans of sequence executions to a local file, in Chrome trace
+    event format (viewable in chrome://tracing or Perfetto) or as OTLP JSON
+    lines (`ExportTraceServiceRequest` documents).
+
+    Spans are exported once their top-level span ends, through the buffered
+    sink of the process, so processes can share the same file.
+    """
+    def __init__(self, filename: str, format: str = 'chrome',
+                 propagate: bool = True, service_name: str = 'pitch'):
+        if format not in FORMATS:
+            raise ValueError('Unknown trace format: {}'.format(format))
+        self._filename = os.path.abspath(os.path.expanduser(filename))
+        self._format = format
+        self._propagate = propagate
+        self._service_name = service_name
+
+    @property
+    def filename(self):
+        return self._filename
+
+    @property
+    def propagate(self):
+        return self._propagate
+
+    def reset(self):
+        """ Truncate the trace file; called once before a run. """
+        with open(self._filename, 'w') as f:
+            if self._format == 'chrome':
+                # The closing bracket of the event array is optional
+                f.write('[\n')
+
+    def start_span(self, name, parent: Span = None, kind='internal',
+                   attributes=None) -> Span:
+        """
+        Start a span exported separately from its parent; a new trace is
+        started when there is no parent.
+        """
+        if parent is None:
+            return Span(
+                name,
+                '{:032x}'.format(random.getrandbits(128)),
+                kind=kind,
+                attributes=attributes
+            )
+        return Span(
+            name,
+            parent.trace_id,
+            parent.span_id,
+            kind=kind,
+            attributes=attributes
+        )
+
+    def export(self, span: Span):
+        sink = get_sink(self._filename)
+        if self._format == 'chrome':
+            for line in self._chrome_events(span):
+                sink.write(line)
+        else:
+            sink.write(self._otlp_request(span))
+
+    def _chrome_events(self, span):
+        process = os.getpid()
+        for item in span.walk():
+            arguments = dict(
+                item.attributes,
+                trace_id=item.trace_id,
+                span_id=item.span_id
+            )
+            if item.error is not None:
+                arguments['error'] = item.error
+            yield json.dumps({
+                'name': item.name,
+                'cat': item.kind,
+                'ph': 'X',
+                'ts': item.start / 1000,
+                'dur': (item.duration or 0) / 1000,
+                'pid': process,
+                # Spans of a trace share a row
+                'tid': int(item.trace_id[-8:], 16),
+                'args': arguments
+            }).encode('utf-8') + b','
+
+    def _otlp_request(self, span):
+        spans = []
+        for item in span.walk():
+            document = {
+                'traceId': item.trace_id,
+                'spanId': item.span_id,
+                'name': item.name,
+                'kind': _KINDS[item.kind],
+                'startTimeUnixNano': str(item.start),
+                'endTimeUnixNano': str(item.start + (item.duration or 0)),
+                'attributes': [
+                    {'key': key, 'value': _otlp_value(value)}
+                    for key, value in item.attributes.items()
+                ],
+                'status': {'code': 1}
+            }
+            if item.parent_id is not None:
+                document['parentSpanId'] = item.parent_id
+            if item.error is not None:
+                document['status'] = {'code': 2, 'message': item.error}
+            spans.append(document)
+        return json.dumps({'resourceSpans': [{
+            'resource': {'attributes': [{
+                'key': 'service.name',
+                'value': {'stringValue': self._service_name}
+            }]},
+            'scopeSpans': [{'scope': {'name': 'pitch'}, 'spans': spans}]
+        }]}).encode('utf-8')
+
+
+def _otlp_value(value):
+    if isinstance(value, bool):
+        return {'boolValue': value}
+    if isinstance(value, int):
+        return {'intValue': str(value)}
+    if isinstance(value, float):
+        return {'doubleValue': value}
+    return {'stringValue': str(value)}
@@ -0,0 +1,24 @@
+from requests.adapters import BaseAdapter
+
+from pitch.transport.http2 import HTTP2Adapter
+
+TRANSPORTS = ('http1', 'http2')
+
+
+def create_adapter(definition) -> BaseAdapter:
+    """
+    Create the adapter of the sequence-level `transport` option; either
+    the name of a transport or a mapping with `type` and its options.
+
+    :return: `None` for HTTP/1.1, sent with the default `requests` adapter
+    """
+    if not definition:
+        return None
+    if isinstance(definition, str):
+        definition = {'type': definition}
+    transport = definition.get('type', 'http1')
+    if transport not in TRANSPORTS:
+        raise ValueError('Unknown transport: {}'.format(transport))
+    if transport == 'http1':
+        return None
+    return HTTP2Adapter.from_definition(definition)
@@ -0,0 +1,166 @@
+import base64
+import hashlib
+import itertools
+import json
+import threading
+from datetime import timedelta
+
+from requests import PreparedRequest, Response
+from requests.adapters import BaseAdapter, HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+
+from pitch.exceptions import CassetteMissError
+from pitch.sinks import get_sink
+
+MODES = ('record', 'replay')
+
+
+def _encode_body(body) -> dict:
+    if body is None:
+        return {'body': None}
+    if isinstance(body, str):
+        return {'body': body}
+    try:
+        return {'body': body.decode('utf-8')}
+    except UnicodeDecodeError:
+        return {'body_base64': base64.b64encode(body).decode('ascii')}
+
+
+def _decode_body(record: dict) -> bytes:
+    if 'body_base64' in record:
+        return base64.b64decode(record['body_base64'])
+    if record['body'] is None:
+        return b''
+    return record['body'].encode('utf-8')
+
+
+class Cassette(object):
+    """
+    On-disk store of request/response pairs in JSON Lines format.
+
+    In `record` mode every exchange is appended through a buffered sink, so
+    all threads and processes of a run can record into the same cassette.
+    In `replay` mode the cassette is loaded once per process into an
+    in-memory index keyed by method, URL and body digest; responses recorded
+    more than once for the same request are replayed in order, cyclically.
+    """
+    def __init__(self, path: str, mode: str):
+        if mode not in MODES:
+            raise ValueError('Unknown cassette mode: {}'.format(mode))
+        self._path = path
+        self._mode = mode
+        self._lock = threading.Lock()
+        self._index = None
+
+    def __getstate__(self):
+        return {'_path': self._path, '_mode': self._mode}
+
+    def __setstate__(self, state):
+        self.__init__(state['_path'], state['_mode'])
+
+    @property
+    def path(self):
+        return self._path
+
+    @property
+    def mode(self):
+        return self._mode
+
+    @staticmethod
+    def key(method, url, body) -> str:
+        if isinstance(body, str):
+            body = body.encode('utf-8')
+        digest = hashlib.sha1(body or b'').hexdigest()
+        return '{} {} {}'.format(method, url, digest)
+
+    def adapter(self) -> BaseAdapter:
+        if self._mode == 'record':
+            return RecordingAdapter(self)
+        return ReplayAdapter(self)
+
+    def record(self, request: PreparedRequest, response: Response):
+        exchange = {
+            'key': self.key(request.method, request.url, request.body),
+            'request': dict(
+                method=request.method,
+                url=request.url,
+                headers=dict(request.headers),
+                **_encode_body(request.body)
+            ),
+            'response': dict(
+                url=response.url,
+                status_code=response.status_code,
+                reason=response.reason,
+                headers=dict(response.headers),
+                **_encode_body(response.content)
+            )
+        }
+        get_sink(self._path).write(json.dumps(exchange).encode('utf-8'))
+
+    def play(self, request: PreparedRequest) -> dict:
+        with self._lock:
+            if self._index is None:
+                self._index = self._load()
+            responses = self._index.get(
+                self.key(request.method, request.url, request.body)
+            )
+            if responses is None:
+                raise CassetteMissError(
+                    'No recorded response for {} {}'.format(
+                        request.method, request.url
+                    )
+                )
+            return next(responses)
+
+    def _load(self):
+        recorded = {}
+        with open(self._path, 'rb') as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                exchange = json.loads(line)
+                recorded.setdefault(exchange['key'], []).append(
+                    exchange['response']
+                )
+        return {
+            key: itertools.cycle(responses)
+            for key, responses in recorded.items()
+        }
+
+
+class RecordingAdapter(HTTPAdapter):
+    """ Send requests over the network and record each exchange. """
+    def __init__(self, cassette: Cassette, **kwargs):
+        self._cassette = cassette
+        super(RecordingAdapter, self).__init__(**kwargs)
+
+    def send(self, request, **kwargs):
+        response = super(RecordingAdapter, self).send(request, **kwargs)
+        self._cassette.record(request, response)
+        return response
+
+
+class ReplayAdapter(BaseAdapter):
+    """ Serve recorded responses without touching the network. """
+    def __init__(self, cassette: Cassette):
+        self._cassette = cassette
+        super(ReplayAdapter, self).__init__()
+
+    def send(self, request, stream=False, timeout=None, verify=True,
+             cert=None, proxies=None):
+        recorded = self._cassette.play(request)
+        response = Response()
+        response.status_code = recorded['status_code']
+        response.reason = recorded['reason']
+        response.headers = CaseInsensitiveDict(recorded['headers'])
+        response.encoding = get_encoding_from_headers(response.headers)
+        response.url = recorded['url']
+        response.request = request
+        response.connection = self
+        response.elapsed = timedelta(0)
+        response._content = _decode_body(recorded)
+        return response
+
+    def close(self):
+        pass
@@ -0,0 +1,854 @@
+import http.client
+import logging
+import os
+import socket
+import ssl
+import threading
+import time
+import zlib
+from collections import Counter, deque
+from datetime import timedelta
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import BaseAdapter
+from requests.cookies import extract_cookies_to_jar
+from requests.structures import CaseInsensitiveDict
+from requests.utils import DEFAULT_CA_BUNDLE_PATH, default_headers, \
+    get_encoding_from_headers
+
+try:
+    import h2.config
+    import h2.connection
+    import h2.errors
+    import h2.events
+    import h2.exceptions
+    import h2.settings
+except ImportError:  # pragma: no cover
+    h2 = None
+
+logger = logging.getLogger(__name__)
+
+# Not allowed in HTTP/2 requests (RFC 9113, section 8.2.2)
+_CONNECTION_HEADERS = frozenset([
+    'connection', 'host', 'keep-alive', 'proxy-connection',
+    'transfer-encoding', 'upgrade'
+])
+
+# Only these content codings are decoded
+_ACCEPT_ENCODING = 'gzip, deflate'
+
+_REQUESTS_ACCEPT_ENCODING = default_headers()['Accept-Encoding']
+
+_DEFAULT_WINDOW_SIZE = 65535
+
+METRICS = (
+    'connections', 'streams', 'peak_streams', 'bytes_sent',
+    'bytes_received', 'flow_control_stalls', 'window_updates', 'resets',
+    'goaways'
+)
+
+
+def _ssl_context(verify, cert) -> ssl.SSLContext:
+    if verify is True:
+        verify = DEFAULT_CA_BUNDLE_PATH
+    if isinstance(verify, str) and os.path.isdir(verify):
+        context = ssl.create_default_context(capath=verify)
+    elif isinstance(verify, str):
+        context = ssl.create_default_context(cafile=verify)
+    else:
+        context = ssl.create_default_context()
+        context.check_hostname = False
+        context.verify_mode = ssl.CERT_NONE
+    if isinstance(cert, (list, tuple)):
+        context.load_cert_chain(*cert)
+    elif cert:
+        context.load_cert_chain(cert)
+    context.set_alpn_protocols(['h2'])
+    return context
+
+
+class _Stream(object):
+    def __init__(self, stream_id: int):
+        self.id = stream_id
+        self.headers = None
+        self.chunks = deque()
+        self.ended = False
+        self.error = None
+        self.finished = False
+
+
+class HTTP2Connection(object):
+    """
+    HTTP/2 connection multiplexing the streams of concurrent requests.
+
+    Frames are received by a background thread, which dispatches them to
+    the waiting streams; received data is acknowledged to the server
+    (re-opening its flow-control window) only once the response body has
+    been read.
+
+    Outgoing frames are queued in order while holding the connection lock
+    and written to the socket under a separate write lock, so that a slow
+    write does not block the streams waiting for received frames.
+    """
+    def __init__(self, origin: tuple, settings: dict,
+                 connection_window_size: int, ssl_context=None,
+                 connect_timeout: float = None):
+        scheme, host, port = origin
+        self._origin = origin
+        self._condition = threading.Condition()
+        self._write_lock = threading.Lock()
+        self._outgoing = deque()
+        self._streams = {}
+        self._failure = None
+        self._goaway = False
+        self._closed = False
+        self._ping = None
+        self.metrics = Counter({metric: 0 for metric in METRICS})
+        self.metrics['connections'] = 1
+        self.rtt = None
+        self._sock = socket.create_connection(
+            (host, port),
+            timeout=connect_timeout
+        )
+        try:
+            self._sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            if scheme == 'https':
+                self._sock = ssl_context.wrap_socket(
+                    self._sock,
+                    server_hostname=host
+                )
+                if self._sock.selected_alpn_protocol() != 'h2':
+                    raise requests.exceptions.ConnectionError(
+                        '{}:{} does not support HTTP/2'.format(host, port)
+                    )
+            self._sock.settimeout(None)
+        except BaseException:
+            self._sock.close()
+            raise
+        self._h2 = h2.connection.H2Connection(
+            config=h2.config.H2Configuration(
+                client_side=True,
+                header_encoding=None
+            )
+        )
+        self._h2.local_settings = h2.settings.Settings(
+            client=True,
+            initial_values=settings
+        )
+        with self._condition:
+            self._h2.initiate_connection()
+            if connection_window_size > _DEFAULT_WINDOW_SIZE:
+                self._h2.increment_flow_control_window(
+                    connection_window_size - _DEFAULT_WINDOW_SIZE
+                )
+            # Round-trip time of the connection
+            self._ping = (os.urandom(8), time.perf_counter())
+            self._h2.ping(self._ping[0])
+            self._flush()
+        self._send()
+        self._reader = threading.Thread(
+            target=self._read,
+            name='pitch-http2-reader',
+            daemon=True
+        )
+        self._reader.start()
+
+    @property
+    def origin(self):
+        return self._origin
+
+    @property
+    def usable(self) -> bool:
+        """ Whether new streams can be opened on the connection. """
+        return self._failure is None and not self._goaway and \
+            not self._closed
+
+    @property
+    def active_streams(self):
+        return len(self._streams)
+
+    @property
+    def max_streams(self):
+        return self._h2.remote_settings.max_concurrent_streams
+
+    def _flush(self):
+        """ Queue the pending frames; called with the connection lock. """
+        data = self._h2.data_to_send()
+        if data:
+            self.metrics['bytes_sent'] += len(data)
+            self._outgoing.append(data)
+
+    def _send(self):
+        """ Write the queued frames; called without the connection lock. """
+        with self._write_lock:
+            while self._outgoing:
+                self._sock.sendall(self._outgoing.popleft())
+
+    def _read(self):
+        try:
+            while True:
+                data = self._sock.recv(65536)
+                if not data:
+                    raise requests.exceptions.ConnectionError(
+                        'Connection closed by the server'
+                    )
+                with self._condition:
+                    self.metrics['bytes_received'] += len(data)
+                    for event in self._h2.receive_data(data):
+                        self._handle(event)
+                    self._flush()
+                    self._condition.notify_all()
+                self._send()
+        except Exception as e:
+            self._terminate(e)
+
+    def _handle(self, event):
+        if isinstance(event, h2.events.PingAckReceived):
+            if self._ping is not None and event.ping_data == self._ping[0]:
+                self.rtt = time.perf_counter() - self._ping[1]
+                self._ping = None
+            return
+        if isinstance(event, h2.events.WindowUpdated):
+            self.metrics['window_updates'] += 1
+            return
+        if isinstance(event, h2.events.ConnectionTerminated):
+            self.metrics['goaways'] += 1
+            self._goaway = True
+            error = requests.exceptions.ConnectionError(
+                'Connection closed by the server (GOAWAY: {})'.format(
+                    event.error_code
+                )
+            )
+            for stream in self._streams.values():
+                if event.last_stream_id is None or \
+                        stream.id > event.last_stream_id:
+                    stream.error = error
+            return
+        stream = self._streams.get(getattr(event, 'stream_id', None))
+        if isinstance(event, h2.events.DataReceived):
+            if stream is None or stream.finished:
+                self._acknowledge(
+                    event.stream_id,
+                    event.flow_controlled_length
+                )
+            else:
+                stream.chunks.append((
+                    event.data,
+                    event.flow_controlled_length
+                ))
+            return
+        if stream is None:
+            return
+        if isinstance(event, h2.events.ResponseReceived):
+            stream.headers = event.headers
+        elif isinstance(event, h2.events.StreamEnded):
+            stream.ended = True
+        elif isinstance(event, h2.events.StreamReset):
+            self.metrics['resets'] += 1
+            stream.error = requests.exceptions.ConnectionError(
+                'Stream reset by the server ({})'.format(event.error_code)
+            )
+
+    def _acknowledge(self, stream_id, length):
+        if length:
+            self._h2.acknowledge_received_data(length, stream_id)
+
+    def _terminate(self, error):
+        with self._condition:
+            if self._failure is None:
+                self._failure = error if self._closed or isinstance(
+                    error, requests.RequestException
+                ) else requests.exceptions.ConnectionError(error)
+            for stream in self._streams.values():
+                if stream.error is None and not stream.ended:
+                    stream.error = self._failure
+            self._condition.notify_all()
+        self._sock.close()
+
+    def _wait(self, predicate, timeout, error):
+        """ Wait for the condition lock to satisfy the predicate. """
+        expires = None if timeout is None else time.monotonic() + timeout
+        while not predicate():
+            remaining = None
+            if expires is not None:
+                remaining = expires - time.monotonic()
+                if remaining <= 0:
+                    raise error
+            self._condition.wait(remaining)
+
+    def open_stream(self, headers: list, end_stream: bool) -> _Stream:
+        with self._condition:
+            if self._failure is not None:
+                raise self._failure
+            stream = _Stream(self._h2.get_next_available_stream_id())
+            self._h2.send_headers(stream.id, headers, end_stream=end_stream)
+            self._streams[stream.id] = stream
+            self.metrics['streams'] += 1
+            self.metrics['peak_streams'] = max(
+                self.metrics['peak_streams'],
+                len(self._streams)
+            )
+            self._flush()
+        self._send()
+        return stream
+
+    def _send_window(self, stream: _Stream) -> int:
+        if stream.error is not None:
+            raise stream.error
+        return min(
+            self._h2.local_flow_control_window(stream.id),
+            self._h2.max_outbound_frame_size
+        )
+
+    def send_body(self, stream: _Stream, body: bytes, timeout=None):
+        """ Send the request body within the flow-control windows. """
+        view = memoryview(body)
+        offset = 0
+        while offset < len(view):
+            with self._condition:
+                if self._send_window(stream) <= 0:
+                    self.metrics['flow_control_stalls'] += 1
+                    self._wait(
+                        lambda: self._send_window(stream) > 0,
+                        timeout,
+                        requests.exceptions.Timeout(
+                            'Flow-control window closed while sending the '
+                            'request body'
+                        )
+                    )
+                chunk = view[offset:offset + self._send_window(stream)]
+                self._h2.send_data(stream.id, chunk.tobytes())
+                self._flush()
+            self._send()
+            offset += len(chunk)
+        with self._condition:
+            self._h2.end_stream(stream.id)
+            self._flush()
+        self._send()
+
+    def receive_headers(self, stream: _Stream, timeout=None) -> list:
+        with self._condition:
+            self._wait(
+                lambda: stream.headers is not None or
+                stream.error is not None,
+                timeout,
+                requests.exceptions.ReadTimeout(
+                    'Read timed out waiting for the response headers'
+                )
+            )
+            if stream.headers is None:
+                raise stream.error
+            return stream.headers
+
+    def receive_data(self, stream: _Stream, timeout=None) -> bytes:
+        """ :return: the next chunk of the body, or `b''` at its end """
+        with self._condition:
+            self._wait(
+                lambda: stream.chunks or stream.ended or
+                stream.error is not None,
+                timeout,
+                requests.exceptions.ReadTimeout(
+                    'Read timed out reading the response body'
+                )
+            )
+            if not stream.chunks:
+                if stream.ended:
+                    return b''
+                raise stream.error
+            data, length = stream.chunks.popleft()
+            self._acknowledge(stream.id, length)
+            self._flush()
+        self._send()
+        return data
+
+    def finish(self, stream: _Stream, cancel: bool = False):
+        """ Release the stream, cancelling it when not ended. """
+        with self._condition:
+            if stream.finished:
+                return
+            stream.finished = True
+            if cancel and not stream.ended and self._failure is None:
+                try:
+                    self._h2.reset_stream(
+                        stream.id,
+                        h2.errors.ErrorCodes.CANCEL
+                    )
+                except h2.exceptions.StreamClosedError:
+                    pass
+            for _, length in stream.chunks:
+                self._acknowledge(stream.id, length)
+            stream.chunks.clear()
+            self._streams.pop(stream.id, None)
+            failed = self._failure is not None
+            if not failed:
+                self._flush()
+            self._condition.notify_all()
+        if not failed:
+            try:
+                self._send()
+            except OSError as e:
+                with self._condition:
+                    if self._failure is None:
+                        self._failure = requests.exceptions.ConnectionError(e)
+
+    def close(self):
+        with self._condition:
+            if self._closed:
+                return
+            self._closed = True
+            failed = self._failure is not None
+            if not failed:
+                try:
+                    self._h2.close_connection()
+                    self._flush()
+                except h2.exceptions.ProtocolError:
+                    pass
+        if not failed:
+            try:
+                self._send()
+            except OSError:
+                pass
+        try:
+            self._sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        self._sock.close()
+
+
+class HTTP2ConnectionPool(object):
+    """
+    Connections to an origin; up to `size` connections are opened, and
+    each request is sent over the connection with the fewest streams.
+    """
+    def __init__(self, origin: tuple, size: int, max_streams: int,
+                 connect):
+        self._origin = origin
+        self._size = size
+        self._max_streams = max_streams
+        self._connect = connect
+        self._condition = threading.Condition()
+        self._connections = []
+        self._reserved = Counter()
+        self._opening = 0
+        self._opened = []
+
+    @property
+    def origin(self):
+        return self._origin
+
+    @property
+    def connections(self) -> list:
+        return list(self._connections)
+
+    def _capacity(self, connection):
+        return min(self._max_streams, connection.max_streams)
+
+    def acquire(self, timeout=None) -> HTTP2Connection:
+        """ Reserve a stream on a connection, opening it if needed. """
+        expires = None if timeout is None else time.monotonic() + timeout
+        with self._condition:
+            while True:
+                self._retire()
+                available = [
+                    connection for connection in self._connections
+                    if self._reserved[connection] < self._capacity(connection)
+                ]
+                idle = any(
+                    not self._reserved[connection]
+                    for connection in available
+                )
+                if len(self._connections) + self._opening < self._size \
+                        and not idle:
+                    self._opening += 1
+                    self._condition.release()
+                    try:
+                        connection = self._connect(self._origin, timeout)
+                    finally:
+                        self._condition.acquire()
+                        self._opening -= 1
+                        self._condition.notify_all()
+                    self._connections.append(connection)
+                    self._opened.append(connection)
+                    continue
+                if available:
+                    connection = min(
+                        available,
+                        key=lambda c: self._reserved[c]
+                    )
+                    self._reserved[connection] += 1
+                    return connection
+                remaining = None
+                if expires is not None:
+                    remaining = expires - time.monotonic()
+                    if remaining <= 0:
+                        raise requests.exceptions.ConnectTimeout(
+                            'Timed out waiting for an HTTP/2 stream'
+                        )
+                self._condition.wait(remaining)
+
+    def release(self, connection: HTTP2Connection):
+        with self._condition:
+            self._reserved[connection] -= 1
+            if self._reserved[connection] <= 0:
+                del self._reserved[connection]
+                if connection not in self._connections:
+                    connection.close()
+            self._condition.notify_all()
+
+    def _retire(self):
+        """ Remove the connections no longer accepting streams. """
+        for connection in list(self._connections):
+            if not connection.usable:
+                self._connections.remove(connection)
+                if not self._reserved[connection]:
+                    connection.close()
+
+    def metrics(self) -> Counter:
+        metrics = Counter({metric: 0 for metric in METRICS})
+        with self._condition:
+            for connection in self._opened:
+                peak = max(metrics['peak_streams'],
+                           connection.metrics['peak_streams'])
+                metrics.update(connection.metrics)
+                metrics['peak_streams'] = peak
+        return metrics
+
+    def close(self):
+        with self._condition:
+            connections, self._connections = self._connections, []
+        for connection in connections:
+            connection.close()
+
+
+class HTTP2ResponseBody(object):
+    """
+    Response body read from an HTTP/2 stream, in the place of the
+    `urllib3` response of `requests` responses.
+    """
+    def __init__(self, connection: HTTP2Connection, stream: _Stream,
+                 headers: list, timeout=None, on_finish=None):
+        self._connection = connection
+        self._stream = stream
+        self._timeout = timeout
+        self._on_finish = on_finish
+        self._finished = False
+        self._original_response = _OriginalResponse(headers)
+        self._encoding = (
+            self._original_response.msg.get('content-encoding') or ''
+        ).lower()
+        # Not the socket of the stream, which is shared by other streams
+        self.connection = None
+
+    def _finish(self, cancel=False):
+        if self._finished:
+            return
+        self._finished = True
+        self._connection.finish(self._stream, cancel=cancel)
+        if self._on_finish is not None:
+            self._on_finish()
+
+    def _chunks(self):
+        try:
+            while True:
+                data = self._connection.receive_data(
+                    self._stream,
+                    self._timeout
+                )
+                if not data:
+                    break
+                yield data
+        except BaseException:
+            self._finish(cancel=True)
+            raise
+        self._finish()
+
+    def stream(self, chunk_size=None, decode_content=True):
+        decoder = _decoder(self._encoding) if decode_content else None
+        for data in self._chunks():
+            if decoder is not None:
+                data = decoder.decompress(data)
+            if data:
+                yield data
+        if decoder is not None:
+            data = decoder.flush()
+            if data:
+                yield data
+
+    def read(self, amt=None, decode_content=True, **kwargs) -> bytes:
+        if self._finished:
+            return b''
+        return b''.join(self.stream(decode_content=decode_content))
+
+    def cancel(self):
+        """ Reset the stream, waking up a thread reading the body. """
+        with self._connection._condition:
+            if self._stream.error is None and not self._stream.ended:
+                self._stream.error = requests.exceptions.ConnectionError(
+                    'Stream cancelled'
+                )
+            self._connection._condition.notify_all()
+
+    def close(self):
+        self._finish(cancel=True)
+
+    def release_conn(self):
+        self._finish(cancel=True)
+
+
+class _OriginalResponse(object):
+    """ Headers in the form read by `requests` for extracting cookies. """
+    def __init__(self, headers: list):
+        self.msg = http.client.HTTPMessage()
+        for name, value in headers:
+            if not name.startswith(':'):
+                self.msg[name] = value
+
+
+class _ZlibDecoder(object):
+    def __init__(self, wbits):
+        self._decompressor = zlib.decompressobj(wbits)
+
+    def decompress(self, data):
+        return self._decompressor.decompress(data)
+
+    def flush(self):
+        return self._decompressor.flush()
+
+
+class _DeflateDecoder(_ZlibDecoder):
+    """ zlib-wrapped or raw deflate data; servers send either. """
+    def __init__(self):
+        super(_DeflateDecoder, self).__init__(zlib.MAX_WBITS)
+        self._started = False
+
+    def decompress(self, data):
+        if not self._started:
+            self._started = True
+            try:
+                return super(_DeflateDecoder, self).decompress(data)
+            except zlib.error:
+                self._decompressor = zlib.decompressobj(-zlib.MAX_WBITS)
+        return super(_DeflateDecoder, self).decompress(data)
+
+
+def _decoder(encoding):
+    if encoding in ('gzip', 'x-gzip'):
+        return _ZlibDecoder(16 + zlib.MAX_WBITS)
+    if encoding == 'deflate':
+        return _DeflateDecoder()
+    return None
+
+
+class HTTP2Adapter(BaseAdapter):
+    """
+    Transport adapter sending requests over HTTP/2, multiplexing the
+    requests of all threads of a process over a few connections to each
+    origin.
+
+    - `connections`: connections opened to each origin
+    - `max_concurrent_streams`: streams per connection, further limited by
+      the server setting
+    - `initial_window_size`: flow-control window of each stream, i.e. the
+      response data the server may send before it is read
+    - `connection_window_size`: flow-control window of each connection
+    - `max_frame_size`: largest frame the server may send
+
+    `https` URLs negotiate HTTP/2 with ALPN; `http` URLs use HTTP/2 with
+    prior knowledge (h2c). Requires the `h2` package.
+    """
+    def __init__(self, connections: int = 1,
+                 max_concurrent_streams: int = 100,
+                 initial_window_size: int = 1 << 20,
+                 connection_window_size: int = 1 << 24,
+                 max_frame_size: int = 1 << 14):
+        if h2 is None:
+            raise ImportError('The HTTP/2 transport requires the h2 package')
+        super(HTTP2Adapter, self).__init__()
+        self._connections = int(connections)
+        self._max_streams = int(max_concurrent_streams)
+        self._settings = {
+            h2.settings.SettingCodes.ENABLE_PUSH: 0,
+            h2.settings.SettingCodes.INITIAL_WINDOW_SIZE:
+                int(initial_window_size),
+            h2.settings.SettingCodes.MAX_FRAME_SIZE: int(max_frame_size)
+        }
+        self._connection_window_size = int(connection_window_size)
+        self._pools = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_definition(cls, definition):
+        """ Create an adapter from the options of the `transport` option. """
+        options = dict(definition)
+        options.pop('type', None)
+        return cls(**options)
+
+    def _pool(self, request, verify, cert) -> HTTP2ConnectionPool:
+        url = urlsplit(request.url)
+        scheme = url.scheme.lower()
+        origin = (
+            scheme,
+            url.hostname,
+            url.port or (443 if scheme == 'https' else 80)
+        )
+        key = (origin, verify, cert)
+        with self._lock:
+            pool = self._pools.get(key)
+            if pool is None:
+                context = None
+                if scheme == 'https':
+                    context = _ssl_context(verify, cert)
+                pool = self._pools[key] = HTTP2ConnectionPool(
+                    origin,
+                    size=self._connections,
+                    max_streams=self._max_streams,
+                    connect=lambda origin, timeout: HTTP2Connection(
+                        origin,
+                        settings=self._settings,
+                        connection_window_size=self._connection_window_size,
+                        ssl_context=context,
+                        connect_timeout=timeout
+                    )
+                )
+            return pool
+
+    def prewarm(self, url: str, connections: int):
+        """ Open the connections to the origin of a URL. """
+        request = requests.Request('GET', url).prepare()
+        pool = self._pool(request, True, None)
+        acquired = []
+        try:
+            for _ in range(min(connections, self._connections)):
+                acquired.append(pool.acquire())
+        finally:
+            for connection in acquired:
+                pool.release(connection)
+        return len(pool.connections)
+
+    def send(self, request, stream=False, timeout=None, verify=True,
+             cert=None, proxies=None):
+        if proxies and any(proxies.values()):
+            raise requests.exceptions.InvalidProxyURL(
+                'Proxies are not supported by the HTTP/2 transport'
+            )
+        if isinstance(timeout, tuple):
+            connect_timeout, read_timeout = timeout
+        else:
+            connect_timeout = read_timeout = timeout
+        if isinstance(cert, list):
+            cert = tuple(cert)
+        pool = self._pool(request, verify, cert)
+        started = time.perf_counter()
+        try:
+            connection = pool.acquire(connect_timeout)
+        except socket.timeout as e:
+            raise requests.exceptions.ConnectTimeout(e, request=request)
+        except ssl.SSLError as e:
+            raise requests.exceptions.SSLError(e, request=request)
+        except OSError as e:
+            raise requests.exceptions.ConnectionError(e, request=request)
+        try:
+            response = self._exchange(
+                connection,
+                pool,
+                request,
+                read_timeout,
+                started
+            )
+        except BaseException:
+            pool.release(connection)
+            raise
+        if not stream:
+            response.content
+        return response
+
+    def _exchange(self, connection, pool, request, timeout, started):
+        url = urlsplit(request.url)
+        headers = [
+            (':method', request.method),
+            (':authority', request.headers.get('Host') or url.netloc),
+            (':scheme', url.scheme.lower()),
+            (':path', (url.path or '/') + ('?' + url.query
+                                           if url.query else ''))
+        ]
+        for name, value in request.headers.items():
+            name = name.lower()
+            if name in _CONNECTION_HEADERS:
+                continue
+            if name == 'accept-encoding' and \
+                    value == _REQUESTS_ACCEPT_ENCODING:
+                value = _ACCEPT_ENCODING
+            headers.append((name, value))
+        body = request.body
+        if isinstance(body, str):
+            body = body.encode('utf-8')
+        elif body is not None and not isinstance(body, bytes):
+            body = b''.join(
+                part.encode('utf-8') if isinstance(part, str) else part
+                for part in (body if not hasattr(body, 'read')
+                             else [body.read()])
+            )
+        stream = connection.open_stream(headers, end_stream=not body)
+        try:
+            if body:
+                connection.send_body(stream, body, timeout)
+            received = connection.receive_headers(stream, timeout)
+        except BaseException:
+            connection.finish(stream, cancel=True)
+            raise
+
+        received = [
+            (name.decode('latin-1'), value.decode('latin-1'))
+            for name, value in received
+        ]
+        response = requests.Response()
+        response.headers = CaseInsensitiveDict()
+        for name, value in received:
+            if name == ':status':
+                response.status_code = int(value)
+            elif name in response.headers:
+                response.headers[name] += ', ' + value
+            else:
+                response.headers[name] = value
+        response.reason = http.client.responses.get(response.status_code, '')
+        response.encoding = get_encoding_from_headers(response.headers)
+        response.raw = HTTP2ResponseBody(
+            connection,
+            stream,
+            received,
+            timeout=timeout,
+            on_finish=lambda: pool.release(connection)
+        )
+        response.url = request.url
+        response.request = request
+        response.connection = self
+        response.elapsed = timedelta(seconds=time.perf_counter() - started)
+        extract_cookies_to_jar(response.cookies, request, response.raw)
+        return response
+
+    def metrics(self) -> dict:
+        """ :return: connection-level metrics of each origin """
+        metrics = {}
+        with self._lock:
+            pools = list(self._pools.values())
+        for pool in pools:
+            origin = '{}://{}:{}'.format(*pool.origin)
+            pool_metrics = pool.metrics()
+            aggregate = metrics.setdefault(origin, Counter())
+            peak = max(aggregate['peak_streams'], pool_metrics['peak_streams'])
+            aggregate.update(pool_metrics)
+            aggregate['peak_streams'] = peak
+        return metrics
+
+    def close(self):
+        """ Close all connections and log their metrics. """
+        for origin, metrics in sorted(self.metrics().items()):
+            logger.info('[http2] {}: {}'.format(origin, ', '.join(
+                '{}={}'.format(metric, metrics[metric])
+                for metric in METRICS
+            )))
+        with self._lock:
+            pools, self._pools = list(self._pools.values()), {}
+        for pool in pools:
+            pool.close()
@@ -0,0 +1,247 @@
+import importlib
+import itertools
+import json
+import logging
+import os
+import threading
+from collections import Counter
+
+import yaml
+
+try:
+    import fastjsonschema
+except ImportError:  # pragma: no cover
+    fastjsonschema = None
+
+try:
+    import jsonschema
+except ImportError:  # pragma: no cover
+    jsonschema = None
+
+logger = logging.getLogger(__name__)
+
+_validators = {}
+_validators_lock = threading.Lock()
+
+
+def _error_path(path) -> str:
+    """ Path of an error with list indexes folded, e.g. `items.*.id` """
+    return '.'.join(
+        '*' if isinstance(key, int) or str(key).isdigit() else str(key)
+        for key in path
+    ) or '$'
+
+
+def _compile_json_schema(schema: dict):
+    if fastjsonschema is not None:
+        validate = fastjsonschema.compile(schema)
+
+        def errors(document):
+            try:
+                validate(document)
+            except fastjsonschema.JsonSchemaValueException as e:
+                # Validation stops at the first error; `data` is the root
+                return ['{}: {}'.format(_error_path(e.path[1:]), e.rule)]
+            return []
+        return errors
+    if jsonschema is not None:
+        validator_class = jsonschema.validators.validator_for(schema)
+        validator_class.check_schema(schema)
+        validator = validator_class(schema)
+
+        def errors(document):
+            return [
+                '{}: {}'.format(_error_path(error.absolute_path),
+                                error.validator)
+                for error in validator.iter_errors(document)
+            ]
+        return errors
+    raise ImportError(
+        'JSON Schema validation requires the fastjsonschema or the '
+        'jsonschema package'
+    )
+
+
+def _flatten_marshmallow_errors(messages, path=()):
+    if isinstance(messages, dict):
+        for key, value in messages.items():
+            yield from _flatten_marshmallow_errors(value, path + (key,))
+    elif isinstance(messages, (list, tuple)):
+        for message in messages:
+            yield from _flatten_marshmallow_errors(message, path)
+    else:
+        yield '{}: {}'.format(_error_path(path), messages)
+
+
+def _compile_marshmallow(import_path: str, many: bool):
+    module_path, _, name = import_path.partition(':')
+    schema = getattr(importlib.import_module(module_path), name)(many=many)
+
+    def errors(document):
+        return list(_flatten_marshmallow_errors(schema.validate(document)))
+    return errors
+
+
+def load_schema(filename: str) -> dict:
+    with open(filename) as f:
+        if filename.endswith(('.yml', '.yaml')):
+            return yaml.safe_load(f)
+        return json.load(f)
+
+
+class ValidationCounters(object):
+    """ Aggregated results of the validation of a schema. """
+    def __init__(self, checked: int = 0, skipped: int = 0, invalid: int = 0,
+                 errors: Counter = None):
+        self.checked = checked
+        self.skipped = skipped
+        self.invalid = invalid
+        self.errors = Counter(errors or {})
+
+    def merge(self, other: 'ValidationCounters'):
+        self.checked += other.checked
+        self.skipped += other.skipped
+        self.invalid += other.invalid
+        self.errors.update(other.errors)
+
+
+class ResponseValidator(object):
+    """
+    Schema compiled once per process, validating one in every `sample`
+    documents and counting the violations instead of raising them.
+    """
+    def __init__(self, name: str, errors, sample: int = 1):
+        if int(sample) < 1:
+            raise ValueError('sample must be a positive integer')
+        self._name = name
+        self._errors = errors
+        self._sample = int(sample)
+        self._sequence = itertools.count()
+        self._lock = threading.Lock()
+        self._counters = ValidationCounters()
+
+    @property
+    def name(self) -> str:
+        return self._name
+
+    def sampled(self) -> bool:
+        if next(self._sequence) % self._sample == 0:
+            return True
+        with self._lock:
+            self._counters.skipped += 1
+        return False
+
+    def validate(self, document, url: str = None) -> list:
+        """ :return: the violations of the document """
+        errors = self._errors(document)
+        with self._lock:
+            self._counters.checked += 1
+            if errors:
+                self._counters.invalid += 1
+            new = [error for error in errors
+                   if error not in self._counters.errors]
+            self._counters.errors.update(errors)
+        # Only the first occurrence of each violation is logged
+        for error in new:
+            logger.warning('[validation] schema={} violation={} url={}'.format(
+                self._name, error, url
+            ))
+        return errors
+
+    def collect(self) -> ValidationCounters:
+        """ :return: the counters since the last collection """
+        with self._lock:
+            counters, self._counters = self._counters, ValidationCounters()
+        return counters
+
+
+def get_validator(schema: dict = None, schema_file: str = None,
+                  marshmallow: str = None, many: bool = False,
+                  sample: int = 1, name: str = None) -> ResponseValidator:
+    """
+    :return: the validator of a schema, compiled on first use and shared
+        by all steps and threads of the current process; inline schemas
+        are identified by their name, since plugin arguments are rendered
+        into new objects on every execution
+    """
+    if sum(option is not None
+           for option in (schema, schema_file, marshmallow)) != 1:
+        raise ValueError(
+            'Exactly one of schema, schema_file or marshmallow is required'
+        )
+    if schema_file is not None:
+        source = ('file', schema_file)
+    elif marshmallow is not None:
+        source = ('marshmallow', marshmallow, bool(many))
+    elif name is None:
+        raise ValueError('Inline schemas require a name')
+    else:
+        source = ('schema',)
+    key = (os.getpid(), name, int(sample)) + source
+    validator = _validators.get(key)
+    if validator is None:
+        with _validators_lock:
+            validator = _validators.get(key)
+            if validator is None:
+                if schema_file is not None:
+                    schema_file = os.path.abspath(
+                        os.path.expanduser(schema_file)
+                    )
+                if marshmallow is not None:
+                    errors = _compile_marshmallow(marshmallow, many)
+                else:
+                    errors = _compile_json_schema(
+                        schema if schema_file is None
+                        else load_schema(schema_file)
+                    )
+                if name is None:
+                    name = schema_file or marshmallow
+                validator = _validators[key] = ResponseValidator(
+                    name,
+                    errors,
+                    sample=sample
+                )
+    return validator
+
+
+def collect_counters() -> dict:
+    """
+    :return: the validation counters of the current process by schema name,
+        reset after each collection
+    """
+    counters = {}
+    pid = os.getpid()
+    with _validators_lock:
+        validators = [validator
+                      for key, validator in _validators.items()
+                      if key[0] == pid]
+    for validator in validators:
+        counters.setdefault(validator.name, ValidationCounters()).merge(
+            validator.collect()
+        )
+    return counters
+
+
+def merge_counters(counters: dict, other: dict) -> dict:
+    for name, schema_counters in other.items():
+        counters.setdefault(name, ValidationCounters()).merge(schema_counters)
+    return counters
+
+
+def report(counters: dict, top: int = 5) -> str:
+    width = max([len(name) for name in counters] + [6])
+    header = '{:<{width}} {:>10} {:>10} {:>10}'.format(
+        'schema', 'checked', 'skipped', 'invalid', width=width
+    )
+    lines = [header, '-' * len(header)]
+    for name, schema_counters in sorted(counters.items()):
+        lines.append('{:<{width}} {:>10} {:>10} {:>10}'.format(
+            name,
+            schema_counters.checked,
+            schema_counters.skipped,
+            schema_counters.invalid,
+            width=width
+        ))
+        for error, count in schema_counters.errors.most_common(top):
+            lines.append('  {:>8}  {}'.format(count, error))
+    return '\n'.join(lines)
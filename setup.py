@@ -17,13 +17,19 @@ setup(
         'requests==2.18.4',
         'structlog==18.1.0'
     ],
+    extras_require={
+        'http2': ['h2>=4.0'],
+        'jmespath': ['jmespath>=0.9'],
+        'jsonpath': ['jsonpath-ng>=1.5'],
+        'validation': ['fastjsonschema>=2.14']
+    },
     tests_require=[
         'responses==0.9.0'
     ],
     packages=list(
         filter(lambda pkg: pkg.startswith('pitch'), find_packages())
     ),
-    pythons_requires='>=3.6.0',
+    pythons_requires='>=3.7.0',
     entry_points={
         'console_scripts': [
             'pitch=pitch.cli.main:cli',
@@ -0,0 +1,81 @@
+import threading
+import time
+from unittest import TestCase
+
+import requests
+
+from pitch.plugins.background import BackgroundPlugins
+from pitch.plugins.common import BasePlugin
+from pitch.plugins.response import BaseResponsePlugin
+from pitch.plugins.structures import register
+from pitch.plugins.utils import execute_plugins
+from pitch.structures import Context, JinjaEvaluator
+
+executed = []
+
+
+@register
+class RecordingPlugin(BaseResponsePlugin):
+    _name = 'test_recording_output'
+    _detached = True
+
+    def __init__(self, label):
+        self._label = label
+
+    def execute(self, plugin_context):
+        time.sleep(0.05)
+        executed.append((
+            self._label,
+            plugin_context.templating['response'].status_code,
+            threading.current_thread().name
+        ))
+
+
+class TestBackgroundPlugins(TestCase):
+    def test_backpressure_and_close(self):
+        background = BackgroundPlugins(workers=1, queue_size=1)
+        done = []
+        started = time.monotonic()
+        for index in range(4):
+            background.submit(lambda value: [time.sleep(0.05),
+                                             done.append(value)], index)
+        # The last submission waits for the queue to drain
+        self.assertGreaterEqual(time.monotonic() - started, 0.05)
+        background.close()
+        self.assertEqual(done, [0, 1, 2, 3])
+
+    def test_errors_are_counted(self):
+        background = BackgroundPlugins()
+        background.submit(lambda: 1 / 0)
+        background.close()
+        self.assertEqual(background.errors, 1)
+
+    def test_detached_plugins_use_a_snapshot(self):
+        self.assertFalse(BasePlugin.is_detached())
+        del executed[:]
+        background = BackgroundPlugins()
+        context = Context()
+        context.globals['background'] = background
+        context.step['rendering'] = JinjaEvaluator(context.templating)
+        context.step['phase'] = 'response'
+        context.step['index'] = 0
+        context.step['definition'] = {'plugins': [{
+            'plugin': 'test_recording_output',
+            'label': '{{ variables.label }}'
+        }]}
+        context.templating['variables']['label'] = 'first'
+        response = requests.Response()
+        response.status_code = 200
+        context.templating['response'] = response
+        completed = []
+        execute_plugins(context, on_complete=lambda: completed.append(True))
+        # The step moves on before the plugin has been executed
+        self.assertEqual(executed, [])
+        context.templating['variables']['label'] = 'second'
+        context.templating['response'] = requests.Response()
+        background.close()
+        self.assertEqual(len(executed), 1)
+        label, status_code, thread_name = executed[0]
+        self.assertEqual((label, status_code), ('first', 200))
+        self.assertTrue(thread_name.startswith('pitch-background'))
+        self.assertEqual(completed, [True])
@@ -0,0 +1,101 @@
+import json
+import os
+import tempfile
+from datetime import timedelta
+from unittest import TestCase
+
+import requests
+
+from pitch.plugins.response import JSONLinesOutputPlugin
+from pitch.plugins.utils import execute_plugins, loader
+from pitch.sinks import close_sinks
+from pitch.structures import Context, JinjaEvaluator
+
+
+def _response(content, content_type='application/json'):
+    response = requests.Response()
+    response.status_code = 200
+    response.url = 'http://example.com/'
+    response.encoding = 'utf-8'
+    response.headers['Content-Type'] = content_type
+    response.elapsed = timedelta(seconds=0.5)
+    response._content = content
+    return response
+
+
+class TestJSONLinesOutputPlugin(TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.filename = os.path.join(self.directory.name, 'out.jsonl')
+
+    def _lines(self, bodies, **options):
+        plugin = JSONLinesOutputPlugin(self.filename, **options)
+        context = Context()
+        for body in bodies:
+            if not isinstance(body, requests.Response):
+                body = _response(body)
+            context.templating['response'] = body
+            plugin.execute(context)
+        close_sinks()
+        with open(self.filename) as f:
+            return [json.loads(line) for line in f]
+
+    def test_bodies(self):
+        self.assertEqual(
+            self._lines([b'{\n  "a": [1,\r\n 2]\n}\n', b'', b'<html>\n']),
+            [{'a': [1, 2]}, None, {'body': '<html>\n'}]
+        )
+
+    def test_content_type(self):
+        parsed = _response(b'{"a": 1}', 'text/plain')
+        parsed.as_json = {'a': 1}
+        self.assertEqual(
+            self._lines([
+                _response(b'{"a": 1}', 'text/html'),
+                _response(b'{"a": 1', 'application/json'),
+                _response(b'{"a": 1}', 'application/problem+json'),
+                _response(b'{"a": 1}', 'text/plain; charset=utf-8'),
+                _response(b'{"a": 1', 'application/octet-stream'),
+                parsed
+            ]),
+            [{'body': '{"a": 1}'}, {'body': '{"a": 1'}, {'a': 1}, {'a': 1},
+             {'body': '{"a": 1'}, {'a': 1}]
+        )
+
+    def test_metadata(self):
+        self.assertEqual(
+            self._lines([b'[1]', b'not json'], include_metadata=True),
+            [
+                {'url': 'http://example.com/', 'status_code': 200,
+                 'elapsed': 0.5, 'body': [1]},
+                {'url': 'http://example.com/', 'status_code': 200,
+                 'elapsed': 0.5, 'body': 'not json'}
+            ]
+        )
+
+
+class TestResponseUpdateContext(TestCase):
+    def test_keep(self):
+        loader()
+        context = Context()
+        context.step['rendering'] = JinjaEvaluator(context.templating)
+        context.step['phase'] = 'response'
+        context.step['index'] = 0
+        context.templating['response'] = _response(
+            b'{"id": 1, "profile": {"name": "a", "bio": "b"}}'
+        )
+        context.step['definition'] = {'plugins': [{
+            'plugin': 'post_register',
+            'user': '{{ response.json() }}',
+            'profile': 'response.json().profile',
+            'status': '{{ response.status_code }}',
+            'keep': {'user': ['id', 'profile.name'], 'profile': 'name'}
+        }]}
+        execute_plugins(context)
+        self.assertEqual(
+            dict(context.templating['variables']),
+            {'user': {'id': 1, 'profile': {'name': 'a'}},
+             'profile': {'name': 'a'},
+             'status': '200'}
+        )
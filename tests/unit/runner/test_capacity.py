@@ -0,0 +1,116 @@
+import http.server
+import logging
+import os
+import tempfile
+import threading
+from unittest import TestCase
+
+from pitch.plugins.utils import loader
+from pitch.runner.capacity import CapacitySearch, CapacityStep
+from pitch.sequence.executor import SequenceLoader
+
+logger = logging.getLogger(__name__)
+
+
+class StatusHandler(http.server.BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    requests = 0
+
+    def do_GET(self):
+        StatusHandler.requests += 1
+        status = 503 if StatusHandler.requests % 5 == 0 else 200
+        self.send_response(status)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+class ModelSearch(CapacitySearch):
+    """ Search against a target meeting the SLO up to `capacity` threads. """
+    capacity = None
+
+    def _measure(self, concurrency):
+        passed = concurrency <= self.capacity
+        step = CapacityStep(concurrency, 1.0, concurrency, concurrency,
+                            0.1, 0.1 if passed else None, 0.0, passed)
+        self._steps.append(step)
+        return step
+
+
+def _sequence(url, plugins='[]'):
+    directory = tempfile.mkdtemp()
+    filename = os.path.join(directory, 'sequence.yml')
+    with open(filename, 'w') as f:
+        f.write(
+            'base_url: {}\nvariables: {{}}\nrequests: {{}}\n'
+            'steps:\n  - url: /\n    plugins: {}\n'.format(url, plugins)
+        )
+    return SequenceLoader(filename)
+
+
+class TestCapacitySearch(TestCase):
+    def _search(self, url, plugins='[]'):
+        return CapacitySearch(
+            _sequence(url, plugins),
+            logger,
+            latency=1.0,
+            max_error_rate=0.5,
+            step_duration=0.3,
+            max_steps=1
+        )
+
+    def _model(self, capacity, **options):
+        search = ModelSearch(
+            _sequence('http://127.0.0.1:1'),
+            logger,
+            latency=1.0,
+            **options
+        )
+        search.capacity = capacity
+        search.run()
+        return search
+
+    def test_binary(self):
+        search = self._model(12, strategy='binary')
+        self.assertEqual(
+            [step.concurrency for step in search.steps],
+            [1, 2, 4, 8, 16, 12, 14, 13]
+        )
+        self.assertEqual(search.best.concurrency, 12)
+
+    def test_aimd(self):
+        search = self._model(3, increase=2)
+        self.assertEqual(
+            [step.concurrency for step in search.steps],
+            [1, 3, 5, 2, 4, 2]
+        )
+        self.assertEqual(search.best.concurrency, 3)
+
+    def test_target_down(self):
+        search = self._search('http://127.0.0.1:1')
+        step = search._measure(2)
+        self.assertIsNone(step.latency)
+        self.assertFalse(step.passed)
+        self.assertGreater(step.error_rate, 0)
+
+    def test_failfast_assertions_are_failures(self):
+        loader()
+        server = http.server.ThreadingHTTPServer(
+            ('127.0.0.1', 0),
+            StatusHandler
+        )
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        try:
+            search = self._search(
+                'http://127.0.0.1:{}'.format(server.server_address[1]),
+                plugins='[{plugin: assert_http_status_code}]'
+            )
+            step = search._measure(2)
+        finally:
+            server.shutdown()
+            server.server_close()
+        self.assertGreater(step.requests, 5)
+        self.assertGreater(step.error_rate, 0)
+        self.assertTrue(step.passed)
@@ -0,0 +1,115 @@
+import http.server
+import logging
+import os
+import tempfile
+import threading
+from unittest import TestCase
+
+from pitch.plugins.utils import loader
+from pitch.runner.compare import Comparison, FeederTape, Target
+from pitch.sequence.executor import SequenceLoader
+
+logger = logging.getLogger(__name__)
+
+
+def _server(status):
+    class Handler(http.server.BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def do_GET(self):
+            self.send_response(status)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+
+        def log_message(self, *args):
+            pass
+
+    server = http.server.ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+class Feeder(object):
+    def __init__(self, rows):
+        self._rows = iter(rows)
+
+    def next(self):
+        return next(self._rows)
+
+
+class TestFeederTape(TestCase):
+    def test_replay(self):
+        tape = FeederTape(Feeder([{'id': 1}, {'id': 2}, {'id': 3}]))
+        replay = tape.replay()
+        self.assertEqual(list(tape.take(2)), [{'id': 1}, {'id': 2}])
+        tape.close()
+        self.assertEqual(list(replay), [{'id': 1}, {'id': 2}])
+
+    def test_replay_waits_for_recording(self):
+        tape = FeederTape(Feeder(range(3)))
+        replayed = []
+        thread = threading.Thread(
+            target=lambda: replayed.extend(tape.replay())
+        )
+        thread.start()
+        self.assertEqual(list(tape), [0, 1, 2])
+        tape.close()
+        thread.join(1)
+        self.assertEqual(replayed, [0, 1, 2])
+
+
+class TestTarget(TestCase):
+    def test_base_url(self):
+        sequence = {'base_url': 'http://a', 'threads': 2}
+        target = Target(sequence, 'http://b')
+        self.assertEqual(target.get('base_url'), 'http://b')
+        self.assertEqual(target.get('threads'), 2)
+
+
+class TestComparison(TestCase):
+    def setUp(self):
+        loader()
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.servers = [_server(503), _server(200)]
+        for server in self.servers:
+            self.addCleanup(server.server_close)
+            self.addCleanup(server.shutdown)
+
+    def _sequence(self):
+        rows = os.path.join(self.directory.name, 'users.jsonl')
+        with open(rows, 'w') as f:
+            f.write('{"id": 1}\n{"id": 2}\n')
+        filename = os.path.join(self.directory.name, 'sequence.yml')
+        with open(filename, 'w') as f:
+            f.write(
+                'base_url: http://a\nvariables: {{}}\nrequests: {{}}\n'
+                'feeders:\n  users:\n    path: {}\n'
+                'steps:\n'
+                '  - url: /\n'
+                '    plugins: [{{plugin: assert_http_status_code}}]\n'
+                '  - url: /users/{{{{ item.id }}}}\n'
+                '    with_items: feeders.users\n'.format(rows)
+            )
+        return SequenceLoader(filename)
+
+    def test_failfast_exit_in_parallel_mode(self):
+        comparison = Comparison(
+            self._sequence(),
+            logger,
+            [
+                'http://127.0.0.1:{}'.format(server.server_address[1])
+                for server in self.servers
+            ],
+            mode='parallel'
+        )
+        thread = threading.Thread(target=comparison.run, daemon=True)
+        thread.start()
+        thread.join(5)
+        self.assertFalse(thread.is_alive())
+        requests = [
+            statistics.total.requests
+            for statistics in comparison.statistics
+        ]
+        self.assertEqual(requests, [1, 1])
@@ -0,0 +1,43 @@
+from unittest import TestCase
+
+from pitch.runner.structures import _warm_up
+from pitch.sequence.warmup import Warmup
+from pitch.transport.cassette import Cassette
+
+
+class Executor(object):
+    def __init__(self, options):
+        self.options = options
+
+    def run(self):
+        pass
+
+
+class TestWarmUp(TestCase):
+    def _options(self, **executor_options):
+        executors = []
+
+        def create_executor(thread_id, options):
+            executors.append(Executor(options))
+            return executors[-1]
+
+        _warm_up(Warmup(iterations=2), executor_options, [None], 2,
+                 create_executor)
+        self.assertEqual(len(executors), 4)
+        return executors[0].options
+
+    def test_side_effects_are_disabled(self):
+        options = self._options(
+            capture=object(),
+            tracer=object(),
+            profiler=object(),
+            background=object(),
+            cassette=Cassette('cassette.jsonl', 'record')
+        )
+        for name in ('capture', 'tracer', 'profiler', 'background',
+                     'cassette'):
+            self.assertIsNone(options[name], name)
+
+    def test_replayed_cassette(self):
+        cassette = Cassette('cassette.jsonl', 'replay')
+        self.assertIs(self._options(cassette=cassette)['cassette'], cassette)
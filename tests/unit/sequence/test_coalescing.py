@@ -0,0 +1,101 @@
+import threading
+import time
+from unittest import TestCase
+
+from requests import Request, Response
+
+from pitch.sequence.coalescing import RequestCoalescer
+
+
+def _request(method='GET', **kwargs):
+    return Request(method, 'http://example.com/', **kwargs).prepare()
+
+
+class Upstream(object):
+    """ Send function blocking until released, counting the calls. """
+    def __init__(self, error=None):
+        self.calls = 0
+        self.started = threading.Event()
+        self.released = threading.Event()
+        self._error = error
+
+    def __call__(self, request):
+        self.calls += 1
+        self.started.set()
+        self.released.wait(5)
+        if self._error is not None:
+            raise self._error
+        response = Response()
+        response.status_code = 200
+        response._content = b'{}'
+        response.headers['X-Upstream'] = '1'
+        return response
+
+
+class TestRequestCoalescer(TestCase):
+    def _send_concurrently(self, coalescer, upstream, requests):
+        results = [None] * len(requests)
+
+        def send(index):
+            try:
+                results[index] = coalescer.send(requests[index], upstream)
+            except Exception as e:
+                results[index] = e
+
+        threads = [threading.Thread(target=send, args=(0,))]
+        threads[0].start()
+        upstream.started.wait(5)
+        for index in range(1, len(requests)):
+            threads.append(threading.Thread(target=send, args=(index,)))
+            threads[-1].start()
+        # Waiters join the call in flight
+        time.sleep(0.1)
+        upstream.released.set()
+        for thread in threads:
+            thread.join(5)
+        return results
+
+    def test_identical_requests(self):
+        upstream = Upstream()
+        responses = self._send_concurrently(
+            RequestCoalescer(),
+            upstream,
+            [_request() for _ in range(4)]
+        )
+        self.assertEqual(upstream.calls, 1)
+        self.assertEqual(len(set(map(id, responses))), 4)
+        responses[0].headers['X-Plugin'] = '1'
+        for response in responses:
+            self.assertEqual(response.content, b'{}')
+            self.assertEqual(response.headers['X-Upstream'], '1')
+        self.assertNotIn('X-Plugin', responses[1].headers)
+
+    def test_non_idempotent_requests(self):
+        upstream = Upstream()
+        upstream.released.set()
+        coalescer = RequestCoalescer()
+        for request in (_request('POST'), _request(data={'a': 1})):
+            self.assertIsNone(coalescer.key(request))
+            coalescer.send(request, upstream)
+        self.assertEqual(upstream.calls, 2)
+        with self.assertRaises(ValueError):
+            RequestCoalescer(methods=['GET', 'POST'])
+
+    def test_exception(self):
+        coalescer = RequestCoalescer()
+        upstream = Upstream(error=ConnectionError('refused'))
+        results = self._send_concurrently(
+            coalescer,
+            upstream,
+            [_request() for _ in range(3)]
+        )
+        self.assertEqual(upstream.calls, 1)
+        for result in results:
+            self.assertIsInstance(result, ConnectionError)
+        # Failed calls are not cached
+        upstream = Upstream()
+        upstream.released.set()
+        self.assertEqual(
+            coalescer.send(_request(), upstream).status_code,
+            200
+        )
@@ -0,0 +1,44 @@
+import threading
+import time
+from unittest import TestCase
+
+from pitch.exceptions import StepTimeoutError
+from pitch.sequence.deadlines import Deadline, Watchdog, parse_timeout
+
+
+class TestDeadline(TestCase):
+    def test_parse_timeout(self):
+        self.assertIsNone(parse_timeout(None))
+        self.assertEqual(parse_timeout('2.5'), 2.5)
+        self.assertEqual(parse_timeout([1, 5]), (1.0, 5.0))
+        self.assertEqual(parse_timeout({'read': 5}), (None, 5.0))
+
+    def test_timeout_capped_at_remaining_time(self):
+        deadline = Deadline(1)
+        self.assertLessEqual(deadline.timeout(), 1)
+        self.assertEqual(deadline.timeout(0.5), 0.5)
+        connect, read = deadline.timeout((0.5, 10))
+        self.assertEqual(connect, 0.5)
+        self.assertLessEqual(read, 1)
+
+    def test_expired(self):
+        deadline = Deadline(0)
+        with self.assertRaises(StepTimeoutError):
+            deadline.check()
+        with self.assertRaises(StepTimeoutError):
+            deadline.timeout(5)
+
+
+class TestWatchdog(TestCase):
+    def test_schedule_and_cancel(self):
+        watchdog = Watchdog()
+        fired = threading.Event()
+        cancelled = []
+        handle = watchdog.schedule(
+            time.monotonic() + 0.01,
+            lambda: cancelled.append(True)
+        )
+        watchdog.cancel(handle)
+        watchdog.schedule(time.monotonic() + 0.02, fired.set)
+        self.assertTrue(fired.wait(1))
+        self.assertEqual(cancelled, [])
@@ -0,0 +1,82 @@
+from unittest import TestCase
+
+from pitch.sequence.dependencies import StepDependencies
+
+
+class TestStepDependencies(TestCase):
+    def test_independent_steps_share_a_wave(self):
+        steps = [{'url': '/dashboards/{}'.format(index)} for index in range(3)]
+        self.assertEqual(StepDependencies(steps).waves(), [[0, 1, 2]])
+
+    def test_registered_variables(self):
+        steps = [
+            {
+                'url': '/users',
+                'plugins': [{
+                    'plugin': 'post_register',
+                    'users': '{{ response.json() }}'
+                }]
+            },
+            {'url': '/status'},
+            {'url': '/users/{{ item }}', 'with_items': 'variables.users'},
+            {'url': '/users/{{ variables["users"][0] }}'}
+        ]
+        dependencies = StepDependencies(steps)
+        self.assertEqual(
+            dependencies.dependencies,
+            [set(), set(), {0}, {0}]
+        )
+        self.assertEqual(dependencies.waves(), [[0, 1], [2, 3]])
+
+    def test_lazy_registered_expressions(self):
+        steps = [
+            {
+                'url': '/users',
+                'plugins': [{
+                    'plugin': 'post_register',
+                    'users': 'response.json()'
+                }]
+            },
+            {'url': '/status'},
+            {'url': '/users/{{ item }}', 'with_items': 'variables.users'}
+        ]
+        self.assertEqual(
+            StepDependencies(steps).dependencies,
+            [set(), set(), {0, 1}]
+        )
+
+    def test_extracted_variables(self):
+        steps = [
+            {
+                'url': '/users',
+                'plugins': [{
+                    'plugin': 'post_register',
+                    'extract': {'ids': 'users[*].id'}
+                }]
+            },
+            {'url': '/status'},
+            {'url': '/users/{{ item }}', 'with_items': 'variables.ids'}
+        ]
+        self.assertEqual(
+            StepDependencies(steps).dependencies,
+            [set(), set(), {0}]
+        )
+
+    def test_previous_response_and_explicit_dependencies(self):
+        steps = [
+            {'url': '/login', 'name': 'login'},
+            {'url': '/next?cursor={{ response.json()["cursor"] }}'},
+            {'url': '/profile', 'depends_on': 'login'},
+            {'url': '/settings', 'depends_on': [2]},
+            {'url': '/all', 'when': 'variables'}
+        ]
+        self.assertEqual(
+            StepDependencies(steps).dependencies,
+            [set(), {0}, {0}, {2}, set()]
+        )
+
+    def test_invalid_dependencies(self):
+        with self.assertRaises(ValueError):
+            StepDependencies([{'url': '/', 'depends_on': 'missing'}])
+        with self.assertRaises(ValueError):
+            StepDependencies([{'url': '/', 'depends_on': 0}])
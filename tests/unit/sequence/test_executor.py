@@ -0,0 +1,201 @@
+import http.server
+import logging
+import os
+import tempfile
+import threading
+import time
+from unittest import TestCase
+
+import requests
+from requests.adapters import BaseAdapter, HTTPAdapter
+
+from pitch.plugins.utils import loader
+from pitch.sequence.executor import SequenceExecutor, SequenceLoader, \
+    _branch_session, _cookie_values, _merge_cookies
+
+logger = logging.getLogger(__name__)
+
+
+class Adapter(BaseAdapter):
+    """ Answer every request with the result of `respond`. """
+    def __init__(self, respond=None):
+        super(Adapter, self).__init__()
+        self._respond = respond
+        self.requests = []
+
+    def send(self, request, **kwargs):
+        self.requests.append(request)
+        response = requests.Response()
+        response.status_code = 200
+        response.url = request.url
+        response.request = request
+        response.connection = self
+        response._content = b''
+        if self._respond is not None:
+            response._content = self._respond(request).encode('utf-8')
+        return response
+
+    def close(self):
+        pass
+
+
+class TestBranches(TestCase):
+    def test_branch_session(self):
+        session = requests.Session()
+        adapter = HTTPAdapter()
+        session.mount('http://', adapter)
+        session.headers['X-Session'] = '1'
+        session.cookies.set('a', '1')
+        branch = _branch_session(session)
+        self.assertIsNot(branch, session)
+        self.assertIs(branch.get_adapter('http://example.com'), adapter)
+        self.assertIs(
+            branch.get_adapter('https://example.com'),
+            session.get_adapter('https://example.com')
+        )
+        self.assertEqual(branch.cookies.get('a'), '1')
+        branch.cookies.set('b', '2')
+        branch.headers['X-Branch'] = '1'
+        self.assertNotIn('b', session.cookies)
+        self.assertNotIn('X-Branch', session.headers)
+
+    def test_merge_cookies_in_step_order(self):
+        jar = requests.Session().cookies
+        jar.set('kept', '1')
+        jar.set('updated', '1')
+        jar.set('cleared', '1')
+        original = _cookie_values(jar)
+        first = _branch_session(requests.Session()).cookies
+        first.update(jar)
+        first.set('updated', '2')
+        first.set('added', '1')
+        second = jar.copy()
+        second.set('added', '2')
+        second.clear('', '/', 'cleared')
+        for branch in (first, second):
+            _merge_cookies(jar, branch, original)
+        self.assertEqual(
+            {cookie.name: cookie.value for cookie in jar},
+            {'kept': '1', 'updated': '2', 'added': '2'}
+        )
+
+
+class TestSequenceExecutor(TestCase):
+    def setUp(self):
+        loader()
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+
+    def _sequence(self, steps, **sequence):
+        filename = os.path.join(self.directory.name, 'sequence.yml')
+        with open(filename, 'w') as f:
+            sequence.setdefault('base_url', 'http://a')
+            f.write('variables: {}\nrequests: {}\n')
+            for key, value in sequence.items():
+                f.write('{}: {}\n'.format(key, value))
+            f.write('steps:\n' + steps)
+        return SequenceLoader(filename)
+
+    def test_executions_register_their_own_variables(self):
+        counter = iter(range(2))
+        barrier = threading.Barrier(2, timeout=5)
+
+        def respond(request):
+            if request.path_url == '/register':
+                return str(next(counter))
+            if request.path_url == '/wait':
+                barrier.wait()
+            return ''
+
+        adapter = Adapter(respond)
+        sequence = self._sequence(
+            '  - url: /register\n'
+            '    plugins:\n'
+            '      - plugin: post_register\n'
+            '        value: "{{ response.text }}"\n'
+            '  - url: /wait\n'
+            '    plugins: []\n'
+            '  - url: /read/{{ variables.value }}\n'
+            '    plugins: []\n'
+        )
+        executors = [
+            SequenceExecutor(sequence, logger, adapter=adapter)
+            for _ in range(2)
+        ]
+        threads = [
+            threading.Thread(target=executor.run) for executor in executors
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(5)
+        self.assertEqual(
+            sorted(
+                executor.context.templating['variables']['value']
+                for executor in executors
+            ),
+            ['0', '1']
+        )
+        self.assertEqual(
+            sorted(
+                request.path_url for request in adapter.requests
+                if request.path_url.startswith('/read/')
+            ),
+            ['/read/0', '/read/1']
+        )
+        self.assertEqual(sequence.get('variables'), {})
+
+    def test_session_cookies_are_sent(self):
+        cookies = []
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def do_GET(self):
+                cookies.append(self.headers.get('Cookie'))
+                self.send_response(200)
+                if self.path == '/login':
+                    self.send_header('Set-Cookie', 'session=1; Path=/')
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+
+            def log_message(self, *args):
+                pass
+
+        server = http.server.ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        sequence = self._sequence(
+            '  - url: /login\n'
+            '    plugins: []\n'
+            '  - url: /account\n'
+            '    plugins: []\n',
+            base_url='http://127.0.0.1:{}'.format(server.server_address[1])
+        )
+        SequenceExecutor(sequence, logger).run()
+        self.assertEqual(cookies, [None, 'session=1'])
+
+    def test_loops_stop_at_the_run_duration(self):
+        def respond(request):
+            time.sleep(0.01)
+            return ''
+
+        adapter = Adapter(respond)
+        sequence = self._sequence(
+            '  - url: /items/{{ item }}\n'
+            '    with_items: "{{ range(1000) | list }}"\n'
+            '    plugins: []\n'
+            '  - url: /nested/{{ item[0] }}/{{ item[1] }}\n'
+            '    with_nested: [[1, 2], [1, 2]]\n'
+            '    plugins: []\n'
+        )
+        SequenceExecutor(
+            sequence,
+            logger,
+            adapter=adapter,
+            stop_at=time.monotonic() + 0.1
+        ).run()
+        self.assertGreater(len(adapter.requests), 0)
+        self.assertLess(len(adapter.requests), 50)
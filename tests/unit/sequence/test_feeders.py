@@ -0,0 +1,77 @@
+import os
+import shutil
+import tempfile
+from concurrent import futures
+from unittest import TestCase
+
+from pitch.exceptions import InvalidFeederError
+from pitch.sequence.feeders import Feeder, load_feeders
+
+
+class TestFeeder(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.csv_path = os.path.join(self.directory, 'users.csv')
+        with open(self.csv_path, 'w') as f:
+            f.write('id,login\n')
+            for index in range(100):
+                f.write('{},user-{}\n'.format(index, index))
+        self.jsonl_path = os.path.join(self.directory, 'users.jsonl')
+        with open(self.jsonl_path, 'w') as f:
+            f.write('{"id": 1}\n\n{"id": 2}')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_csv_rows_are_returned_once(self):
+        feeder = Feeder('users', self.csv_path)
+        rows = list(feeder)
+        self.assertEqual(len(rows), 100)
+        self.assertDictEqual(rows[0], {'id': '0', 'login': 'user-0'})
+        self.assertEqual(list(feeder), [])
+
+    def test_jsonl_skips_blank_lines(self):
+        feeder = Feeder('users', self.jsonl_path)
+        self.assertEqual(list(feeder), [{'id': 1}, {'id': 2}])
+
+    def test_circular_wraps_around(self):
+        feeder = Feeder('users', self.jsonl_path, strategy='circular')
+        self.assertEqual(
+            list(feeder.take(5)),
+            [{'id': 1}, {'id': 2}, {'id': 1}, {'id': 2}, {'id': 1}]
+        )
+
+    def test_circular_without_rows(self):
+        path = os.path.join(self.directory, 'blank.jsonl')
+        with open(path, 'w') as f:
+            f.write('\n \n\n')
+        feeder = Feeder('users', path, strategy='circular')
+        with self.assertRaises(InvalidFeederError):
+            feeder.next()
+
+    def test_close(self):
+        feeder = Feeder('users', self.jsonl_path)
+        feeder.close()
+        feeder.close()
+        with self.assertRaises(ValueError):
+            feeder.next()
+
+    def test_random_uses_existing_rows(self):
+        feeder = Feeder('users', self.csv_path, strategy='random')
+        logins = {row['login'] for row in feeder.take(50)}
+        self.assertTrue(logins.issubset(
+            {'user-{}'.format(index) for index in range(100)}
+        ))
+
+    def test_cursor_is_shared_between_threads(self):
+        feeder = Feeder('users', self.csv_path)
+        with futures.ThreadPoolExecutor(max_workers=4) as pool:
+            batches = list(pool.map(lambda _: list(feeder), range(4)))
+        ids = sorted(int(row['id']) for batch in batches for row in batch)
+        self.assertEqual(ids, list(range(100)))
+
+    def test_invalid_definitions(self):
+        with self.assertRaises(InvalidFeederError):
+            load_feeders({'users': {'path': self.csv_path, 'strategy': 'x'}})
+        with self.assertRaises(InvalidFeederError):
+            load_feeders({'users': {'path': self.csv_path + '.txt'}})
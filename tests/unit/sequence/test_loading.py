@@ -0,0 +1,88 @@
+import hashlib
+import os
+import shutil
+import tempfile
+from unittest import TestCase
+
+from pitch.sequence.loading import SequenceCache, SequenceParser, \
+    load_sequence_file
+
+
+class TestSequenceLoading(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.cache_directory = os.path.join(self.directory, 'cache')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def _write(self, name, content):
+        path = os.path.join(self.directory, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'w') as f:
+            f.write(content)
+        return path
+
+    def test_includes(self):
+        self._write(
+            'fragments/login.yml',
+            '- url: /login\n'
+            '  plugins:\n'
+            '    - include: plugins.yml\n'
+        )
+        self._write(
+            'fragments/plugins.yml',
+            '- plugin: response_as_json\n'
+            '- plugin: assert_http_status_code\n'
+        )
+        path = self._write(
+            'sequence.yml',
+            'steps:\n'
+            '  - include: fragments/login.yml\n'
+            '  - url: /home\n'
+            '  - include: fragments/login.yml\n'
+        )
+        parser = SequenceParser()
+        steps = parser.parse(path)['steps']
+        self.assertEqual(
+            [step['url'] for step in steps],
+            ['/login', '/home', '/login']
+        )
+        self.assertEqual(len(steps[2]['plugins']), 2)
+        self.assertIsNot(steps[0], steps[2])
+        self.assertEqual(len(parser.dependencies), 2)
+
+    def test_circular_include(self):
+        path = self._write('loop.yml', '- include: loop.yml\n')
+        with self.assertRaises(ValueError):
+            SequenceParser().parse(path)
+
+    def test_cache_invalidation(self):
+        fragment = self._write('steps.yml', '- url: /first\n')
+        path = self._write('sequence.yml', 'steps: [{include: steps.yml}]\n')
+        self.assertEqual(
+            load_sequence_file(path, self.cache_directory)['steps'],
+            [{'url': '/first'}]
+        )
+        with open(path, 'rb') as f:
+            digest = hashlib.sha256(f.read()).hexdigest()
+        self.assertIsNotNone(
+            SequenceCache(self.cache_directory).get(path, digest)
+        )
+        with open(fragment, 'w') as f:
+            f.write('- url: /second\n')
+        self.assertEqual(
+            load_sequence_file(path, self.cache_directory)['steps'],
+            [{'url': '/second'}]
+        )
+
+    def test_cache_eviction(self):
+        cache = SequenceCache(self.cache_directory, max_entries=2)
+        for index in range(3):
+            path = self._write('{}.yml'.format(index), 'steps: []\n')
+            cache.put(path, str(index), {}, {'steps': []})
+            # Entries are ordered by modification time
+            os.utime(cache._entry_path(path), (index, index))
+        self.assertEqual(len(os.listdir(self.cache_directory)), 2)
+        self.assertIsNone(cache.get(path.replace('2', '0'), '0'))
+        self.assertIsNotNone(cache.get(path, '2'))
@@ -0,0 +1,72 @@
+import os
+import shutil
+import tempfile
+from unittest import TestCase
+
+from pitch.sequence.executor import SequenceLoader
+from pitch.sequence.scenarios import ScenarioMix, load_sequence
+from pitch.sequence.think_time import ThinkTime
+
+
+class TestThinkTime(TestCase):
+    def test_distributions(self):
+        self.assertEqual(ThinkTime.from_definition(2).sample(), 2.0)
+        uniform = ThinkTime(distribution='uniform', min=1, max=2)
+        self.assertTrue(all(1 <= uniform.sample() <= 2 for _ in range(100)))
+        exponential = ThinkTime(distribution='exponential', mean=1, max=3)
+        self.assertTrue(all(exponential.sample() <= 3 for _ in range(100)))
+        with self.assertRaises(ValueError):
+            ThinkTime(distribution='uniform', min=1)
+
+
+class TestScenarioMix(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def _write(self, name, content):
+        path = os.path.join(self.directory, name)
+        with open(path, 'w') as f:
+            f.write(content)
+        return path
+
+    def test_load(self):
+        self._write(
+            'browse.yml',
+            'think_time: 1\n'
+            'feeders: {users: {path: users.csv}}\n'
+            'steps: []\n'
+        )
+        os.mkdir(os.path.join(self.directory, 'search'))
+        # The same feeder, relative to another directory
+        self._write(
+            'search/search.yml',
+            'feeders: {users: {path: ../users.csv}}\n'
+            'steps: []\n'
+        )
+        mix = load_sequence(self._write(
+            'mix.yml',
+            'threads: 4\n'
+            'scenarios:\n'
+            '  - sequence: browse.yml\n'
+            '    weight: 3\n'
+            '  - sequence: search/search.yml\n'
+            '    threads: 2\n'
+            '    think_time: {distribution: uniform, min: 0, max: 1}\n'
+        ))
+        self.assertIsInstance(mix, ScenarioMix)
+        browse, search = mix.scenarios
+        self.assertEqual((browse.weight, browse.threads), (3, None))
+        self.assertEqual(browse.think_time.sample(), 1.0)
+        self.assertEqual(search.threads, 2)
+        self.assertEqual(
+            mix.get('feeders'),
+            {'users': {'path': os.path.join(self.directory, 'users.csv')}}
+        )
+        self.assertEqual(mix.get('threads'), 4)
+
+    def test_sequence_file(self):
+        path = self._write('sequence.yml', 'steps: []\n')
+        self.assertIsInstance(load_sequence(path), SequenceLoader)
@@ -0,0 +1,109 @@
+from unittest import TestCase
+
+import requests
+
+from pitch.sequence.skeletons import RequestSkeleton, RequestSkeletons, \
+    is_static
+from pitch.structures import Context, JinjaEvaluator
+
+
+class TestRequestSkeleton(TestCase):
+    def setUp(self):
+        self.context = Context()
+        self.context.templating['item'] = 'a b'
+        self.rendering = JinjaEvaluator(self.context.templating)
+        self.session = requests.Session()
+        self.session.cookies.set('session', '1')
+
+    def _prepare(self, definition, defaults=None):
+        skeleton = RequestSkeleton(
+            'http://example.com/api/',
+            defaults or {},
+            definition
+        )
+        values = skeleton.render(self.rendering)
+        return skeleton, values, skeleton.prepare(self.session, values)
+
+    def _assert_prepared_as_session(self, definition, expected):
+        _, _, prepared = self._prepare(definition)
+        expected = self.session.prepare_request(requests.Request(**expected))
+        self.assertEqual(prepared.method, expected.method)
+        self.assertEqual(prepared.url, expected.url)
+        self.assertEqual(prepared.headers, expected.headers)
+        self.assertEqual(prepared.body, expected.body)
+
+    def test_is_static(self):
+        self.assertTrue(is_static({'a': ['b', 1, None]}))
+        self.assertFalse(is_static({'a': ['{{ item }}']}))
+        self.assertFalse(is_static('{% if true %}a{% endif %}'))
+
+    def test_static(self):
+        self._assert_prepared_as_session(
+            {'url': 'users', 'method': 'post', 'params': {'q': 'x'},
+             'headers': {'X-Static': '1'}, 'json': {'a': 1}},
+            {'url': 'http://example.com/api/users', 'method': 'POST',
+             'params': {'q': 'x'}, 'headers': {'X-Static': '1'},
+             'json': {'a': 1}}
+        )
+        self._assert_prepared_as_session(
+            {'url': 'users', 'method': 'delete'},
+            {'url': 'http://example.com/api/users', 'method': 'DELETE'}
+        )
+
+    def test_templated(self):
+        self._assert_prepared_as_session(
+            {'url': '/items/{{ item }}', 'params': {'q': '{{ item }}'},
+             'headers': {'X-Item': '{{ item }}'},
+             'data': {'item': '{{ item }}'}, 'method': 'put'},
+            {'url': 'http://example.com/items/a b', 'method': 'PUT',
+             'params': {'q': 'a b'}, 'headers': {'X-Item': 'a b'},
+             'data': {'item': 'a b'}}
+        )
+
+    def test_templates_are_not_rendered_in_place(self):
+        skeleton, _, _ = self._prepare({'url': 'x', 'params': {
+            'q': '{{ item }}'
+        }})
+        self.context.templating['item'] = 'c'
+        prepared = skeleton.prepare(
+            self.session,
+            skeleton.render(self.rendering)
+        )
+        self.assertEqual(prepared.url, 'http://example.com/api/x?q=c')
+
+    def test_defaults(self):
+        _, values, prepared = self._prepare(
+            {'url': 'x', 'timeout': [1, 5], 'name': 'step',
+             'cookies': {'a': '1'}},
+            defaults={'headers': {'X-Default': '1'}}
+        )
+        self.assertEqual(prepared.headers['X-Default'], '1')
+        self.assertEqual(prepared.headers['Cookie'], 'session=1; a=1')
+        self.assertNotIn('name', values)
+
+    def test_session_defaults(self):
+        skeleton, values, prepared = self._prepare({'url': 'x'})
+        self.assertEqual(
+            prepared.headers['User-Agent'],
+            self.session.headers['User-Agent']
+        )
+        self.session.headers['X-Session'] = '1'
+        self.session.params['q'] = 'y'
+        self.session.auth = ('user', 'password')
+        self.session.cookies.set('session', '2')
+        prepared = skeleton.prepare(self.session, values)
+        self.assertEqual(prepared.url, 'http://example.com/api/x?q=y')
+        self.assertEqual(prepared.headers['X-Session'], '1')
+        self.assertEqual(prepared.headers['Cookie'], 'session=2')
+        self.assertTrue(prepared.headers['Authorization'].startswith('Basic'))
+
+    def test_shared_by_step(self):
+        class Loader(object):
+            def get(self, key):
+                return {'base_url': 'http://example.com', 'requests': {}}[key]
+
+        skeletons = RequestSkeletons()
+        loader = Loader()
+        skeleton = skeletons.get(loader, 0, {'url': '/'})
+        self.assertIs(skeletons.get(loader, 0, {'url': '/'}), skeleton)
+        self.assertIsNot(skeletons.get(loader, 1, {'url': '/'}), skeleton)
@@ -0,0 +1,64 @@
+import socket
+import time
+from unittest import TestCase
+
+from requests.adapters import HTTPAdapter
+
+from pitch.sequence.warmup import Warmup, _connection_pool, \
+    measurement_duration
+
+
+class TestWarmup(TestCase):
+    def test_from_definition(self):
+        self.assertIsNone(Warmup.from_definition(None))
+        self.assertEqual(Warmup.from_definition(5).duration, 5.0)
+        warmup = Warmup.from_definition({'iterations': 2, 'connections': 8})
+        self.assertEqual((warmup.iterations, warmup.connections), (2, 8))
+        self.assertTrue(warmup.executes)
+        self.assertFalse(Warmup(connections=8).executes)
+
+    def test_executions(self):
+        self.assertEqual(
+            len(list(Warmup(iterations=3).executions(time.monotonic()))),
+            3
+        )
+        started = time.monotonic()
+        for _ in Warmup(duration=0.05).executions(started):
+            time.sleep(0.01)
+        self.assertGreaterEqual(time.monotonic() - started, 0.05)
+
+    def test_prewarm(self):
+        server = socket.socket()
+        server.bind(('127.0.0.1', 0))
+        server.listen(8)
+        url = 'http://127.0.0.1:{}'.format(server.getsockname()[1])
+        adapter = HTTPAdapter()
+        try:
+            Warmup(connections=3).prewarm(adapter, [url])
+            pool = _connection_pool(adapter, url)
+            self.assertEqual(
+                sum(connection is not None and connection.sock is not None
+                    for connection in list(pool.pool.queue)),
+                3
+            )
+        finally:
+            adapter.close()
+            server.close()
+
+    def test_connection_pool_of_legacy_adapters(self):
+        class LegacyAdapter(object):
+            """ Adapter of requests releases before 2.32 """
+            def get_connection(self, url):
+                return url
+
+        self.assertEqual(
+            _connection_pool(LegacyAdapter(), 'http://a'),
+            'http://a'
+        )
+
+    def test_measurement_duration(self):
+        self.assertIsNone(measurement_duration({}))
+        self.assertEqual(
+            measurement_duration({'duration': 60, 'cooldown': 10}),
+            50.0
+        )
@@ -0,0 +1,95 @@
+import json
+from unittest import TestCase, skipIf
+
+import requests
+
+from pitch.plugins.response import ResponseUpdateContext
+from pitch.structures import Context, JinjaEvaluator
+from pitch.templating.jinja_custom_extensions import compile_query
+
+try:
+    import jmespath
+    import jsonpath_ng
+except ImportError:  # pragma: no cover
+    jmespath = jsonpath_ng = None
+
+
+class TestCoreFilters(TestCase):
+    def test_former_names(self):
+        rendering = JinjaEvaluator(Context().templating)
+        for name in ('to_json', 'filter_to_json'):
+            self.assertEqual(
+                rendering.render('{{ [1] | %s }}' % name),
+                '[1]'
+            )
+        self.assertEqual(
+            rendering.render('{{ "[1]" | filter_from_json | first }}'),
+            '1'
+        )
+        self.assertEqual(
+            rendering.render('{{ "[1]" is test_json_serializable }}'),
+            'True'
+        )
+
+
+DOCUMENT = {
+    'token': 'abc',
+    'items': [{'id': 1, 'tags': ['a']}, {'id': 2, 'tags': []}]
+}
+
+
+@skipIf(jmespath is None or jsonpath_ng is None,
+        'jmespath and jsonpath-ng are not installed')
+class TestQueryFilters(TestCase):
+    def setUp(self):
+        self.context = Context()
+        self.context.step['rendering'] = JinjaEvaluator(
+            self.context.templating
+        )
+        response = requests.Response()
+        response._content = json.dumps(DOCUMENT).encode('utf-8')
+        response.status_code = 200
+        self.context.templating['response'] = response
+
+    def test_filters(self):
+        rendering = self.context.step['rendering']
+        self.assertEqual(
+            rendering.get('response | jmespath("items[*].id")'),
+            [1, 2]
+        )
+        self.assertEqual(
+            rendering.get('response | jsonpath("$.items[?id > 1].id")'),
+            [2]
+        )
+        self.assertEqual(
+            rendering.get('response | jsonpath("$.missing", first=True, '
+                          'default=0)'),
+            0
+        )
+        self.assertEqual(rendering.render('{{ \'"a"\' | from_json }}'), 'a')
+
+    def test_queries_are_cached(self):
+        query = compile_query('items[0].id')
+        self.assertIs(compile_query('items[0].id'), query)
+        with self.assertRaises(ValueError):
+            compile_query('items', 'xpath')
+
+    def test_post_register_extract(self):
+        plugin = ResponseUpdateContext(
+            extract={'token': 'token', 'ids': '$.items[*].id'},
+            status='{{ response.status_code }}'
+        )
+        plugin.execute(self.context)
+        self.assertEqual(
+            dict(self.context.templating['variables']),
+            {'token': 'abc', 'ids': [1, 2],
+             'status': '{{ response.status_code }}'}
+        )
+        self.context.templating['variables']['user'] = {'tags': ['b']}
+        ResponseUpdateContext(
+            extract={'tag': 'tags[0]'},
+            source='variables.user'
+        ).execute(self.context)
+        self.assertEqual(self.context.templating['variables']['tag'], 'b')
+        with self.assertRaises(ValueError):
+            ResponseUpdateContext(extract={'token': 'token'}, token=1)
@@ -0,0 +1,86 @@
+import json
+import os
+import tempfile
+from unittest import TestCase
+
+import requests
+
+from pitch.capture import TailCapture, close_captures
+from pitch.structures import Context
+
+
+def _response(status_code=200, content=b'{"id": 1}'):
+    response = requests.Response()
+    response.status_code = status_code
+    response._content = content
+    response.url = 'http://example.com/users'
+    return response
+
+
+class TestTailCapture(TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, 'capture.jsonl')
+        self.context = Context()
+        self.context.step['index'] = 0
+        self.context.step['definition'] = {'name': 'users'}
+        self.context.templating['variables']['token'] = 'x' * 100
+
+    def tearDown(self):
+        close_captures()
+        self.directory.cleanup()
+
+    def _execute(self, capture, elapsed=0.1, response=None, exception=None):
+        request = requests.Request(
+            'POST', 'http://example.com/users', data='a' * 100
+        ).prepare()
+        capture.start()
+        capture.request(request)
+        if response is not None:
+            capture.response(self.context, response, elapsed)
+        capture.end(self.context, exception)
+
+    def _records(self, capture):
+        capture.close()
+        with open(self.path) as f:
+            return [json.loads(line) for line in f]
+
+    def test_tail(self):
+        capture = TailCapture(self.path, min_requests=10, body_bytes=16)
+        for _ in range(10):
+            self._execute(capture, response=_response())
+        self._execute(capture, response=_response(), elapsed=0.09)
+        self._execute(capture, response=_response(), elapsed=0.2)
+        self._execute(capture, response=_response(503))
+        self._execute(capture, response=_response(),
+                      exception=AssertionError('id'))
+        self._execute(capture, exception=requests.ConnectionError())
+        records = self._records(capture)
+        self.assertEqual(
+            [record['reasons'] for record in records],
+            [['slow'], ['failure'], ['error'], ['error']]
+        )
+        slow = records[0]
+        self.assertEqual(slow['name'], 'users')
+        self.assertEqual(slow['request']['body'],
+                         {'size': 100, 'text': 'a' * 16})
+        self.assertEqual(slow['response']['body']['text'], '{"id": 1}')
+        self.assertEqual(len(slow['variables']), 16)
+        self.assertEqual(records[2]['error'], "AssertionError('id')")
+        self.assertIsNone(records[3]['response'])
+
+    def test_sample_and_ring_buffer(self):
+        capture = TailCapture(
+            self.path,
+            percentile=None,
+            sample=1,
+            buffer_size=2,
+            flush_interval=60
+        )
+        for _ in range(3):
+            self._execute(capture, response=_response())
+        self.assertEqual((capture.captured, capture.dropped), (3, 1))
+        self.assertEqual(len(self._records(capture)), 2)
+        self.assertIsNone(TailCapture.from_definition(None))
+        self.assertEqual(TailCapture.from_definition(self.path).path,
+                         self.path)
@@ -0,0 +1,48 @@
+import os
+import shutil
+import tempfile
+from unittest import TestCase
+
+from pitch.checkpoint import CheckpointStore
+
+
+class TestCheckpointStore(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'run.checkpoint')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def _run(self, resume, items):
+        store = CheckpointStore(self.path, resume=resume, interval=60)
+        checkpoint = store.open('0.0')
+        executed = []
+        for index, item in enumerate(items):
+            if checkpoint.is_completed(0, index, item):
+                continue
+            executed.append(item)
+            checkpoint.complete(0, index, item, {'last': item})
+        variables = checkpoint.restore_variables()
+        checkpoint.close()
+        return executed, variables
+
+    def test_resume_skips_completed_items(self):
+        self._run(False, ['a', 'b'])
+        executed, _ = self._run(True, ['a', 'b', 'c'])
+        self.assertEqual(executed, ['c'])
+
+    def test_variables_are_restored(self):
+        self._run(False, [{'id': 1}])
+        store = CheckpointStore(self.path, resume=True)
+        checkpoint = store.open('0.0')
+        self.assertEqual(checkpoint.restore_variables(), {'last': {'id': 1}})
+        checkpoint.close()
+        self.assertIsNone(store.open('1.0').restore_variables())
+
+    def test_reset_discards_progress(self):
+        self._run(False, ['a'])
+        store = CheckpointStore(self.path)
+        store.reset()
+        executed, _ = self._run(True, ['a'])
+        self.assertEqual(executed, ['a'])
@@ -0,0 +1,94 @@
+import os
+import tempfile
+from unittest import TestCase
+
+from pitch.exceptions import RunNotFoundError
+from pitch.history import RegressionCheck, RunHistory, RunSummary
+from pitch.stats import Statistics
+
+
+def _summary(run_id, latency, errors=0, requests=100, elapsed=10.0):
+    steps = []
+    for index, name in enumerate(('login', None)):
+        statistics = Statistics()
+        for request in range(requests):
+            statistics.latency.record(latency + request / 10000.0)
+            statistics.outcomes['ok' if request >= errors else 'error'] += 1
+        steps.append({
+            'index': index,
+            'name': name,
+            'url': '/{}'.format(index),
+            'statistics': statistics
+        })
+    total = Statistics()
+    for step in steps:
+        total.merge(step['statistics'])
+    return RunSummary(run_id, total, steps, elapsed)
+
+
+class TestRunHistory(TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.history = RunHistory(self.directory.name)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_save_and_load(self):
+        for run_id in ('20260101T000000Z-0001', '20260102T000000Z-0001'):
+            self.history.save(_summary(run_id, 0.1))
+        self.assertEqual(
+            self.history.load('latest').run_id,
+            '20260102T000000Z-0001'
+        )
+        self.assertEqual(
+            self.history.load('latest~1').run_id,
+            '20260101T000000Z-0001'
+        )
+        summary = self.history.load(
+            os.path.join(self.directory.name, '20260101T000000Z-0001.json')
+        )
+        statistics = summary.steps[0]['statistics']
+        self.assertEqual(statistics.requests, 100)
+        self.assertAlmostEqual(statistics.latency.percentile(50), 0.105, 2)
+        with self.assertRaises(RunNotFoundError):
+            self.history.load('latest~2')
+
+
+class TestRegressionCheck(TestCase):
+    def _regressed(self, results):
+        return {
+            (result.step, result.metric)
+            for result in results
+            if result.regressed
+        }
+
+    def test_compare(self):
+        baseline = _summary('a', 0.1)
+        check = RegressionCheck()
+        self.assertEqual(
+            self._regressed(check.compare(baseline, _summary('b', 0.1))),
+            set()
+        )
+        slower = check.compare(baseline, _summary('b', 0.2, elapsed=20.0))
+        self.assertIn(('login', 'p95'), self._regressed(slower))
+        self.assertIn(('/1', 'throughput'), self._regressed(slower))
+        failing = check.compare(baseline, _summary('b', 0.1, errors=5))
+        self.assertEqual(
+            self._regressed(failing),
+            {('total', 'error_rate'), ('login', 'error_rate'),
+             ('/1', 'error_rate')}
+        )
+
+    def test_tolerances(self):
+        check = RegressionCheck.from_definition(
+            {'directory': 'history', 'tolerances': {'error_rate': 0.1}},
+            tolerances={'latency': 2}
+        )
+        results = check.compare(
+            _summary('a', 0.1),
+            _summary('b', 0.2, errors=5)
+        )
+        self.assertEqual(self._regressed(results), set())
+        with self.assertRaises(ValueError):
+            RegressionCheck({'p99': 0.1})
@@ -0,0 +1,26 @@
+from unittest import TestCase
+
+from pitch.hooks import HookBus, ResponseDone, StepStart
+
+
+class TestHookBus(TestCase):
+    def test_events_are_delivered_to_subscribers(self):
+        bus = HookBus()
+        received = []
+        self.assertFalse(bus.step_start)
+        bus.subscribe(StepStart, received.append)
+        event = StepStart(time=0, step=1, item=None)
+        bus.emit(event)
+        bus.emit(ResponseDone(time=0, step=1, request=None,
+                              response=None, elapsed=0.1))
+        self.assertEqual(received, [event])
+
+    def test_unsubscribe(self):
+        bus = HookBus()
+        bus.subscribe(StepStart, print)
+        bus.unsubscribe(StepStart, print)
+        self.assertEqual(bus.step_start, ())
+
+    def test_unknown_event_type(self):
+        with self.assertRaises(ValueError):
+            HookBus().subscribe(dict, print)
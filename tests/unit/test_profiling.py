@@ -0,0 +1,57 @@
+import os
+import pstats
+import tempfile
+from unittest import TestCase
+
+from pitch.profiling import PhaseProfiler
+
+
+def _work():
+    return sum(range(1000))
+
+
+class TestPhaseProfiler(TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+
+    def _path(self, name):
+        return os.path.join(self.directory.name, name)
+
+    def test_phases(self):
+        profiler = PhaseProfiler()
+        with profiler.phase('send'):
+            with profiler.phase('render'):
+                pass
+        other = PhaseProfiler()
+        with other.phase('send'):
+            pass
+        profiler.merge(other.stats())
+        stats = profiler.stats()
+        self.assertEqual(stats['send'][0], 2)
+        self.assertEqual(stats['render'][0], 1)
+        self.assertLessEqual(stats['send'][2], stats['send'][1])
+
+    def test_merge_cprofile(self):
+        dumps = []
+        for process in range(2):
+            profiler = PhaseProfiler(cprofile_output=self._path('profile'))
+            profiler.start_thread()
+            for _ in range(process + 1):
+                _work()
+            profiler.stop_thread()
+            dumps.append(self._path('profile.{}'.format(process)))
+            self.assertTrue(profiler.dump_cprofile(dumps[-1]))
+        self.assertTrue(PhaseProfiler.merge_cprofile(
+            self._path('profile'),
+            dumps + dumps[:1]
+        ))
+        self.assertFalse(any(os.path.exists(dump) for dump in dumps))
+        statistics = pstats.Stats(self._path('profile'))
+        calls = [
+            entry[1]
+            for (filename, _, name), entry in statistics.stats.items()
+            if name == '_work'
+        ]
+        self.assertEqual(calls, [3])
+        self.assertFalse(PhaseProfiler.merge_cprofile('unused', []))
@@ -0,0 +1,34 @@
+from unittest import TestCase
+
+from pitch.retention import RetentionPolicy, extract_paths, parse_size
+
+
+class TestRetention(TestCase):
+    def test_parse_size(self):
+        self.assertEqual(parse_size(512), 512)
+        self.assertEqual(parse_size('2K'), 2048)
+        self.assertEqual(parse_size('1.5 MB'), 3 << 19)
+        self.assertEqual(parse_size('1GiB'), 1 << 30)
+        with self.assertRaises(ValueError):
+            parse_size('many')
+
+    def test_extract_paths(self):
+        document = {
+            'id': 1,
+            'profile': {'name': 'pitch', 'bio': 'x' * 100},
+            'items': [{'name': 'first'}, {'name': 'second'}]
+        }
+        self.assertEqual(
+            extract_paths(document, ['id', 'profile.name', 'items.1.name',
+                                     'missing.path']),
+            {'id': 1, 'profile': {'name': 'pitch'},
+             'items': {'1': {'name': 'second'}}}
+        )
+
+    def test_largest_variables(self):
+        policy = RetentionPolicy(report=2)
+        variables = {'small': 1, 'large': ['x' * 1000], 'medium': 'x' * 100}
+        self.assertEqual(
+            [name for name, _ in policy.largest(variables)],
+            ['large', 'medium']
+        )
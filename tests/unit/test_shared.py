@@ -0,0 +1,64 @@
+import time
+from concurrent import futures
+from unittest import TestCase
+
+from pitch.exceptions import SharedVariablesTimeoutError
+from pitch.shared import SharedVariables
+
+
+class TestSharedVariables(TestCase):
+    def test_ttl(self):
+        shared = SharedVariables.create()
+        shared.set('token', 'abc')
+        shared.set('session', 'xyz', ttl=0.05)
+        self.assertEqual(dict(shared), {'token': 'abc', 'session': 'xyz'})
+        time.sleep(0.1)
+        self.assertNotIn('session', shared)
+        self.assertEqual(shared['token'], 'abc')
+
+    def test_cached_reads_see_updates(self):
+        shared = SharedVariables.create()
+        shared.set('token', 'first')
+        self.assertEqual(shared['token'], 'first')
+        shared.set('token', 'second')
+        self.assertEqual(shared['token'], 'second')
+
+    def test_compute_once(self):
+        shared = SharedVariables.create()
+        computed = []
+
+        def login(index):
+            owner = str(index)
+            if shared.acquire(['token'], owner):
+                try:
+                    time.sleep(0.05)
+                    computed.append(owner)
+                    shared.set('token', 'abc')
+                finally:
+                    shared.release(['token'], owner)
+            return shared['token']
+
+        with futures.ThreadPoolExecutor(max_workers=8) as pool:
+            tokens = list(pool.map(login, range(8)))
+        self.assertEqual(tokens, ['abc'] * 8)
+        self.assertEqual(len(computed), 1)
+
+    def test_wait_timeout(self):
+        shared = SharedVariables.create(wait_timeout=0.05)
+        self.assertTrue(shared.acquire(['token'], 'first'))
+        # The lease is still held, so it is not taken over
+        with self.assertRaises(SharedVariablesTimeoutError):
+            shared.acquire(['token'], 'second')
+        shared.set('token', 'abc')
+        self.assertFalse(shared.acquire(['token'], 'second'))
+
+    def test_expired_lease_is_taken_over(self):
+        shared = SharedVariables.create(lease_timeout=0.05)
+        self.assertTrue(shared.acquire(['token'], 'first'))
+        self.assertTrue(shared.acquire(['token'], 'second'))
+
+    def test_failed_computation_is_retried(self):
+        shared = SharedVariables.create()
+        self.assertTrue(shared.acquire(['token'], 'first'))
+        shared.release(['token'], 'first')
+        self.assertTrue(shared.acquire(['token'], 'second'))
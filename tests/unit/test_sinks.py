@@ -0,0 +1,54 @@
+import gzip
+import json
+import os
+import shutil
+import tempfile
+from concurrent import futures
+from unittest import TestCase
+
+from pitch.sinks import JSONLinesSink
+
+
+class TestJSONLinesSink(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.filename = os.path.join(self.directory, 'output.jsonl')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def _write(self, sink, count):
+        for index in range(count):
+            sink.write(json.dumps({'index': index}).encode())
+
+    def test_concurrent_writes_are_appended(self):
+        sink = JSONLinesSink(self.filename, buffer_size=64)
+        with futures.ThreadPoolExecutor(max_workers=4) as pool:
+            list(pool.map(lambda _: self._write(sink, 250), range(4)))
+        sink.close()
+        with open(self.filename) as f:
+            lines = [json.loads(line) for line in f]
+        self.assertEqual(len(lines), 1000)
+
+    def test_gzip_batches_form_a_single_stream(self):
+        filename = self.filename + '.gz'
+        sink = JSONLinesSink(filename, compression='gzip', buffer_size=32)
+        self._write(sink, 100)
+        sink.close()
+        with gzip.open(filename, 'rt') as f:
+            self.assertEqual(
+                [json.loads(line)['index'] for line in f],
+                list(range(100))
+            )
+
+    def test_size_based_rotation(self):
+        sink = JSONLinesSink(self.filename, buffer_size=1, max_bytes=100)
+        self._write(sink, 50)
+        sink.close()
+        files = os.listdir(self.directory)
+        self.assertGreater(len(files), 1)
+        total = 0
+        for name in files:
+            with open(os.path.join(self.directory, name)) as f:
+                total += len(f.readlines())
+        self.assertEqual(total, 50)
@@ -0,0 +1,89 @@
+from types import SimpleNamespace
+from unittest import TestCase
+
+from requests.exceptions import ReadTimeout
+
+from pitch.exceptions import StepTimeoutError
+from pitch.hooks import HookBus, StepStart, ResponseDone, Error
+from pitch.stats import LatencyHistogram, RunStatistics, mann_whitney
+
+
+class TestLatencyHistogram(TestCase):
+    def test_percentiles_within_precision(self):
+        histogram = LatencyHistogram()
+        for millisecond in range(1, 1001):
+            histogram.record(millisecond / 1000.0)
+        self.assertEqual(histogram.count, 1000)
+        self.assertAlmostEqual(histogram.percentile(50), 0.5, delta=0.005)
+        self.assertAlmostEqual(histogram.percentile(99), 0.99, delta=0.01)
+        self.assertEqual(histogram.percentile(100), 1.0)
+
+    def test_merge(self):
+        first, second = LatencyHistogram(), LatencyHistogram()
+        first.record(0.1)
+        second.record(0.3)
+        first.merge(second)
+        self.assertEqual(first.count, 2)
+        self.assertEqual((first.min, first.max), (0.1, 0.3))
+
+
+class TestMannWhitney(TestCase):
+    def test_shifted_distributions(self):
+        first, second, same = (LatencyHistogram() for _ in range(3))
+        for index in range(200):
+            latency = 0.1 + index / 10000.0
+            first.record(latency)
+            second.record(latency * 1.2)
+            same.record(latency)
+        self.assertLess(mann_whitney(first, second).p_value, 0.001)
+        self.assertLess(mann_whitney(first, second).z, 0)
+        self.assertAlmostEqual(mann_whitney(first, same).p_value, 1.0)
+        self.assertIsNone(mann_whitney(first, LatencyHistogram()))
+
+
+class TestRunStatistics(TestCase):
+    def _request(self, bus, step, status_code=None, exception=None):
+        bus.emit(StepStart(time=0, step=step, item=None))
+        if status_code is not None:
+            bus.emit(ResponseDone(
+                time=0, step=step, request=None,
+                response=SimpleNamespace(status_code=status_code),
+                elapsed=0.01
+            ))
+        if exception is not None:
+            bus.emit(Error(time=0, step=step, exception=exception))
+
+    def test_outcomes(self):
+        bus = HookBus()
+        statistics = RunStatistics().subscribe(bus)
+        self._request(bus, 0, status_code=200)
+        self._request(bus, 0, status_code=500)
+        # Assertion failure raised by a response plugin
+        self._request(bus, 1, status_code=200, exception=AssertionError())
+        # No response received
+        self._request(bus, 1, exception=ConnectionError())
+        self.assertEqual(
+            dict(statistics.total.outcomes),
+            {'ok': 1, 'failure': 2, 'timeout': 0, 'error': 1}
+        )
+        self.assertEqual(statistics.step(1).requests, 2)
+        self.assertEqual(statistics.total.error_rate, 0.75)
+        self.assertEqual(statistics.total.latency.count, 3)
+
+    def test_timeouts(self):
+        bus = HookBus()
+        statistics = RunStatistics().subscribe(bus)
+        self._request(bus, 0, exception=ReadTimeout())
+        # Step deadline passed in a response plugin
+        self._request(bus, 0, status_code=200, exception=StepTimeoutError())
+        self.assertEqual(statistics.total.outcomes['timeout'], 2)
+        self.assertEqual(statistics.total.outcomes['ok'], 0)
+
+    def test_measurement_window(self):
+        bus = HookBus()
+        statistics = RunStatistics().subscribe(bus)
+        statistics.measure(start=10, end=20)
+        for started in (5, 10, 15, 20):
+            bus.emit(StepStart(time=started, step=0, item=None))
+            bus.emit(Error(time=started, step=0, exception=ReadTimeout()))
+        self.assertEqual(statistics.total.requests, 2)
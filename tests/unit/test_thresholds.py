@@ -0,0 +1,88 @@
+from types import SimpleNamespace
+from unittest import TestCase
+
+from pitch.exceptions import ThresholdBreachedError
+from pitch.hooks import HookBus, StepStart, ResponseDone
+from pitch.thresholds import Threshold, ThresholdMonitor
+
+
+class TestThresholdMonitor(TestCase):
+    def _request(self, bus, step, status_code=200, elapsed=0.1):
+        bus.emit(StepStart(time=0, step=step, item=None))
+        bus.emit(ResponseDone(
+            time=0, step=step, request=None,
+            response=SimpleNamespace(status_code=status_code),
+            elapsed=elapsed
+        ))
+
+    def test_evaluate(self):
+        monitor = ThresholdMonitor.from_definition(
+            [
+                {'metric': 'latency', 'percentile': 95, 'step': 'login',
+                 'max': 0.2},
+                {'metric': 'error_rate', 'max': 0.1},
+                {'metric': 'throughput', 'min': 10}
+            ],
+            steps=[{'name': 'login'}, {}]
+        )
+        bus = HookBus()
+        monitor.subscribe(bus)
+        for _ in range(10):
+            self._request(bus, 0, elapsed=0.1)
+            self._request(bus, 1, status_code=500, elapsed=1.0)
+        self.assertEqual(
+            [result.passed for result in monitor.evaluate(duration=1.0)],
+            [True, False, True]
+        )
+
+    def test_abort_on_breach(self):
+        monitor = ThresholdMonitor.from_definition([
+            {'metric': 'error_rate', 'max': 0, 'abort': True, 'delay': 0}
+        ])
+        bus = HookBus()
+        monitor.subscribe(bus)
+        monitor.start()
+        self._request(bus, 0, status_code=503)
+        with self.assertRaises(ThresholdBreachedError):
+            bus.emit(StepStart(time=0, step=0, item=None))
+
+    def test_abort_on_process_share(self):
+        cases = [
+            ('throughput', 30, False),
+            ('throughput', 20, True),
+            ('requests', 30, False),
+            ('requests', 20, True)
+        ]
+        for metric, requests, breached in cases:
+            monitor = ThresholdMonitor.from_definition(
+                [{'metric': metric, 'min': 100, 'abort': True, 'delay': 0}],
+                processes=4
+            )
+            # Requests of the process before the threshold is checked
+            statistics_bus = HookBus()
+            monitor.statistics.subscribe(statistics_bus)
+            for _ in range(requests - 1):
+                self._request(statistics_bus, 0)
+            bus = HookBus()
+            monitor.subscribe(bus)
+            monitor.start()
+            monitor.stop(1.0)
+            self._request(bus, 0)
+            if breached:
+                with self.assertRaises(ThresholdBreachedError):
+                    bus.emit(StepStart(time=0, step=0, item=None))
+            else:
+                bus.emit(StepStart(time=0, step=0, item=None))
+
+    def test_share(self):
+        throughput = Threshold('throughput', min=100, max=200)
+        self.assertTrue(throughput.check(30, share=0.25))
+        self.assertFalse(throughput.check(60, share=0.25))
+        latency = Threshold('latency', max=0.5)
+        self.assertTrue(latency.check(0.4, share=0.25))
+
+    def test_unknown_step(self):
+        with self.assertRaises(ValueError):
+            ThresholdMonitor.from_definition(
+                [{'metric': 'requests', 'min': 1, 'step': 'missing'}]
+            )
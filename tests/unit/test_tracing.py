@@ -0,0 +1,78 @@
+import json
+import os
+import re
+import tempfile
+from unittest import TestCase
+
+from requests import Request
+
+from pitch.sequence.coalescing import RequestCoalescer
+from pitch.sinks import close_sinks
+from pitch.tracing import NULL_SPAN, Tracer
+
+
+class TestTracer(TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+
+    def _trace(self, format):
+        filename = os.path.join(self.directory.name, 'trace')
+        tracer = Tracer(filename, format=format)
+        tracer.reset()
+        root = tracer.start_span('sequence')
+        step = tracer.start_span('login', parent=root,
+                                 attributes={'step.index': 0})
+        with step:
+            with step.child('send', kind='client'):
+                pass
+        root.end()
+        tracer.export(step)
+        tracer.export(root)
+        close_sinks()
+        with open(filename) as f:
+            return root, step, f.read()
+
+    def test_traceparent(self):
+        tracer = Tracer('trace')
+        span = tracer.start_span('sequence')
+        self.assertRegex(
+            span.traceparent,
+            '^00-{}-{}-01$'.format(span.trace_id, span.span_id)
+        )
+        self.assertTrue(re.match('^[0-9a-f]{32}$', span.trace_id))
+        self.assertIs(NULL_SPAN.child('send'), NULL_SPAN)
+
+    def test_chrome_format(self):
+        root, step, content = self._trace('chrome')
+        events = json.loads(content.rstrip().rstrip(',') + ']')
+        self.assertEqual(
+            [event['name'] for event in events],
+            ['login', 'send', 'sequence']
+        )
+        self.assertEqual(events[0]['args']['step.index'], 0)
+        self.assertGreaterEqual(events[0]['dur'], events[1]['dur'])
+
+    def test_otlp_format(self):
+        root, step, content = self._trace('otlp')
+        requests = [json.loads(line) for line in content.splitlines()]
+        spans = requests[0]['resourceSpans'][0]['scopeSpans'][0]['spans']
+        self.assertEqual([span['name'] for span in spans], ['login', 'send'])
+        self.assertEqual(spans[0]['parentSpanId'], root.span_id)
+        self.assertEqual(spans[1]['parentSpanId'], step.span_id)
+        self.assertEqual(spans[1]['kind'], 3)
+        self.assertEqual({span['traceId'] for span in spans}, {root.trace_id})
+
+    def test_coalescing_ignores_traceparent(self):
+        coalescer = RequestCoalescer()
+        keys = {
+            coalescer.key(Request(
+                'GET',
+                'http://localhost/items',
+                headers={'traceparent': Tracer('trace').start_span(
+                    'step'
+                ).traceparent}
+            ).prepare())
+            for _ in range(2)
+        }
+        self.assertEqual(len(keys), 1)
@@ -0,0 +1,84 @@
+import json
+import os
+import tempfile
+from unittest import TestCase, skipIf
+
+from marshmallow import Schema, fields
+
+from pitch.validation import ValidationCounters, collect_counters, \
+    get_validator, merge_counters, report
+
+try:
+    import fastjsonschema
+except ImportError:  # pragma: no cover
+    fastjsonschema = None
+
+SCHEMA = {
+    'type': 'object',
+    'properties': {
+        'items': {
+            'type': 'array',
+            'items': {
+                'type': 'object',
+                'properties': {'id': {'type': 'integer'}},
+                'required': ['id']
+            }
+        }
+    }
+}
+
+
+class ItemSchema(Schema):
+    id = fields.Integer(required=True)
+
+
+class TestResponseValidator(TestCase):
+    def setUp(self):
+        collect_counters()
+
+    @skipIf(fastjsonschema is None, 'fastjsonschema is not installed')
+    def test_json_schema(self):
+        validator = get_validator(schema=SCHEMA, name='items')
+        self.assertIs(get_validator(schema=SCHEMA, name='items'), validator)
+        for id in (1, 'a', 'b'):
+            validator.validate({'items': [{'id': 1}, {'id': id}]})
+        counters = collect_counters()['items']
+        self.assertEqual((counters.checked, counters.invalid), (3, 2))
+        self.assertEqual(counters.errors, {'items.*.id: type': 2})
+        self.assertEqual(collect_counters()['items'].checked, 0)
+
+    @skipIf(fastjsonschema is None, 'fastjsonschema is not installed')
+    def test_schema_file_and_sampling(self):
+        with tempfile.TemporaryDirectory() as directory:
+            filename = os.path.join(directory, 'schema.json')
+            with open(filename, 'w') as f:
+                json.dump(SCHEMA, f)
+            validator = get_validator(schema_file=filename, sample=3)
+        sampled = [validator.sampled() for _ in range(7)]
+        self.assertEqual(sampled.count(True), 3)
+        counters = collect_counters()[filename]
+        self.assertEqual(counters.skipped, 4)
+
+    def test_marshmallow(self):
+        validator = get_validator(
+            marshmallow='{}:ItemSchema'.format(__name__),
+            many=True
+        )
+        self.assertEqual(
+            validator.validate([{'id': 1}, {}]),
+            ['*.id: Missing data for required field.']
+        )
+        with self.assertRaises(ValueError):
+            get_validator(schema=SCHEMA, marshmallow='a:B')
+        with self.assertRaises(ValueError):
+            get_validator(schema=SCHEMA)
+
+    def test_report(self):
+        counters = merge_counters(
+            {'items': ValidationCounters(2, 0, 1, {'id: type': 1})},
+            {'items': ValidationCounters(1, 3, 1, {'id: type': 1})}
+        )
+        text = report(counters)
+        self.assertIn('items', text)
+        self.assertIn('2  id: type', text)
+        self.assertEqual(counters['items'].checked, 3)
@@ -0,0 +1,109 @@
+import http.server
+import os
+import tempfile
+import threading
+from unittest import TestCase
+
+import requests
+
+from pitch.exceptions import CassetteMissError
+from pitch.sinks import close_sinks
+from pitch.transport.cassette import Cassette, _decode_body, _encode_body
+
+
+class CountingHandler(http.server.BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        self.server.count += 1
+        self._respond(
+            'text/plain; charset=utf-8',
+            'call {}'.format(self.server.count).encode('utf-8')
+        )
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers['Content-Length']))
+        self._respond('application/octet-stream', b'\xff' + body)
+
+    def _respond(self, content_type, body):
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class TestCassette(TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.path = os.path.join(self.directory.name, 'cassette.jsonl')
+        self.server = http.server.ThreadingHTTPServer(
+            ('127.0.0.1', 0),
+            CountingHandler
+        )
+        self.server.count = 0
+        self.server.daemon_threads = True
+        threading.Thread(target=self.server.serve_forever,
+                         daemon=True).start()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+        self.url = 'http://127.0.0.1:{}/items'.format(
+            self.server.server_address[1]
+        )
+
+    def _session(self, mode):
+        session = requests.Session()
+        adapter = Cassette(self.path, mode).adapter()
+        session.mount('http://', adapter)
+        self.addCleanup(session.close)
+        return session
+
+    def test_encode_body(self):
+        for body in (None, 'text', 'é'.encode('utf-8'), b'\xff\x00'):
+            decoded = _decode_body(_encode_body(body))
+            expected = body.encode('utf-8') if isinstance(body, str) \
+                else body or b''
+            self.assertEqual(decoded, expected)
+        self.assertIn('body_base64', _encode_body(b'\xff'))
+
+    def test_key(self):
+        self.assertEqual(
+            Cassette.key('POST', 'http://a/', 'é'),
+            Cassette.key('POST', 'http://a/', 'é'.encode('utf-8'))
+        )
+        self.assertEqual(
+            Cassette.key('GET', 'http://a/', None),
+            Cassette.key('GET', 'http://a/', b'')
+        )
+        self.assertNotEqual(
+            Cassette.key('POST', 'http://a/', b'1'),
+            Cassette.key('POST', 'http://a/', b'2')
+        )
+
+    def test_record_and_replay(self):
+        recording = self._session('record')
+        recorded = [recording.get(self.url).text for _ in range(2)]
+        posted = recording.post(self.url, data=b'\x00\x01').content
+        close_sinks()
+        self.assertEqual(recorded, ['call 1', 'call 2'])
+
+        replaying = self._session('replay')
+        # Responses recorded for the same request are replayed cyclically
+        self.assertEqual(
+            [replaying.get(self.url).text for _ in range(3)],
+            ['call 1', 'call 2', 'call 1']
+        )
+        response = replaying.post(self.url, data=b'\x00\x01')
+        self.assertEqual(response.content, posted)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            response.headers['Content-Type'],
+            'application/octet-stream'
+        )
+        self.assertEqual(self.server.count, 2)
+        with self.assertRaises(CassetteMissError):
+            replaying.post(self.url, data=b'\x02')
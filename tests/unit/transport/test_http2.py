@@ -0,0 +1,215 @@
+import gzip
+import json
+import socketserver
+import threading
+import time
+from concurrent import futures
+from unittest import TestCase, skipIf
+
+import requests
+
+from pitch.transport.http2 import HTTP2Adapter
+
+try:
+    import h2.config
+    import h2.connection
+    import h2.events
+    import h2.exceptions
+except ImportError:  # pragma: no cover
+    h2 = None
+
+
+class H2Handler(socketserver.BaseRequestHandler):
+    """ HTTP/2 (prior knowledge) server answering each stream in a thread. """
+    def handle(self):
+        self.connection = h2.connection.H2Connection(
+            config=h2.config.H2Configuration(
+                client_side=False,
+                header_encoding='utf-8'
+            )
+        )
+        self.condition = threading.Condition()
+        self.server.connections += 1
+        streams = {}
+        with self.condition:
+            self.connection.initiate_connection()
+            self.request.sendall(self.connection.data_to_send())
+        while True:
+            try:
+                data = self.request.recv(65536)
+            except OSError:
+                return
+            if not data:
+                return
+            with self.condition:
+                for event in self.connection.receive_data(data):
+                    if isinstance(event, h2.events.RequestReceived):
+                        streams[event.stream_id] = (dict(event.headers), [])
+                    elif isinstance(event, h2.events.DataReceived):
+                        streams[event.stream_id][1].append(event.data)
+                        self.connection.acknowledge_received_data(
+                            event.flow_controlled_length,
+                            event.stream_id
+                        )
+                    elif isinstance(event, h2.events.StreamEnded):
+                        threading.Thread(
+                            target=self.respond,
+                            args=(event.stream_id,) +
+                            streams.pop(event.stream_id)
+                        ).start()
+                    elif isinstance(event, h2.events.StreamReset):
+                        self.server.resets += 1
+                self.request.sendall(self.connection.data_to_send())
+                self.condition.notify_all()
+
+    def respond(self, stream_id, headers, body):
+        path = headers[':path']
+        if 'slow' in path:
+            time.sleep(0.2)
+        if 'hang' in path:
+            time.sleep(1)
+        response_headers = [(':status', '200'), ('set-cookie', 'a=1')]
+        if 'large' in path:
+            payload = b'x' * 300000
+        else:
+            payload = json.dumps({
+                'path': path,
+                'headers': headers,
+                'body': b''.join(body).decode('utf-8')
+            }).encode('utf-8')
+        if 'gzip' in path:
+            payload = gzip.compress(payload)
+            response_headers.append(('content-encoding', 'gzip'))
+        try:
+            with self.condition:
+                self.connection.send_headers(stream_id, response_headers)
+                offset = 0
+                while offset < len(payload):
+                    window = min(
+                        self.connection.local_flow_control_window(stream_id),
+                        self.connection.max_outbound_frame_size
+                    )
+                    if window <= 0:
+                        self.request.sendall(self.connection.data_to_send())
+                        self.condition.wait()
+                        continue
+                    self.connection.send_data(
+                        stream_id,
+                        payload[offset:offset + window]
+                    )
+                    offset += window
+                self.connection.end_stream(stream_id)
+                self.request.sendall(self.connection.data_to_send())
+        except (h2.exceptions.StreamClosedError, OSError):
+            pass
+
+
+class LockCheckingSocket(object):
+    """ Socket proxy recording whether writes hold the connection lock. """
+    def __init__(self, connection):
+        self._connection = connection
+        self._sock = connection._sock
+        self.locked = []
+
+    def sendall(self, data):
+        acquired = []
+
+        def acquire():
+            acquired.append(self._connection._condition.acquire(timeout=1))
+            if acquired[0]:
+                self._connection._condition.release()
+
+        thread = threading.Thread(target=acquire)
+        thread.start()
+        thread.join()
+        self.locked.append(not acquired[0])
+        return self._sock.sendall(data)
+
+    def __getattr__(self, name):
+        return getattr(self._sock, name)
+
+
+@skipIf(h2 is None, 'h2 is not installed')
+class TestHTTP2Adapter(TestCase):
+    def setUp(self):
+        self.server = socketserver.ThreadingTCPServer(
+            ('127.0.0.1', 0),
+            H2Handler
+        )
+        self.server.daemon_threads = True
+        self.server.connections = 0
+        self.server.resets = 0
+        threading.Thread(target=self.server.serve_forever, daemon=True) \
+            .start()
+        self.url = 'http://127.0.0.1:{}'.format(self.server.server_address[1])
+        self.adapter = HTTP2Adapter(initial_window_size=65535)
+        self.session = requests.Session()
+        self.session.mount('http://', self.adapter)
+
+    def tearDown(self):
+        self.adapter.close()
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_request(self):
+        response = self.session.post(
+            self.url + '/echo?q=1',
+            json={'a': 1},
+            timeout=5
+        )
+        self.assertEqual(response.status_code, 200)
+        body = response.json()
+        self.assertEqual(body['path'], '/echo?q=1')
+        self.assertEqual(json.loads(body['body']), {'a': 1})
+        self.assertNotIn('connection', body['headers'])
+        self.assertEqual(self.session.cookies['a'], '1')
+        response = self.session.get(self.url + '/gzip', timeout=5)
+        self.assertEqual(response.json()['path'], '/gzip')
+
+    def test_multiplexing(self):
+        with futures.ThreadPoolExecutor(max_workers=8) as executor:
+            started = time.monotonic()
+            responses = list(executor.map(
+                lambda _: self.session.get(self.url + '/slow', timeout=5),
+                range(8)
+            ))
+            elapsed = time.monotonic() - started
+        self.assertEqual(
+            [response.status_code for response in responses],
+            [200] * 8
+        )
+        self.assertLess(elapsed, 1.0)
+        self.assertEqual(self.server.connections, 1)
+        metrics = self.adapter.metrics()[self.url]
+        self.assertEqual(metrics['connections'], 1)
+        self.assertEqual(metrics['streams'], 8)
+        self.assertGreater(metrics['peak_streams'], 1)
+
+    def test_flow_control(self):
+        responses = [
+            self.session.get(self.url + '/large', stream=True, timeout=5)
+            for _ in range(2)
+        ]
+        # The unread body of the first response does not block the second
+        self.assertEqual(len(responses[1].content), 300000)
+        self.assertEqual(len(responses[0].content), 300000)
+
+    def test_writes_do_not_hold_the_connection_lock(self):
+        self.session.get(self.url, timeout=5)
+        pool, = self.adapter._pools.values()
+        connection, = pool.connections
+        sock = connection._sock = LockCheckingSocket(connection)
+        body = b'x' * 200000
+        response = self.session.post(self.url + '/upload', data=body,
+                                     timeout=5)
+        self.assertEqual(len(response.json()['body']), len(body))
+        self.assertGreater(len(sock.locked), 1)
+        self.assertFalse(any(sock.locked))
+
+    def test_timeout(self):
+        with self.assertRaises(requests.exceptions.ReadTimeout):
+            self.session.get(self.url + '/hang', timeout=0.2)
+        # The stream was reset and the connection is still usable
+        response = self.session.get(self.url, timeout=5)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.server.connections, 1)